@@ -6,6 +6,7 @@ import json
 import time
 from typing import Dict, Any, List
 import config
+from run_context import PipelineCancelled
 
 
 class BaseAgent:
@@ -49,7 +50,8 @@ class BaseAgent:
             print(f"☁️ {self.name} 使用 Gemini 雲端模型: {self.model}")
     
     def _call_ai(self, prompt: str, system_instruction: str = None, 
-                 temperature: float = None, max_retries: int = None) -> str:
+                 temperature: float = None, max_retries: int = None,
+                 context=None) -> str:
         """
         調用 AI 模型（支持 Ollama 和 Gemini）
         
@@ -58,6 +60,8 @@ class BaseAgent:
             system_instruction: 系統指令
             temperature: 溫度參數
             max_retries: 最大重試次數
+            context: 執行上下文（RunContext），對話記錄寫入上下文而非實例；
+                     上下文被取消或超過期限時拋出 PipelineCancelled
             
         Returns:
             AI 回應文本
@@ -69,12 +73,21 @@ class BaseAgent:
         
         for attempt in range(max_retries):
             try:
+                if context is not None:
+                    context.check_cancelled()
+                
                 if self.client_type == "ollama":
-                    result = self._call_ollama(prompt, system_instruction, temperature)
+                    result = self._call_ollama(prompt, system_instruction, temperature, context)
                 else:
                     result = self._call_gemini(prompt, system_instruction, temperature)
+                    if context is not None:
+                        context.check_cancelled()
+                
+                # 記錄對話（有上下文時記錄到上下文，實例可跨執行共用）
+                if context is not None:
+                    context.record_conversation(self.name, prompt, result)
+                    return result
                 
-                # 記錄對話
                 self.conversation_history.append({
                     "role": "user",
                     "content": prompt,
@@ -88,6 +101,9 @@ class BaseAgent:
                 
                 return result
                 
+            except PipelineCancelled:
+                print(f"🛑 {self.name} 已停止：{context.cancel_token.reason}")
+                raise
             except Exception as e:
                 provider_name = "Ollama" if self.client_type == "ollama" else "Gemini"
                 print(f"⚠️ {self.name} {provider_name} 調用失敗 (嘗試 {attempt + 1}/{max_retries}): {str(e)}")
@@ -95,13 +111,22 @@ class BaseAgent:
                 if attempt < max_retries - 1:
                     wait_time = 2 ** attempt
                     print(f"   等待 {wait_time} 秒後重試...")
-                    time.sleep(wait_time)
+                    if context is not None:
+                        if context.cancel_token.wait(wait_time):
+                            context.check_cancelled()
+                    else:
+                        time.sleep(wait_time)
                 else:
                     raise Exception(f"{self.name} {provider_name} 調用失敗: {str(e)}")
     
     def _call_ollama(self, prompt: str, system_instruction: str = None, 
-                     temperature: float = 0.7) -> str:
-        """調用 Ollama 本地模型"""
+                     temperature: float = 0.7, context=None) -> str:
+        """
+        調用 Ollama 本地模型
+        
+        有執行上下文時使用流式輸出，每收到一段輸出就檢查取消令牌並發佈到進度串流；
+        取消時關閉連線，Ollama 會隨之停止生成
+        """
         messages = []
         
         # 添加系統指令
@@ -117,21 +142,57 @@ class BaseAgent:
             "content": prompt
         })
         
+        options = {
+            "temperature": temperature,
+            "num_ctx": config.OLLAMA_NUM_CTX,
+            "num_predict": config.OLLAMA_NUM_PREDICT,
+            "top_p": 0.9,
+            "top_k": 40
+        }
+        
         # 調用 Ollama
-        response = self.ollama_client.chat(
+        if context is None:
+            response = self.ollama_client.chat(
+                model=self.model,
+                messages=messages,
+                options=options,
+                stream=False,
+                keep_alive=config.OLLAMA_KEEP_ALIVE
+            )
+            return response['message']['content']
+        
+        stream = self.ollama_client.chat(
             model=self.model,
             messages=messages,
-            options={
-                "temperature": temperature,
-                "num_ctx": config.OLLAMA_NUM_CTX,
-                "num_predict": config.OLLAMA_NUM_PREDICT,
-                "top_p": 0.9,
-                "top_k": 40
-            },
-            stream=False  # 暫不使用流式輸出以簡化處理
+            options=options,
+            stream=True,
+            keep_alive=config.OLLAMA_KEEP_ALIVE
         )
+        chunks = []
+        try:
+            for chunk in stream:
+                context.check_cancelled()
+                chunks.append(chunk['message']['content'])
+                context.emit_token(self.name, chunks[-1])
+        finally:
+            stream.close()
+            context.flush_tokens()
         
-        return response['message']['content']
+        return ''.join(chunks)
+    
+    def release_model(self):
+        """
+        通知 Ollama 立即卸載本 Agent 的模型，釋放顯存給下一個模型
+        （Gemini 雲端模型無需處理）
+        """
+        if self.client_type != "ollama":
+            return
+        try:
+            self.ollama_client.generate(model=self.model, prompt="", keep_alive=0)
+            if config.VERBOSE:
+                print(f"♻️ 已卸載模型: {self.model}")
+        except Exception as e:
+            print(f"⚠️ 模型卸載失敗 {self.model}: {str(e)}")
     
     def _call_gemini(self, prompt: str, system_instruction: str = None, 
                      temperature: float = 0.7) -> str:
@@ -209,10 +270,13 @@ class BaseAgent:
         """獲取決策日誌"""
         return self.conversation_history
     
-    def execute(self, **kwargs) -> Dict[str, Any]:
+    def execute(self, context=None, **kwargs) -> Dict[str, Any]:
         """
         執行 Agent 任務（子類需實現）
         
+        Args:
+            context: 執行上下文（RunContext）
+            
         Returns:
             執行結果
         """
@@ -17,7 +17,7 @@ class CurriculumDesignerAgent(BaseAgent):
         )
     
     def execute(self, topic: str, target_audience: str = "初學者", 
-                duration_minutes: int = 10, **kwargs) -> Dict[str, Any]:
+                duration_minutes: int = 10, context=None, **kwargs) -> Dict[str, Any]:
         """
         生成課程大綱
         
@@ -25,6 +25,7 @@ class CurriculumDesignerAgent(BaseAgent):
             topic: 課程主題
             target_audience: 目標受眾
             duration_minutes: 課程時長（分鐘）
+            context: 執行上下文（RunContext）
             
         Returns:
             課程大綱結構
@@ -72,7 +73,8 @@ class CurriculumDesignerAgent(BaseAgent):
         response_text = self._call_ai(
             prompt=prompt,
             system_instruction=system_instruction,
-            temperature=0.7
+            temperature=0.7,
+            context=context
         )
         
         try:
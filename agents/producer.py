@@ -18,13 +18,15 @@ class ProducerAgent(BaseAgent):
             agent_type="producer"  # 使用數據處理優化的模型
         )
     
-    def execute(self, scripts: Dict[str, Any], slides: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+    def execute(self, scripts: Dict[str, Any], slides: Dict[str, Any], 
+                context=None, **kwargs) -> Dict[str, Any]:
         """
         生成音訊和時間對齊方案
         
         Args:
             scripts: 教學腳本數據
             slides: 投影片設計數據
+            context: 執行上下文（RunContext）
             
         Returns:
             製片方案（包含音訊和時間軸）
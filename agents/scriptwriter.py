@@ -16,12 +16,13 @@ class ScriptwriterAgent(BaseAgent):
             agent_type="scriptwriter"  # 使用創意寫作優化的模型
         )
     
-    def execute(self, curriculum: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+    def execute(self, curriculum: Dict[str, Any], context=None, **kwargs) -> Dict[str, Any]:
         """
         生成教學腳本
         
         Args:
             curriculum: 課程大綱數據
+            context: 執行上下文（RunContext）
             
         Returns:
             教學腳本結構
@@ -80,7 +81,8 @@ class ScriptwriterAgent(BaseAgent):
         response_text = self._call_ai(
             prompt=prompt,
             system_instruction=system_instruction,
-            temperature=0.8
+            temperature=0.8,
+            context=context
         )
         
         try:
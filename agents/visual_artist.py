@@ -16,12 +16,13 @@ class VisualArtistAgent(BaseAgent):
             agent_type="visual"  # 使用結構化輸出優化的模型
         )
     
-    def execute(self, scripts: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+    def execute(self, scripts: Dict[str, Any], context=None, **kwargs) -> Dict[str, Any]:
         """
         設計投影片佈局和視覺元素
         
         Args:
             scripts: 教學腳本數據
+            context: 執行上下文（RunContext）
             
         Returns:
             投影片設計結構
@@ -85,7 +86,8 @@ class VisualArtistAgent(BaseAgent):
         response_text = self._call_ai(
             prompt=prompt,
             system_instruction=system_instruction,
-            temperature=0.7
+            temperature=0.7,
+            context=context
         )
         
         try:
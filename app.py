@@ -2,19 +2,40 @@
 Flask API 服務器
 提供 RESTful API 接口
 """
-from flask import Flask, request, jsonify, render_template, send_from_directory
+from flask import Flask, Response, request, jsonify, render_template, send_from_directory
 from flask_cors import CORS
+from werkzeug.security import safe_join
 import json
+import math
 import os
-from datetime import datetime
+import re
+import threading
 from orchestrator import Orchestrator
+from job_queue import JobQueue, JobQueueFull
+from progress_stream import ProgressStreamServer, iter_events, parse_cursor
+from course_artifact import load_course_manifest, load_course, load_blob
 import config
 
 app = Flask(__name__)
 CORS(app)
 
-# 全局變量
+# 全局變量：進程內共用一個常駐的 Orchestrator（Agent、字體、TTS/視頻模組只載入一次），
+# 每次請求的狀態保存在各自的 RunContext 中
 orchestrator = None
+_orchestrator_lock = threading.Lock()
+last_context = None
+
+JOB_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+def get_orchestrator() -> Orchestrator:
+    """獲取共用的 Orchestrator（首次調用時建立）"""
+    global orchestrator
+    if orchestrator is None:
+        with _orchestrator_lock:
+            if orchestrator is None:
+                orchestrator = Orchestrator()
+    return orchestrator
 
 
 @app.route('/health')
@@ -25,7 +46,8 @@ def health_check():
         "service": "AI MOOC Generator",
         "version": "1.0.0",
         "ollama_configured": bool(config.OLLAMA_BASE_URL),
-        "gemini_configured": bool(config.GEMINI_API_KEY)
+        "gemini_configured": bool(config.GEMINI_API_KEY),
+        "jobs": job_queue.stats()
     }), 200
 
 
@@ -35,24 +57,125 @@ def index():
     return render_template('index.html')
 
 
+def output_url(path: str) -> str:
+    """輸出目錄中文件的網址（由 /outputs/ 路由提供）"""
+    return "/outputs/" + os.path.relpath(path, config.OUTPUT_DIR).replace(os.sep, "/")
+
+
+def build_course_response(artifact_dir: str) -> dict:
+    """任務結果中的課程：還原 blob 引用的長文字，raw_response 等大型欄位保留引用"""
+    return load_course(artifact_dir, keep_refs=config.ARTIFACT_BLOB_KEYS)
+
+
+def run_job(job) -> dict:
+    """
+    在背景工作線程中執行課程生成任務，返回任務結果
+    
+    成功時結果為課程 manifest（大型文字以 blob 引用代替）與媒體文件網址
+    """
+    global last_context
+    pipeline = get_orchestrator()
+    context = job.context
+    request_data = job.request
+    
+    result = pipeline.execute_pipeline(
+        topic=request_data["topic"],
+        target_audience=request_data["target_audience"],
+        duration_minutes=request_data["duration_minutes"],
+        context=context
+    )
+    last_context = context
+    
+    # 失敗或已取消的任務不保存結果
+    if not result.get("success"):
+        return {
+            "success": False,
+            "cancelled": bool(result.get("cancelled")),
+            "error": result.get("error")
+        }
+    
+    # 保存精簡存檔；結果中的長文字已還原（前端直接顯示），原始回應保留 blob 引用
+    manifest_path = pipeline.save_artifact(result, context)
+    if not manifest_path:
+        return result
+    
+    response = build_course_response(os.path.dirname(manifest_path))
+    response["artifact"] = f"/api/courses/{context.course_id}"
+    media_files = result.get("media_files", {})
+    response["thumbnail_urls"] = [output_url(path) for path in media_files.get("thumbnails", [])]
+    response["vector_slide_urls"] = [output_url(path) for path in media_files.get("vector_slides", [])]
+    if media_files.get("video"):
+        response["video_url"] = output_url(media_files["video"])
+    if media_files.get("hls_playlist"):
+        response["hls_url"] = output_url(media_files["hls_playlist"])
+    return response
+
+
+# 課程生成任務佇列（進程內工作線程執行，請求處理器不再被整條流程佔用）
+job_queue = JobQueue(run_job, media_url=output_url)
+# 進度串流伺服器（首次排入任務時啟動；單一事件循環服務所有 SSE 連線）
+progress_server = ProgressStreamServer(job_queue.get) if config.SSE_PORT else None
+
+
+def events_url(job_id: str) -> str:
+    """
+    任務進度串流的網址：優先使用 asyncio 串流伺服器，不可用時為同源的 Flask 路由
+    
+    串流伺服器只提供 HTTP；經反向代理（X-Forwarded-*）或 HTTPS 存取時，
+    除非設定了 SSE_PUBLIC_URL，否則使用 Flask 路由，避免混合內容或端口不可達
+    """
+    if config.SSE_PUBLIC_URL:
+        return f"{config.SSE_PUBLIC_URL.rstrip('/')}/jobs/{job_id}/events"
+    proxied = any(name in request.headers
+                  for name in ("X-Forwarded-Proto", "X-Forwarded-Host", "X-Forwarded-For", "Forwarded"))
+    if (not proxied and request.scheme == "http"
+            and progress_server is not None and progress_server.start()):
+        return f"http://{request_hostname()}:{config.SSE_PORT}/jobs/{job_id}/events"
+    return f"/api/jobs/{job_id}/events"
+
+
+def request_hostname() -> str:
+    """請求的主機名稱（去掉端口；IPv6 位址保留方括號，例如 [::1]）"""
+    host = request.host
+    if host.startswith("["):
+        return host[:host.index("]") + 1]
+    return host.rsplit(":", 1)[0]
+
+
+def parse_deadline(value):
+    """解析請求的 deadline_seconds（有限的正數），無效時返回 None"""
+    if isinstance(value, bool):
+        return None
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        return None
+    return seconds if math.isfinite(seconds) and seconds > 0 else None
+
+
 @app.route('/api/generate', methods=['POST'])
 def generate_course():
     """
-    生成課程 API
+    排入課程生成任務（立即返回，之後以 GET /api/jobs/<job_id> 查詢進度與結果）
     
     Request Body:
         {
             "topic": "課程主題",
             "target_audience": "目標受眾",
-            "duration_minutes": 10
+            "duration_minutes": 10,
+            "job_id": "可選，由客戶端指定，用於查詢與取消",
+            "deadline_seconds": 1800,
+            "video_profile": "可選，draft / standard / archival"
         }
     
-    Response:
+    Response (202):
         {
             "success": true,
-            "results": {...},
-            "elapsed_time": 45.2,
-            "timestamp": 1234567890
+            "job_id": "...",
+            "status": "queued",
+            "queue_position": 0,
+            "status_url": "/api/jobs/<job_id>",
+            "events_url": "進度串流（SSE）網址"
         }
     """
     try:
@@ -61,6 +184,9 @@ def generate_course():
         topic = data.get('topic')
         target_audience = data.get('target_audience', '初學者')
         duration_minutes = data.get('duration_minutes', 10)
+        job_id = data.get('job_id')
+        deadline_seconds = data.get('deadline_seconds')
+        video_profile = data.get('video_profile')
         
         if not topic:
             return jsonify({
@@ -68,23 +194,56 @@ def generate_course():
                 "error": "請提供課程主題"
             }), 400
         
-        # 創建新的 Orchestrator
-        global orchestrator
-        orchestrator = Orchestrator()
+        if video_profile is not None and video_profile not in config.VIDEO_PROFILES:
+            return jsonify({
+                "success": False,
+                "error": f"video_profile 無效（可用：{', '.join(config.VIDEO_PROFILES)}）"
+            }), 400
+        
+        if job_id is not None and not JOB_ID_PATTERN.match(str(job_id)):
+            return jsonify({
+                "success": False,
+                "error": "job_id 格式無效"
+            }), 400
         
-        # 執行課程生成流程
-        result = orchestrator.execute_pipeline(
-            topic=topic,
-            target_audience=target_audience,
-            duration_minutes=duration_minutes
-        )
+        # 只驗證客戶端提供的期限；REQUEST_DEADLINE_SECONDS <= 0 表示不限時
+        if 'deadline_seconds' in data:
+            deadline_seconds = parse_deadline(deadline_seconds)
+            if deadline_seconds is None:
+                return jsonify({
+                    "success": False,
+                    "error": "deadline_seconds 必須為正數"
+                }), 400
+        limits = [value for value in (deadline_seconds, config.REQUEST_DEADLINE_SECONDS)
+                  if value is not None and value > 0]
         
-        # 保存結果
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_file = os.path.join(config.OUTPUT_DIR, f"course_{timestamp}.json")
-        orchestrator.save_results(result, output_file)
+        try:
+            job = job_queue.submit({
+                "topic": topic,
+                "target_audience": target_audience,
+                "duration_minutes": duration_minutes,
+                "deadline_seconds": min(limits) if limits else None,
+                "video_profile": video_profile
+            }, job_id=job_id)
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 409
+        except JobQueueFull as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 503
         
-        return jsonify(result)
+        return jsonify({
+            "success": True,
+            "job_id": job.job_id,
+            "status": job.status,
+            "queue_position": job_queue.position(job),
+            "status_url": f"/api/jobs/{job.job_id}",
+            "events_url": events_url(job.job_id)
+        }), 202
         
     except Exception as e:
         print(f"❌ API 錯誤: {str(e)}")
@@ -96,6 +255,86 @@ def generate_course():
         }), 500
 
 
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    查詢任務狀態
+    
+    Response:
+        {
+            "success": true,
+            "job_id": "...",
+            "status": "queued / running / succeeded / failed / cancelled",
+            "stage": "curriculum / scripts / visual_design / production / slides / audio / video / done",
+            "stage_label": "腳本撰寫",
+            "progress": 0.43,
+            "eta_seconds": 120.5,
+            "queue_position": 0,
+            "hls_url": "...",  // 啟用 HLS 時，第一章寫入後即可播放
+            "result": {...}    // 完成後：課程內容、artifact、thumbnail_urls、video_url、hls_url
+        }
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({
+            "success": False,
+            "error": "找不到任務"
+        }), 404
+    
+    status = job.to_dict()
+    status["success"] = True
+    status["queue_position"] = job_queue.position(job)
+    return jsonify(status)
+
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """
+    任務進度串流（Server-Sent Events）
+    
+    事件：snapshot（連線時的任務狀態）、status（狀態變化，結束時附結果）、
+    stage（階段切換，含整體進度與預估剩餘時間）、progress（投影片 / TTS / 章節進度）、
+    token（LLM 流式輸出）、hls（HLS 播放清單已可播放）。支援 Last-Event-ID 斷線續傳，任務結束後關閉串流。
+    
+    此路由每個連線佔用一個請求線程；大量監聽者應使用 events_url 指向的 asyncio 串流伺服器
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({
+            "success": False,
+            "error": "找不到任務"
+        }), 404
+    
+    cursor = parse_cursor(request.headers.get('Last-Event-ID') or request.args.get('last_event_id'))
+    return Response(
+        iter_events(job, cursor, config.SSE_HEARTBEAT_SECONDS),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """
+    取消排隊中或執行中的課程生成任務
+    
+    排隊中的任務不會開始；正在進行的 LLM 調用、TTS 與視頻編碼會盡快停止，並清理已生成的部分文件
+    """
+    job = job_queue.cancel(job_id)
+    
+    if job is None:
+        return jsonify({
+            "success": False,
+            "error": "找不到執行中的任務"
+        }), 404
+    
+    return jsonify({
+        "success": True,
+        "job_id": job_id,
+        "status": job.status if job.finished else "cancelling"
+    })
+
+
 @app.route('/api/decision-logs', methods=['GET'])
 def get_decision_logs():
     """
@@ -110,13 +349,13 @@ def get_decision_logs():
         }
     """
     try:
-        if not orchestrator:
+        if orchestrator is None or last_context is None:
             return jsonify({
                 "success": False,
                 "error": "尚未執行課程生成"
             }), 400
         
-        logs = orchestrator.get_decision_logs()
+        logs = orchestrator.get_decision_logs(last_context)
         return jsonify({
             "success": True,
             "logs": logs
@@ -129,10 +368,63 @@ def get_decision_logs():
         }), 500
 
 
+@app.route('/api/courses/<course_id>', methods=['GET'])
+def get_course(course_id):
+    """
+    讀取課程存檔（只讀取 manifest，大型文字以 {"$blob": key} 引用表示）
+    """
+    artifact_dir = safe_join(config.COURSES_DIR, course_id)
+    if artifact_dir is None or not os.path.isdir(artifact_dir):
+        return jsonify({
+            "success": False,
+            "error": "找不到課程存檔"
+        }), 404
+    
+    manifest = load_course_manifest(artifact_dir)
+    return jsonify({
+        "success": True,
+        "course": manifest["course"],
+        "decision_logs": manifest["decision_logs"]
+    })
+
+
+@app.route('/api/courses/<course_id>/blobs/<blob_key>', methods=['GET'])
+def get_course_blob(course_id, blob_key):
+    """讀取課程存檔中的單個 blob（原始回應、決策日誌、腳本全文等）"""
+    artifact_dir = safe_join(config.COURSES_DIR, course_id)
+    if artifact_dir is None or not os.path.isdir(artifact_dir):
+        return jsonify({
+            "success": False,
+            "error": "找不到課程存檔"
+        }), 404
+    
+    try:
+        content = load_blob(artifact_dir, blob_key)
+    except KeyError as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 404
+    
+    return app.response_class(content, mimetype='text/plain; charset=utf-8')
+
+
+# HLS 文件的 MIME 類型（mimetypes 模組不一定認得）
+HLS_MIMETYPES = {
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".ts": "video/mp2t",
+    ".m4s": "video/iso.segment",
+}
+
+
 @app.route('/outputs/<path:filename>')
 def serve_output(filename):
-    """提供輸出文件下載"""
-    return send_from_directory(config.OUTPUT_DIR, filename)
+    """提供輸出文件下載（HLS 播放清單不快取，播放器輪詢時能看到新追加的章節）"""
+    extension = os.path.splitext(filename)[1].lower()
+    response = send_from_directory(config.OUTPUT_DIR, filename, mimetype=HLS_MIMETYPES.get(extension))
+    if extension == ".m3u8":
+        response.headers["Cache-Control"] = "no-cache"
+    return response
 
 
 @app.errorhandler(404)
@@ -173,7 +465,7 @@ if __name__ == '__main__':
     
     if config.DEBUG:
         print("\n⚠️  WARNING: Running in DEBUG mode. Not for production!")
-        print("   For production, use: gunicorn -w 4 -b 0.0.0.0:5001 wsgi:app\n")
+        print("   For production, use: gunicorn -w 1 --threads 8 -b 0.0.0.0:5001 wsgi:app\n")
     
     app.run(
         host=config.HOST,
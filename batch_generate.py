@@ -0,0 +1,100 @@
+"""
+批次課程生成 - 命令列入口
+按模型分組排程，一次生成多門課程
+
+用法：
+  python batch_generate.py topics.txt               # 每行一個主題
+  python batch_generate.py topics.jsonl             # 每行一個 JSON：{"topic": ..., "target_audience": ..., "duration_minutes": ...}
+  python batch_generate.py -t "Python 入門" -t "機器學習基礎" --no-media
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+
+import config
+from orchestrator import Orchestrator
+
+
+def load_topics(path: str) -> list:
+    """
+    讀取主題列表（.jsonl 每行一個 JSON 物件，其他格式每行一個主題）
+
+    Args:
+        path: 主題文件路徑
+
+    Returns:
+        主題列表
+    """
+    topics = []
+    is_jsonl = path.endswith('.jsonl')
+
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if is_jsonl:
+                try:
+                    topics.append(json.loads(line))
+                except json.JSONDecodeError as e:
+                    print(f"⚠️ 第 {line_number} 行 JSON 無效，已跳過：{str(e)}")
+            else:
+                topics.append(line)
+
+    return topics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AI 磨課師批次課程生成")
+    parser.add_argument("input", nargs="?", help="主題文件（.txt 或 .jsonl）")
+    parser.add_argument("-t", "--topic", action="append", default=[], help="課程主題（可重複指定）")
+    parser.add_argument("--audience", default="初學者", help="預設目標受眾")
+    parser.add_argument("--duration", type=int, default=10, help="預設課程時長（分鐘）")
+    parser.add_argument("--no-media", action="store_true", help="只生成課程內容，不生成媒體文件")
+    parser.add_argument("--output-dir", default=os.path.join(config.OUTPUT_DIR, "batches"),
+                        help="批次結果輸出目錄")
+    args = parser.parse_args()
+
+    topics = list(args.topic)
+    if args.input:
+        topics.extend(load_topics(args.input))
+
+    if not topics:
+        parser.error("請提供主題文件或至少一個 --topic")
+
+    orchestrator = Orchestrator(generate_media=not args.no_media)
+    summary = orchestrator.execute_batch(
+        topics,
+        target_audience=args.audience,
+        duration_minutes=args.duration
+    )
+
+    # 保存每門課程結果與批次摘要
+    batch_dir = os.path.join(args.output_dir, datetime.now().strftime("%Y%m%d_%H%M%S"))
+    os.makedirs(batch_dir, exist_ok=True)
+
+    for index, course in enumerate(summary["courses"], 1):
+        orchestrator.save_results(course, os.path.join(batch_dir, f"course_{index:04d}.json"))
+
+    summary_file = os.path.join(batch_dir, "summary.json")
+    with open(summary_file, 'w', encoding='utf-8') as f:
+        json.dump({
+            "total": summary["total"],
+            "succeeded": summary["succeeded"],
+            "failed": summary["failed"],
+            "elapsed_time": summary["elapsed_time"],
+            "courses_per_hour": summary["courses_per_hour"],
+            "failures": [
+                {"topic": course["topic"], "error": course["error"]}
+                for course in summary["courses"] if not course["success"]
+            ]
+        }, f, ensure_ascii=False, indent=2)
+
+    print(f"📁 批次結果目錄：{batch_dir}")
+    return 0 if summary["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
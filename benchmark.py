@@ -0,0 +1,401 @@
+"""
+性能基準測試 - 使用合成課程數據測量媒體生成速度（不需要 LLM）
+
+用法：
+  python benchmark.py slides                 # 投影片渲染吞吐量（1、4、N 個進程）
+  python benchmark.py slides --slides 96 --workers 1 8
+  python benchmark.py slides --profile preview       # 以預覽解析度（640x360）渲染
+  python benchmark.py backgrounds            # 每張投影片渲染時間（逐行繪製背景 vs 快取背景）
+  python benchmark.py slide-cache            # 投影片快取：首次渲染 vs 重複生成
+  python benchmark.py vector                 # 點陣 PNG vs 向量 SVG：匯出時間與文件大小
+  python benchmark.py tts --engine espeak    # TTS 後端：每段延遲與批次吞吐量（不使用語音快取）
+  python benchmark.py video                  # 視頻編碼：moviepy 逐幀 vs ffmpeg 靜態投影片快速路徑
+  python benchmark.py memory --slides 25 100 # moviepy 合成的峰值記憶體（應不隨投影片數增長）
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict, Any, List
+
+
+def quiet():
+    """隱藏生成器的逐項日誌輸出"""
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def make_course_data(slide_count: int) -> Dict[str, Any]:
+    """
+    生成合成課程數據（標題、章節、內容投影片按比例混合）
+
+    Args:
+        slide_count: 投影片數量
+
+    Returns:
+        與 execute_pipeline 結果相同結構的課程數據
+    """
+    slides = []
+    for i in range(1, slide_count + 1):
+        if i == 1:
+            slide_type = 'title'
+        elif i % 6 == 2:
+            slide_type = 'chapter'
+        else:
+            slide_type = 'content'
+
+        slides.append({
+            "slide_id": f"slide_{i}",
+            "slide_type": slide_type,
+            "chapter_number": (i // 6) + 1,
+            "segment_id": f"seg_{(i // 6) + 1}_{i % 6}",
+            "title": f"第 {i} 張投影片：機器學習基礎概念",
+            "content": {
+                "subtitle": "從零開始的 AI 課程",
+                "text": "機器學習是人工智慧的一個分支，透過數據讓電腦自動學習規律。"
+                        "Supervised learning uses labeled examples to fit a model. " * 2,
+                "bullet_points": [
+                    "監督式學習：使用標註數據訓練模型",
+                    "非監督式學習：從未標註數據中發現結構",
+                    "Reinforcement learning: learn from rewards",
+                ]
+            }
+        })
+
+    return {
+        "success": True,
+        "topic": "benchmark",
+        "results": {
+            "visual_design": {
+                "style": {"primary_color": "#667eea"},
+                "slides": slides
+            }
+        }
+    }
+
+
+def add_production(course_data: Dict[str, Any], seconds: float) -> Dict[str, Any]:
+    """為合成課程數據加上時間軸（每張投影片一個段落，固定時長）"""
+    timeline = []
+    slides_timeline = []
+    current_time = 0.0
+    for slide in course_data["results"]["visual_design"]["slides"]:
+        entry = {"start_time": current_time, "end_time": current_time + seconds, "duration": seconds}
+        timeline.append({"segment_id": slide["segment_id"], "slide_ids": [slide["slide_id"]], **entry})
+        slides_timeline.append({"slide_id": slide["slide_id"], **entry})
+        current_time += seconds
+    course_data["results"]["production"] = {"timeline": timeline, "slides_timeline": slides_timeline}
+    return course_data
+
+
+def bench_slides(args):
+    """投影片渲染吞吐量"""
+    from generators import SlideGenerator
+
+    worker_counts: List[int] = args.workers or [1, 4, os.cpu_count() or 1]
+    course_data = make_course_data(args.slides)
+    output_dir = tempfile.mkdtemp(prefix="bench_slides_")
+
+    print(f"📊 投影片渲染基準：{args.slides} 張，{args.profile}（含 WebP 縮圖）")
+    try:
+        with quiet():
+            generator = SlideGenerator(output_dir, args.profile)
+        generator.slide_cache = None  # 測量實際渲染，不使用投影片快取
+        for workers in dict.fromkeys(worker_counts):
+            with quiet():
+                # 預熱：建立進程池並讓 worker 載入字體，不計入計時
+                generator.generate_slides(make_course_data(workers), "warmup", workers=workers)
+
+                start = time.perf_counter()
+                files = generator.generate_slides(course_data, f"bench_w{workers}", workers=workers)
+                elapsed = time.perf_counter() - start
+            print(f"  ⚡ workers={workers}: {len(files)} 張 / {elapsed:.2f} 秒 = "
+                  f"{len(files) / elapsed:.1f} slides/s")
+        generator.close()
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+def _legacy_background(bg_color: tuple, slide_type: str, width: int, height: int):
+    """舊版背景繪製：每次新建畫布，標題頁逐行繪製漸層（作為基準對照）"""
+    from PIL import Image, ImageDraw
+
+    img = Image.new('RGB', (width, height), bg_color)
+    draw = ImageDraw.Draw(img)
+    if slide_type == 'title':
+        for i in range(height):
+            alpha = int(255 * (1 - i / height * 0.3))
+            color = tuple(min(255, c + alpha // 10) for c in bg_color)
+            draw.rectangle([(0, i), (width, i + 1)], fill=color)
+    elif slide_type == 'content':
+        draw.rectangle([(0, 0), (width, 150)], fill=(0, 0, 0, 50))
+    return img
+
+
+def bench_backgrounds(args):
+    """每張投影片渲染時間：舊版逐行繪製背景 vs 快取的 NumPy 背景"""
+    from generators import SlideGenerator
+    from generators import slide_generator as slide_module
+
+    output_dir = tempfile.mkdtemp(prefix="bench_bg_")
+    slides = {slide['slide_type']: slide for slide in make_course_data(8)['results']['visual_design']['slides']}
+    bg_color = (102, 126, 234)
+
+    print(f"📊 背景畫布基準：每種投影片 {args.iterations} 次（含 PNG 編碼）")
+    try:
+        with quiet():
+            generator = SlideGenerator(output_dir, "1080p")
+        generator.thumbnail_width = 0  # 只測量投影片本身
+        filepath = os.path.join(output_dir, "bench.png")
+        cached_background = slide_module._background_canvas
+
+        for slide_type, slide in slides.items():
+            timings = {}
+            for label, background in (("before", _legacy_background), ("after", cached_background)):
+                slide_module._background_canvas = background
+                try:
+                    layout = generator._layout_text([slide])[0]
+                    generator._render_slide(slide, filepath, bg_color, layout)  # 預熱
+                    start = time.perf_counter()
+                    for _ in range(args.iterations):
+                        generator._render_slide(slide, filepath, bg_color, layout)
+                    timings[label] = (time.perf_counter() - start) / args.iterations * 1000
+                finally:
+                    slide_module._background_canvas = cached_background
+
+            print(f"  ⚡ {slide_type:<8} before {timings['before']:7.1f} ms/張  →  "
+                  f"after {timings['after']:7.1f} ms/張  ({timings['before'] / timings['after']:.2f}x)")
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+def bench_slide_cache(args):
+    """投影片快取：空快取（全部渲染）vs 已快取（硬連結到輸出目錄）"""
+    from generators import SlideGenerator
+    from generators.slide_cache import SlideCache
+    from run_context import RunContext
+
+    course_data = make_course_data(args.slides)
+    output_dir = tempfile.mkdtemp(prefix="bench_cache_")
+    cache_dir = tempfile.mkdtemp(prefix="bench_cache_store_")
+
+    print(f"📊 投影片快取基準：{args.slides} 張，1920x1080")
+    try:
+        with quiet():
+            generator = SlideGenerator(output_dir)
+        generator.slide_cache = SlideCache(cache_dir)
+        for label in ("cold", "warm"):
+            context = RunContext()
+            with quiet():
+                start = time.perf_counter()
+                files = generator.generate_slides(course_data, f"bench_{label}", workers=1, context=context)
+                elapsed = time.perf_counter() - start
+            stats = context.stats["slide_cache"]
+            print(f"  ⚡ {label}: {len(files)} 張 / {elapsed:.2f} 秒 = {len(files) / elapsed:.1f} slides/s"
+                  f"（命中 {stats['hits']}，渲染 {stats['misses']}）")
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def bench_vector(args):
+    """點陣 PNG 與向量 SVG 的匯出時間、平均文件大小"""
+    from generators import SlideGenerator, VectorSlideExporter
+
+    course_data = make_course_data(args.slides)
+    output_dir = tempfile.mkdtemp(prefix="bench_vector_")
+
+    print(f"📊 向量投影片基準：{args.slides} 張，1080p")
+    try:
+        with quiet():
+            generator = SlideGenerator(os.path.join(output_dir, "png"), "1080p")
+            generator.slide_cache = None
+            generator.thumbnail_width = 0
+            exporter = VectorSlideExporter(os.path.join(output_dir, "svg"), renderer=generator)
+
+        for label, export in (("png", lambda: generator.generate_slides(course_data, "bench", workers=1)),
+                              ("svg", lambda: exporter.export_slides(course_data, "bench"))):
+            with quiet():
+                start = time.perf_counter()
+                files = export()
+                elapsed = time.perf_counter() - start
+            size = sum(os.path.getsize(f) for f in files) / len(files) / 1024
+            print(f"  ⚡ {label}: {elapsed / len(files) * 1000:6.1f} ms/張，平均 {size:7.1f} KB/張")
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+def bench_tts(args):
+    """TTS 後端：單段合成延遲（中位數 / 最大值）與批次並行吞吐量"""
+    from generators.tts_backends import create_backend
+
+    backend = create_backend(args.engine)
+    if not backend.available():
+        print(f"❌ TTS 引擎 '{args.engine}' 不可用，請先運行 '{backend.install_hint()}'")
+        return
+
+    texts = [f"第 {i} 段：今天我們要學習人工智慧的基本概念，以及它在日常生活中的應用。"
+             for i in range(1, args.segments + 1)]
+    output_dir = tempfile.mkdtemp(prefix="bench_tts_")
+
+    print(f"📊 TTS 基準：{args.engine}，{args.segments} 段，並行數 {backend.concurrency}")
+    try:
+        latencies = []
+        with quiet():
+            for i, text in enumerate(texts):
+                start = time.perf_counter()
+                backend.synthesize(text, os.path.join(output_dir, f"serial_{i}.mp3"), 5)
+                latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        print(f"  ⚡ 單段延遲：中位數 {latencies[len(latencies) // 2] * 1000:.0f} ms，"
+              f"最大 {latencies[-1] * 1000:.0f} ms")
+
+        jobs = [(text, os.path.join(output_dir, f"batch_{i}.mp3"), 5) for i, text in enumerate(texts)]
+        with quiet():
+            start = time.perf_counter()
+            files = [f for f in backend.batch_synthesize(jobs) if f]
+            elapsed = time.perf_counter() - start
+        print(f"  ⚡ 批次合成：{len(files)} 段 / {elapsed:.2f} 秒 = {len(files) / elapsed:.1f} 段/秒")
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+def bench_video(args):
+    """視頻編碼：moviepy 逐幀合成 vs ffmpeg concat demuxer（無音軌，只比較畫面編碼）"""
+    from generators import SlideGenerator, VideoGenerator
+
+    course_data = add_production(make_course_data(args.slides), args.seconds)
+    output_dir = tempfile.mkdtemp(prefix="bench_video_")
+    total = args.slides * args.seconds
+
+    print(f"📊 視頻編碼基準：{args.slides} 張 x {args.seconds:g} 秒 = {total / 60:.1f} 分鐘，{args.profile}")
+    try:
+        with quiet():
+            generator = SlideGenerator(os.path.join(output_dir, "slides"), args.profile)
+            generator.slide_cache = None
+            generator.thumbnail_width = 0
+            slide_files = generator.generate_slides(course_data, "bench", workers=os.cpu_count() or 1)
+            generator.close()
+
+        timings = {}
+        for encoder in args.encoders:
+            with quiet(), contextlib.redirect_stderr(io.StringIO()):
+                video_generator = VideoGenerator(os.path.join(output_dir, encoder), encoder=encoder)
+                video_generator.clip_cache = None
+                start = time.perf_counter()
+                path = video_generator.generate_video(course_data, f"bench_{encoder}", slide_files, [])
+                timings[encoder] = time.perf_counter() - start
+            if not path:
+                print(f"  ❌ {encoder}: 編碼失敗")
+                continue
+            size = os.path.getsize(path) / 1024 / 1024
+            print(f"  ⚡ {encoder:<8} {timings[encoder]:7.2f} 秒（{total / timings[encoder]:6.1f}x 實時），{size:.1f} MB")
+        if "moviepy" in timings and "ffmpeg" in timings:
+            print(f"  🚀 ffmpeg 快速路徑加速：{timings['moviepy'] / timings['ffmpeg']:.1f}x")
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+def _moviepy_peak_memory(course_data: Dict[str, Any], slide_files: List[str], output_dir: str,
+                         video_profile: str):
+    """在獨立進程中以 moviepy 編碼，返回（編碼前 RSS、峰值 RSS，單位 MB）與耗時"""
+    import resource
+    from generators import VideoGenerator
+
+    with quiet(), contextlib.redirect_stderr(io.StringIO()):
+        video_generator = VideoGenerator(output_dir, encoder="moviepy", profile=video_profile)
+        baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        start = time.perf_counter()
+        path = video_generator.generate_video(course_data, "bench_memory", slide_files, [])
+        elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return bool(path), baseline, peak, elapsed
+
+
+def bench_memory(args):
+    """moviepy 合成的峰值記憶體：投影片數增加時應保持平穩（每個數量在新進程中測量）"""
+    import multiprocessing
+    from generators import SlideGenerator
+
+    counts = sorted(args.slides)
+    course_data = make_course_data(counts[-1])
+    output_dir = tempfile.mkdtemp(prefix="bench_memory_")
+
+    print(f"📊 視頻記憶體基準：moviepy 合成，{args.profile}，每張 {args.seconds:g} 秒，編碼設定 {args.video_profile}")
+    try:
+        with quiet():
+            generator = SlideGenerator(os.path.join(output_dir, "slides"), args.profile)
+            generator.slide_cache = None
+            generator.thumbnail_width = 0
+            slide_files = generator.generate_slides(course_data, "bench", workers=os.cpu_count() or 1)
+            generator.close()
+
+        spawn = multiprocessing.get_context("spawn")
+        peaks = []
+        for count in counts:
+            data = add_production(make_course_data(count), args.seconds)
+            with spawn.Pool(1) as pool:
+                ok, baseline, peak, elapsed = pool.apply(
+                    _moviepy_peak_memory,
+                    (data, slide_files[:count], os.path.join(output_dir, f"video_{count}"), args.video_profile)
+                )
+            if not ok:
+                print(f"  ❌ {count} 張: 編碼失敗")
+                continue
+            peaks.append(peak)
+            print(f"  🧠 {count:>4} 張  峰值 {peak:7.1f} MB（編碼增加 {peak - baseline:6.1f} MB），{elapsed:6.2f} 秒")
+        if len(peaks) > 1:
+            print(f"  📈 投影片數 {counts[0]} → {counts[-1]}：峰值變化 {peaks[-1] - peaks[0]:+.1f} MB")
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AI 磨課師性能基準測試")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    slides_parser = subparsers.add_parser("slides", help="投影片渲染吞吐量")
+    slides_parser.add_argument("--slides", type=int, default=48, help="投影片數量")
+    slides_parser.add_argument("--workers", type=int, nargs="+", help="要測試的進程數（預設 1、4、CPU 核心數）")
+    slides_parser.add_argument("--profile", default="1080p", help="解析度設定（preview、720p、1080p）")
+    slides_parser.set_defaults(func=bench_slides)
+
+    backgrounds_parser = subparsers.add_parser("backgrounds", help="背景畫布渲染時間（前後對照）")
+    backgrounds_parser.add_argument("--iterations", type=int, default=10, help="每種投影片的重複次數")
+    backgrounds_parser.set_defaults(func=bench_backgrounds)
+
+    cache_parser = subparsers.add_parser("slide-cache", help="投影片快取（首次渲染 vs 重複生成）")
+    cache_parser.add_argument("--slides", type=int, default=48, help="投影片數量")
+    cache_parser.set_defaults(func=bench_slide_cache)
+
+    vector_parser = subparsers.add_parser("vector", help="點陣 PNG vs 向量 SVG")
+    vector_parser.add_argument("--slides", type=int, default=24, help="投影片數量")
+    vector_parser.set_defaults(func=bench_vector)
+
+    tts_parser = subparsers.add_parser("tts", help="TTS 後端延遲與吞吐量")
+    tts_parser.add_argument("--engine", default="espeak", help="TTS 引擎（edge、gtts、espeak、silent）")
+    tts_parser.add_argument("--segments", type=int, default=16, help="語音段落數")
+    tts_parser.set_defaults(func=bench_tts)
+
+    video_parser = subparsers.add_parser("video", help="視頻編碼（moviepy vs ffmpeg）")
+    video_parser.add_argument("--slides", type=int, default=24, help="投影片數量")
+    video_parser.add_argument("--seconds", type=float, default=10, help="每張投影片的秒數")
+    video_parser.add_argument("--profile", default="1080p", help="解析度設定（preview、720p、1080p）")
+    video_parser.add_argument("--encoders", nargs="+", default=["moviepy", "ffmpeg"], help="要測試的編碼方式")
+    video_parser.set_defaults(func=bench_video)
+
+    memory_parser = subparsers.add_parser("memory", help="moviepy 合成的峰值記憶體與投影片數的關係")
+    memory_parser.add_argument("--slides", type=int, nargs="+", default=[25, 100], help="要測試的投影片數量")
+    memory_parser.add_argument("--seconds", type=float, default=1, help="每張投影片的秒數")
+    memory_parser.add_argument("--profile", default="1080p", help="解析度設定（preview、720p、1080p）")
+    memory_parser.add_argument("--video-profile", default="draft", help="編碼設定（draft、standard、archival）")
+    memory_parser.set_defaults(func=bench_memory)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -23,6 +23,7 @@ OLLAMA_MODELS = {
 OLLAMA_TEMPERATURE = 0.7
 OLLAMA_NUM_CTX = 8192      # 支持長文本處理
 OLLAMA_NUM_PREDICT = 4096  # 最大生成長度
+OLLAMA_KEEP_ALIVE = "10m"  # 模型閒置後保持常駐的時間（批次生成時避免重複載入）
 
 # ========== Gemini API 配置（備用）==========
 # 使用環境變量管理敏感資訊
@@ -44,12 +45,74 @@ OUTPUT_DIR = os.path.join(os.path.dirname(__file__), "outputs")
 SLIDES_DIR = os.path.join(OUTPUT_DIR, "slides")
 AUDIO_DIR = os.path.join(OUTPUT_DIR, "audio")
 VIDEO_DIR = os.path.join(OUTPUT_DIR, "videos")
+COURSES_DIR = os.path.join(OUTPUT_DIR, "courses")  # 課程存檔（manifest + 壓縮 blob）
 CACHE_DIR = os.path.join(os.path.dirname(__file__), ".cache")
 
 # 創建必要的目錄
-for directory in [OUTPUT_DIR, SLIDES_DIR, AUDIO_DIR, VIDEO_DIR, CACHE_DIR]:
+for directory in [OUTPUT_DIR, SLIDES_DIR, AUDIO_DIR, VIDEO_DIR, COURSES_DIR, CACHE_DIR]:
     os.makedirs(directory, exist_ok=True)
 
+# 媒體生成配置
+SLIDE_RENDER_WORKERS = int(os.getenv("SLIDE_RENDER_WORKERS", "1"))  # 投影片並行渲染進程數（1 為逐張生成）
+SLIDE_BACKGROUND_CACHE_SIZE = 16  # 背景畫布快取數量（按背景色、投影片類型、解析度）
+SLIDE_PNG_COMPRESS_LEVEL = int(os.getenv("SLIDE_PNG_COMPRESS_LEVEL", "6"))  # 投影片 PNG 壓縮等級（0-9）
+SLIDE_FRAME_HANDOFF = os.getenv("SLIDE_FRAME_HANDOFF", "False").lower() == "true"  # 投影片以記憶體陣列交給視頻編碼，PNG 背景寫出（僅 moviepy 合成使用陣列；ffmpeg 編碼時只保留背景寫出）
+SLIDE_CACHE_ENABLED = os.getenv("SLIDE_CACHE_ENABLED", "True").lower() == "true"  # 按內容雜湊快取已渲染的投影片（跨執行重用）
+SLIDE_CACHE_DIR = os.path.join(CACHE_DIR, "slides")
+SLIDE_PROFILES = {                    # 投影片解析度（版面按 1920x1080 設計網格等比縮放）
+    "preview": (640, 360),
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+}
+SLIDE_PROFILE = os.getenv("SLIDE_PROFILE", "1080p")  # 預設解析度；草稿可用 "preview" 快速預覽
+SLIDE_THUMBNAIL_WIDTH = int(os.getenv("SLIDE_THUMBNAIL_WIDTH", "320"))  # WebP 縮圖寬度（0 為不生成）
+SLIDE_VECTOR_EXPORT = os.getenv("SLIDE_VECTOR_EXPORT", "False").lower() == "true"  # 另外匯出 SVG 投影片供網頁顯示
+SLIDE_VECTOR_EMBED_FONTS = True       # SVG 內嵌字體子集（需要 fonttools）
+VECTOR_SLIDES_DIR = os.path.join(SLIDES_DIR, "vector")
+TTS_ENGINE = os.getenv("TTS_ENGINE", "edge")  # "edge"、"gtts"、"espeak"（本機離線）或 "silent"
+EDGE_TTS_VOICE = "zh-CN-XiaoxiaoNeural"  # Edge TTS 聲音（中文女聲）
+EDGE_TTS_RATE = "+0%"                 # Edge TTS 語速
+ESPEAK_VOICE = "cmn"                  # espeak-ng 聲音（普通話）
+ESPEAK_RATE = 175                     # espeak-ng 語速（每分鐘字數）
+ESPEAK_CONCURRENCY = int(os.getenv("ESPEAK_CONCURRENCY", "0"))  # 本機合成並行數（0 為 CPU 核心數）
+TTS_CACHE_ENABLED = os.getenv("TTS_CACHE_ENABLED", "True").lower() == "true"  # 按文字、聲音、語速快取合成結果（跨課程共用）
+TTS_CACHE_DIR = os.path.join(CACHE_DIR, "tts")
+TTS_CACHE_MAX_MB = int(os.getenv("TTS_CACHE_MAX_MB", "1024"))  # 語音快取磁碟上限，超過時淘汰最久未使用的條目
+TTS_CONCURRENCY = int(os.getenv("TTS_CONCURRENCY", "4"))  # 同時合成的語音段落數
+TTS_SENTENCE_CHUNKING = os.getenv("TTS_SENTENCE_CHUNKING", "True").lower() == "true"  # 長段落按句子切分後並行合成再接合
+TTS_CHUNK_MIN_CHARS = 12              # 短於此字數的句子併入下一句（避免過多零碎請求）
+TTS_SENTENCE_PAUSE_MS = int(os.getenv("TTS_SENTENCE_PAUSE_MS", "250"))  # 接合時句子之間的停頓（毫秒）
+TTS_MAX_RETRIES = 3                   # 每段語音的合成嘗試次數
+TTS_RETRY_BACKOFF = 1.0               # 重試前的等待秒數（每次加倍）
+AUDIO_TRACK_CODEC = os.getenv("AUDIO_TRACK_CODEC", "aac")  # 課程音軌編碼："aac" 或 "opus"
+AUDIO_TRACK_BITRATE = os.getenv("AUDIO_TRACK_BITRATE", "128k")  # 課程音軌位元率
+AUDIO_SAMPLE_RATE = 48000             # 課程音軌取樣率
+AUDIO_LOUDNORM = os.getenv("AUDIO_LOUDNORM", "False").lower() == "true"  # 音軌響度正規化（EBU R128）
+AUDIO_LOUDNESS_TARGET = -16.0         # 響度正規化目標（LUFS）
+AUDIO_SEGMENT_PADDING = float(os.getenv("AUDIO_SEGMENT_PADDING", "0"))  # 段落之間插入的靜音秒數
+VIDEO_ENCODER = os.getenv("VIDEO_ENCODER", "ffmpeg")  # "ffmpeg"（靜態投影片快速編碼）或 "moviepy"
+VIDEO_STILL_FPS = float(os.getenv("VIDEO_STILL_FPS", "5"))  # ffmpeg 編碼的輸出幀率（投影片靜止，低幀率即可）
+VIDEO_PROFILES = {                    # 編碼設定：x264 preset、CRF 畫質、最大高度、幀率（None 為製片方案的 video_config.fps）
+    "draft": {"preset": "ultrafast", "crf": 32, "max_height": 720, "fps": VIDEO_STILL_FPS},
+    "standard": {"preset": "medium", "crf": 23, "max_height": None, "fps": None},
+    "archival": {"preset": "slow", "crf": 18, "max_height": None, "fps": None},
+}
+VIDEO_PROFILE = os.getenv("VIDEO_PROFILE", "standard")  # 預設編碼設定（每次請求可用 video_profile 指定）
+VIDEO_DEFAULT_FPS = 24                # 製片方案未指定幀率時使用
+VIDEO_PARALLEL_ENCODE = os.getenv("VIDEO_PARALLEL_ENCODE", "True").lower() == "true"  # 按章節分段並行編碼後串流複製接合
+VIDEO_ENCODE_WORKERS = int(os.getenv("VIDEO_ENCODE_WORKERS", "0"))  # 同時編碼的分段數（0 為 CPU 核心數）
+VIDEO_PART_MAX_SECONDS = 180          # 超過此長度的章節再按投影片切分，讓並行編碼負載平均
+VIDEO_FRAME_CACHE_SIZE = 3            # moviepy 合成時保留的已解碼投影片幀數（延遲解碼的 LRU）
+VIDEO_CLIP_CACHE_ENABLED = os.getenv("VIDEO_CLIP_CACHE_ENABLED", "True").lower() == "true"  # 每段投影片的編碼結果按內容快取，重新生成只編碼改變的段落
+VIDEO_CLIP_CACHE_DIR = os.path.join(CACHE_DIR, "clips")
+VIDEO_HLS = os.getenv("VIDEO_HLS", "False").lower() == "true"  # 另外輸出 HLS 分段（每完成一章即可播放）
+VIDEO_HLS_SEGMENT_SECONDS = 6         # HLS 分段長度（秒，同時作為關鍵幀間隔）
+VIDEO_HLS_SEGMENT_TYPE = os.getenv("VIDEO_HLS_SEGMENT_TYPE", "mpegts")  # "mpegts" 或 "fmp4"
+
+# 課程存檔配置
+ARTIFACT_BLOB_MIN_CHARS = 256         # 長度達到此值的字串移出 manifest，壓縮存為 blob
+ARTIFACT_BLOB_KEYS = {"raw_response"}  # 這些欄位無論長短都存為 blob
+
 # Flask 配置
 DEBUG = os.getenv("FLASK_DEBUG", "False").lower() == "true"
 FLASK_ENV = os.getenv("FLASK_ENV", "production")
@@ -60,6 +123,14 @@ PORT = int(os.getenv("PORT", "5001"))  # 支持環境變量配置端口
 # Agent 配置
 MAX_RETRIES = 3        # API 調用重試次數
 TIMEOUT = 120          # API 調用超時時間（秒）- Ollama 需要更長時間
+REQUEST_DEADLINE_SECONDS = int(os.getenv("REQUEST_DEADLINE_SECONDS", "1800"))  # 單次課程生成的最長執行時間（秒），0 表示不限時
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))  # 同時執行的課程生成任務數（進程內工作線程）
+JOB_QUEUE_MAX = int(os.getenv("JOB_QUEUE_MAX", "50"))  # 排隊中任務的上限（0 表示不限），超過時返回 503
+JOB_HISTORY_LIMIT = 200               # 保留供狀態查詢的已結束任務數
+SSE_PORT = int(os.getenv("SSE_PORT", "5002"))  # 進度串流（asyncio SSE）端口，0 表示只由 Flask 路由提供串流
+SSE_PUBLIC_URL = os.getenv("SSE_PUBLIC_URL", "")  # 經反向代理轉發時的串流網址前綴（例如 https://example.com/sse）
+SSE_HEARTBEAT_SECONDS = 15            # 無事件時送出 keepalive 的間隔（秒）
+SSE_BUFFER_EVENTS = 500               # 每個任務緩衝的事件數（斷線重連時補送）
 
 # 性能優化
 ENABLE_STREAM = True   # 啟用流式輸出
@@ -0,0 +1,202 @@
+"""
+課程產物序列化 - 精簡的串流式課程存檔格式
+
+存檔目錄結構：
+  outputs/courses/<course_id>/
+  ├── manifest.json   # 精簡清單：課程結構 + 大型文字的引用與偏移量
+  └── blobs.gz        # 大型文字（原始回應、決策日誌、腳本全文），每段獨立壓縮
+
+manifest 中的大型字串會被替換為 {"$blob": "<key>"}，
+key 為內容的 SHA-1，相同內容（例如時間軸與 TTS 任務中重複的腳本文字）只存一份。
+顯示課程時只需讀取 manifest，需要全文時再按偏移量讀取單個 blob。
+"""
+import gzip
+import hashlib
+import json
+import os
+from typing import Dict, Any, List
+
+import config
+
+MANIFEST_FILENAME = "manifest.json"
+BLOBS_FILENAME = "blobs.gz"
+FORMAT_VERSION = 1
+
+
+class CourseArtifactWriter:
+    """課程存檔寫入器（邊遍歷邊寫入 blob，不在記憶體中保留第二份課程數據）"""
+
+    def __init__(self, artifact_dir: str, blob_min_chars: int = None,
+                 compress_level: int = 6):
+        """
+        初始化寫入器
+
+        Args:
+            artifact_dir: 存檔目錄
+            blob_min_chars: 字串長度達到此值時移出 manifest 存為 blob
+            compress_level: gzip 壓縮等級
+        """
+        if blob_min_chars is None:
+            blob_min_chars = config.ARTIFACT_BLOB_MIN_CHARS
+
+        self.artifact_dir = artifact_dir
+        self.blob_min_chars = blob_min_chars
+        self.compress_level = compress_level
+        self._blob_index: Dict[str, Dict[str, int]] = {}
+        self._blob_file = None
+        self._offset = 0
+
+    def write(self, result: Dict[str, Any],
+              decision_logs: Dict[str, List[Dict[str, Any]]] = None) -> str:
+        """
+        寫入課程存檔
+
+        Args:
+            result: execute_pipeline 的執行結果
+            decision_logs: 各 Agent 的決策日誌（逐個 Agent 序列化為 blob）
+
+        Returns:
+            manifest 文件路徑
+        """
+        os.makedirs(self.artifact_dir, exist_ok=True)
+        manifest_path = os.path.join(self.artifact_dir, MANIFEST_FILENAME)
+        blobs_path = os.path.join(self.artifact_dir, BLOBS_FILENAME)
+
+        with open(blobs_path, 'wb') as self._blob_file:
+            self._offset = 0
+            course = self._externalize(result, key=None)
+
+            logs = {}
+            for agent_name, history in (decision_logs or {}).items():
+                logs[agent_name] = self._put_blob(
+                    json.dumps(history, ensure_ascii=False, separators=(',', ':'))
+                )
+
+        manifest = {
+            "format_version": FORMAT_VERSION,
+            "blobs_file": BLOBS_FILENAME,
+            "blobs": self._blob_index,
+            "decision_logs": logs,
+            "course": course
+        }
+
+        # json.dump 以 iterencode 分塊寫入，不會先組出完整字串
+        tmp_path = manifest_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, manifest_path)
+
+        return manifest_path
+
+    def _externalize(self, value: Any, key: str = None) -> Any:
+        """遞迴替換大型字串為 blob 引用（小型值直接共用原物件，不複製）"""
+        if isinstance(value, dict):
+            return {k: self._externalize(v, k) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self._externalize(v) for v in value]
+        if isinstance(value, str):
+            if key in config.ARTIFACT_BLOB_KEYS or len(value) >= self.blob_min_chars:
+                return self._put_blob(value)
+        return value
+
+    def _put_blob(self, text: str) -> Dict[str, str]:
+        """壓縮並追加一個 blob，返回引用（相同內容只寫入一次）"""
+        data = text.encode('utf-8')
+        blob_key = hashlib.sha1(data).hexdigest()
+
+        if blob_key not in self._blob_index:
+            compressed = gzip.compress(data, compresslevel=self.compress_level)
+            self._blob_file.write(compressed)
+            self._blob_index[blob_key] = {
+                "offset": self._offset,
+                "length": len(compressed),
+                "size": len(data)
+            }
+            self._offset += len(compressed)
+
+        return {"$blob": blob_key}
+
+
+def save_course_artifact(result: Dict[str, Any], artifact_dir: str,
+                         decision_logs: Dict[str, List[Dict[str, Any]]] = None) -> str:
+    """
+    保存課程存檔
+
+    Args:
+        result: 執行結果
+        artifact_dir: 存檔目錄
+        decision_logs: 決策日誌
+
+    Returns:
+        manifest 文件路徑
+    """
+    return CourseArtifactWriter(artifact_dir).write(result, decision_logs)
+
+
+def load_course_manifest(artifact_dir: str) -> Dict[str, Any]:
+    """
+    只讀取 manifest（用於顯示課程，不讀取任何 blob）
+
+    Args:
+        artifact_dir: 存檔目錄
+
+    Returns:
+        manifest 內容
+    """
+    with open(os.path.join(artifact_dir, MANIFEST_FILENAME), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_blob(artifact_dir: str, blob_key: str, manifest: Dict[str, Any] = None) -> str:
+    """
+    按偏移量讀取並解壓單個 blob
+
+    Args:
+        artifact_dir: 存檔目錄
+        blob_key: blob 鍵（或 {"$blob": key} 引用）
+        manifest: 已載入的 manifest（避免重複讀取）
+
+    Returns:
+        blob 文字內容
+    """
+    if isinstance(blob_key, dict):
+        blob_key = blob_key["$blob"]
+    if manifest is None:
+        manifest = load_course_manifest(artifact_dir)
+
+    entry = manifest["blobs"].get(blob_key)
+    if entry is None:
+        raise KeyError(f"找不到 blob：{blob_key}")
+
+    with open(os.path.join(artifact_dir, manifest.get("blobs_file", BLOBS_FILENAME)), 'rb') as f:
+        f.seek(entry["offset"])
+        return gzip.decompress(f.read(entry["length"])).decode('utf-8')
+
+
+def load_course(artifact_dir: str, keep_refs=()) -> Dict[str, Any]:
+    """
+    讀取完整課程（還原所有 blob 引用）
+
+    Args:
+        artifact_dir: 存檔目錄
+        keep_refs: 這些欄位保留 {"$blob": key} 引用不還原（例如前端不顯示的 raw_response）
+
+    Returns:
+        與 execute_pipeline 返回值相同結構的課程數據
+    """
+    manifest = load_course_manifest(artifact_dir)
+    blobs_path = os.path.join(artifact_dir, manifest.get("blobs_file", BLOBS_FILENAME))
+
+    with open(blobs_path, 'rb') as f:
+        def resolve(value):
+            if isinstance(value, dict):
+                if set(value) == {"$blob"}:
+                    entry = manifest["blobs"][value["$blob"]]
+                    f.seek(entry["offset"])
+                    return gzip.decompress(f.read(entry["length"])).decode('utf-8')
+                return {k: v if k in keep_refs else resolve(v) for k, v in value.items()}
+            if isinstance(value, list):
+                return [resolve(v) for v in value]
+            return value
+
+        return resolve(manifest["course"])
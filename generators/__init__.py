@@ -1,14 +1,22 @@
 """
 媒體生成器模組
-包含投影片、音頻、視頻生成器
+包含投影片、音頻、視頻生成器，以及供網頁顯示的向量投影片匯出
 """
 
 from .slide_generator import SlideGenerator
 from .audio_generator import AudioGenerator
 from .video_generator import VideoGenerator
+from .frame_store import FrameStore
+from .vector_slide_exporter import VectorSlideExporter
+from .audio_assembler import AudioAssembler
+from .hls_writer import HLSWriter
 
 __all__ = [
     'SlideGenerator',
     'AudioGenerator',
-    'VideoGenerator'
+    'VideoGenerator',
+    'FrameStore',
+    'VectorSlideExporter',
+    'AudioAssembler',
+    'HLSWriter'
 ]
@@ -0,0 +1,121 @@
+"""
+音軌組裝 - 以一次 ffmpeg 濾鏡處理將所有段落音頻接合為課程音軌
+每段先補齊或截到實測時長（加上段落間停頓），段落在音軌中的起訖時間因此是精確值；
+可選的響度正規化後直接編碼為最終的 AAC / Opus，封裝視頻時不需再重新編碼
+"""
+import os
+from typing import Dict, Any, List, Optional
+
+import config
+from run_context import PipelineCancelled
+from .media_utils import remove_files, probe_duration, get_ffmpeg_exe, run_ffmpeg
+
+# 音軌編碼 -> (ffmpeg 編碼器, 副檔名)
+AUDIO_CODECS = {
+    "aac": ("aac", ".m4a"),
+    "opus": ("libopus", ".opus"),
+}
+
+
+class AudioAssembler:
+    """課程音軌組裝器"""
+
+    def __init__(self, codec: str = None, bitrate: str = None,
+                 loudnorm: bool = None, padding: float = None):
+        """
+        初始化音軌組裝器
+
+        Args:
+            codec: 音軌編碼（"aac" 或 "opus"），預設為 config.AUDIO_TRACK_CODEC
+            bitrate: 位元率，預設為 config.AUDIO_TRACK_BITRATE
+            loudnorm: 是否進行響度正規化，預設為 config.AUDIO_LOUDNORM
+            padding: 段落之間的靜音秒數，預設為 config.AUDIO_SEGMENT_PADDING
+        """
+        self.codec = codec or config.AUDIO_TRACK_CODEC
+        if self.codec not in AUDIO_CODECS:
+            raise ValueError(f"不支持的音軌編碼：{self.codec}（可用：{', '.join(AUDIO_CODECS)}）")
+        self.bitrate = bitrate or config.AUDIO_TRACK_BITRATE
+        self.loudnorm = config.AUDIO_LOUDNORM if loudnorm is None else loudnorm
+        self.padding = config.AUDIO_SEGMENT_PADDING if padding is None else padding
+
+    @property
+    def extension(self) -> str:
+        """輸出文件的副檔名"""
+        return AUDIO_CODECS[self.codec][1]
+
+    def available(self) -> bool:
+        """ffmpeg 是否可用"""
+        return get_ffmpeg_exe() is not None
+
+    def assemble(self, audio_files: List[str], output_path: str,
+                 durations: Dict[str, float] = None, context=None) -> Optional[Dict[str, Any]]:
+        """
+        組裝課程音軌
+
+        Args:
+            audio_files: 依序排列的段落音頻
+            output_path: 輸出路徑（副檔名應與編碼相符，見 extension）
+            durations: 已知的段落時長（文件路徑 -> 秒，例如 context.stats["audio_durations"]），
+                       缺少的時長以 ffmpeg 讀取
+            context: 執行上下文（取消時終止 ffmpeg 並刪除未完成的音軌）
+
+        Returns:
+            音軌資訊 {"path", "codec", "duration", "segments": [{"file", "start", "end", "duration"}]}；
+            沒有可用的音頻時為 None
+        """
+        durations = durations or {}
+        inputs = []
+        for filepath in audio_files:
+            if not os.path.exists(filepath):
+                continue
+            duration = durations.get(filepath) or probe_duration(filepath)
+            if not duration:
+                print(f"  ⚠️ 無法讀取音頻時長，已略過：{os.path.basename(filepath)}")
+                continue
+            inputs.append((filepath, duration))
+
+        if not inputs:
+            return None
+
+        # 每段的長度固定為「實測時長 + 段落間停頓」（最後一段不加停頓），起訖時間由此累加
+        segments = []
+        filters = []
+        start = 0.0
+        for index, (filepath, duration) in enumerate(inputs):
+            length = duration + (self.padding if index < len(inputs) - 1 else 0.0)
+            filters.append(
+                f"[{index}:a]aresample={config.AUDIO_SAMPLE_RATE},"
+                f"aformat=sample_fmts=fltp:channel_layouts=mono,"
+                f"apad=whole_dur={length:.6f},atrim=duration={length:.6f}[s{index}]"
+            )
+            segments.append({
+                "file": filepath,
+                "start": round(start, 3),
+                "end": round(start + duration, 3),
+                "duration": round(duration, 3)
+            })
+            start += length
+
+        chain = f"{''.join(f'[s{i}]' for i in range(len(inputs)))}concat=n={len(inputs)}:v=0:a=1"
+        if self.loudnorm:
+            # 單次（動態）響度正規化；loudnorm 內部升頻，輸出前轉回目標取樣率
+            chain += f",loudnorm=I={config.AUDIO_LOUDNESS_TARGET:g}:TP=-1.5:LRA=11,aresample={config.AUDIO_SAMPLE_RATE}"
+        filters.append(chain + "[out]")
+
+        command = [get_ffmpeg_exe(), "-y", "-loglevel", "error"]
+        for filepath, _ in inputs:
+            command += ["-i", filepath]
+        command += ["-filter_complex", ";".join(filters), "-map", "[out]",
+                    "-c:a", AUDIO_CODECS[self.codec][0], "-b:a", self.bitrate, output_path]
+
+        try:
+            run_ffmpeg(command, context, description="音軌組裝")
+        except (PipelineCancelled, RuntimeError):
+            # 取消或失敗時不留下不完整的音軌
+            remove_files([output_path])
+            raise
+
+        total = round(start, 3)
+        print(f"✅ 音軌組裝完成：{len(segments)} 段，{total:.1f} 秒（{self.codec} {self.bitrate}"
+              f"{'，已正規化響度' if self.loudnorm else ''}）")
+        return {"path": output_path, "codec": self.codec, "duration": total, "segments": segments}
@@ -1,62 +1,78 @@
 """
 音頻生成器 - 使用 TTS 將文字轉換為語音
-支持多種 TTS 引擎：Edge TTS (免費), gTTS (免費), Azure TTS (付費)
+支持多種 TTS 引擎：Edge TTS (免費), gTTS (免費), espeak-ng (本機、離線)；
+引擎實作見 tts_backends，不可用時退回靜音音頻
 """
 import os
-import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, List
-import json
+
+import config
+from run_context import PipelineCancelled
+from .media_utils import remove_files, link_or_copy, concat_audio
+from .tts_cache import TTSCache
+from .tts_backends import create_backend, split_sentences, SilentBackend, TTS_BACKENDS
 
 
 class AudioGenerator:
     """音頻生成器"""
     
-    def __init__(self, output_dir: str = None, engine: str = "edge"):
+    def __init__(self, output_dir: str = None, engine: str = None):
         """
         初始化音頻生成器
         
         Args:
             output_dir: 輸出目錄
-            engine: TTS 引擎 ("edge", "gtts", "azure")
+            engine: TTS 引擎 ("edge", "gtts", "espeak", "silent")，預設為 config.TTS_ENGINE
         """
         if output_dir is None:
             from config import AUDIO_DIR
             output_dir = AUDIO_DIR
         
         self.output_dir = output_dir
-        self.engine = engine
+        self.engine = engine or config.TTS_ENGINE
         os.makedirs(self.output_dir, exist_ok=True)
         
+        # 跨課程共用的語音快取
+        self.tts_cache = TTSCache() if config.TTS_CACHE_ENABLED else None
+        
         # 檢查依賴
         self._check_dependencies()
     
     def _check_dependencies(self):
-        """檢查並安裝必要的依賴"""
-        try:
-            if self.engine == "edge":
-                import edge_tts
-                self.tts_available = True
-            elif self.engine == "gtts":
-                from gtts import gTTS
-                self.tts_available = True
-            else:
-                self.tts_available = False
-                print(f"⚠️ TTS 引擎 '{self.engine}' 未安裝，將生成靜音音頻")
-        except ImportError:
-            self.tts_available = False
-            print(f"⚠️ TTS 依賴未安裝，將生成靜音音頻")
-            print("提示：運行 'pip install edge-tts gtts' 安裝 TTS 功能")
+        """選擇 TTS 後端，依賴未安裝時退回靜音音頻"""
+        if self.engine not in TTS_BACKENDS:
+            print(f"⚠️ TTS 引擎 '{self.engine}' 不支持，將生成靜音音頻")
+            self.backend = SilentBackend()
+        else:
+            self.backend = create_backend(self.engine)
+            if not self.backend.available():
+                print(f"⚠️ TTS 依賴未安裝，將生成靜音音頻")
+                print(f"提示：運行 '{self.backend.install_hint()}' 安裝 TTS 功能")
+                self.backend = SilentBackend()
+        
+        self.tts_available = not isinstance(self.backend, SilentBackend)
+        # 聲音與語速（同時作為語音快取鍵的一部分）
+        self.voice, self.rate = self.backend.voice, self.backend.rate
+        # 長段落按句子切分並行合成（接合時的停頓會改變輸出，因此也納入快取鍵）
+        self.chunking = config.TTS_SENTENCE_CHUNKING and self.backend.chunkable
+        self.cache_options = {"sentence_pause_ms": config.TTS_SENTENCE_PAUSE_MS} if self.chunking else None
     
-    def generate_audio(self, course_data: Dict[str, Any], course_id: str) -> List[str]:
+    def generate_audio(self, course_data: Dict[str, Any], course_id: str,
+                       context=None) -> List[str]:
         """
         生成所有音頻文件
         
         Args:
             course_data: 完整的課程數據（包含 production.tts_tasks）
             course_id: 課程 ID（用於命名文件）
+            context: 執行上下文（取消時停止合成並清理已生成的音頻）
             
         Returns:
             生成的音頻文件路徑列表
+            
+        快取命中與未命中次數記錄在 context.stats["tts_cache"]，
+        每段音頻的實測時長（秒）記錄在 context.stats["audio_durations"]（以文件路徑為鍵）
         """
         print("\n🎵 開始生成音頻...")
         
@@ -67,106 +83,163 @@ class AudioGenerator:
             print("⚠️ 沒有找到 TTS 任務")
             return []
         
-        generated_files = []
+        backend = self.backend
+        if isinstance(backend, SilentBackend) and not backend.available():
+            print("⚠️ pydub 未安裝，跳過音頻生成")
+            print("提示：運行 'pip install pydub' 安裝音頻處理功能")
+            return []
         
-        if self.engine == "edge" and self.tts_available:
-            # 使用 Edge TTS（異步）
-            generated_files = asyncio.run(self._generate_with_edge(tts_tasks, course_id))
-        elif self.engine == "gtts" and self.tts_available:
-            # 使用 gTTS（同步）
-            generated_files = self._generate_with_gtts(tts_tasks, course_id)
-        else:
-            # 生成靜音音頻（備用）
-            generated_files = self._generate_silent_audio(tts_tasks, course_id)
+        indexed_tasks = list(enumerate(tts_tasks, 1))
         
-        print(f"\n✅ 音頻生成完成！共 {len(generated_files)} 個文件")
-        return generated_files
-    
-    async def _generate_with_edge(self, tts_tasks: List[Dict], course_id: str) -> List[str]:
-        """使用 Edge TTS 生成音頻（推薦，質量好且免費）"""
-        import edge_tts
+        # 先從語音快取取得相同文字、聲音與語速的合成結果（靜音後備不使用快取）
+        cache = self.tts_cache if backend.cacheable else None
+        cache_stats = {"hits": 0, "misses": 0}
+        durations = {}
+        keys = {}
+        cached = set()
+        duplicates = {}   # 同一次執行中文字相同的段落只合成一次：輸出路徑 -> 首次出現的路徑
+        first_paths = {}
+        pending = []
+        for i, task in indexed_tasks:
+            filepath = self._task_path(task, i, course_id)
+            if cache is None:
+                pending.append((i, task))
+                continue
+            
+            keys[filepath] = cache.key(task.get('text', ''), backend.voice, backend.rate, backend.name,
+                                       self.cache_options)
+            meta = cache.fetch(keys[filepath], filepath)
+            if meta is not None:
+                cache_stats["hits"] += 1
+                cached.add(filepath)
+                durations[filepath] = meta.get("duration")
+                print(f"  ♻️ 快取命中：{os.path.basename(filepath)}")
+            elif keys[filepath] in first_paths:
+                cache_stats["hits"] += 1
+                duplicates[filepath] = first_paths[keys[filepath]]
+            else:
+                cache_stats["misses"] += 1
+                first_paths[keys[filepath]] = filepath
+                # 輸出文件可能是先前快取命中時建立的硬連結，先解除連結再合成
+                remove_files([filepath])
+                pending.append((i, task))
         
-        generated_files = []
-        voice = "zh-CN-XiaoxiaoNeural"  # 中文女聲
+        jobs = [(task.get('text', ''), self._task_path(task, i, course_id), task.get('duration', 10))
+                for i, task in pending]
+        try:
+            synthesized = [path for path in self._synthesize(jobs, context) if path] if jobs else []
+        except PipelineCancelled:
+            remove_files(self._task_path(task, i, course_id) for i, task in indexed_tasks)
+            print("🛑 音頻生成已取消，已清理部分文件")
+            raise
         
-        for i, task in enumerate(tts_tasks, 1):
-            try:
-                text = task.get('text', '')
-                task_id = task.get('task_id', f'seg_{i}')
-                filename = f"{course_id}_{task_id}.mp3"
-                filepath = os.path.join(self.output_dir, filename)
-                
-                # 生成音頻
-                communicate = edge_tts.Communicate(text, voice)
-                await communicate.save(filepath)
-                
-                generated_files.append(filepath)
-                print(f"  ✅ 已生成：{filename} ({len(text)} 字)")
-                
-            except Exception as e:
-                print(f"  ❌ 生成音頻失敗 {task.get('task_id', i)}: {str(e)}")
+        # 測量新合成音頻的時長並存入快取
+        with ThreadPoolExecutor(max_workers=max(1, config.TTS_CONCURRENCY)) as pool:
+            durations.update(zip(synthesized, pool.map(backend.duration, synthesized)))
+        for filepath in synthesized:
+            if cache is not None:
+                cache.store(keys[filepath], filepath, durations[filepath])
         
-        return generated_files
-    
-    def _generate_with_gtts(self, tts_tasks: List[Dict], course_id: str) -> List[str]:
-        """使用 gTTS 生成音頻（備選，免費但質量一般）"""
-        from gtts import gTTS
+        # 重複的段落直接連結到同一次執行中已合成的文件；首次出現的段落合成失敗時一併報告失敗
+        for filepath, source in duplicates.items():
+            if source in durations:
+                link_or_copy(source, filepath)
+                cached.add(filepath)
+                durations[filepath] = durations[source]
+            else:
+                cache_stats["hits"] -= 1
+                remove_files([filepath])
+                print(f"  ❌ 生成音頻失敗 {os.path.basename(filepath)}: "
+                      f"相同文字的段落 {os.path.basename(source)} 合成失敗")
         
-        generated_files = []
+        # 按任務順序返回（快取命中與新合成的文件）
+        done = cached.union(synthesized)
+        generated_files = [path for path in (self._task_path(task, i, course_id) for i, task in indexed_tasks)
+                           if path in done]
         
-        for i, task in enumerate(tts_tasks, 1):
-            try:
-                text = task.get('text', '')
-                task_id = task.get('task_id', f'seg_{i}')
-                filename = f"{course_id}_{task_id}.mp3"
-                filepath = os.path.join(self.output_dir, filename)
-                
-                # 生成音頻
-                tts = gTTS(text=text, lang='zh-TW', slow=False)
-                tts.save(filepath)
-                
-                generated_files.append(filepath)
-                print(f"  ✅ 已生成：{filename} ({len(text)} 字)")
-                
-            except Exception as e:
-                print(f"  ❌ 生成音頻失敗 {task.get('task_id', i)}: {str(e)}")
+        if context is not None:
+            context.stats["tts_cache"] = cache_stats
+            context.stats.setdefault("audio_durations", {}).update(durations)
         
+        failed = len(tts_tasks) - len(generated_files)
+        if failed:
+            print(f"\n⚠️ {failed} 個段落合成失敗")
+        if cache is not None:
+            print(f"\n✅ 音頻生成完成！共 {len(generated_files)} 個文件"
+                  f"（快取命中 {cache_stats['hits']}/{len(tts_tasks)}）")
+        else:
+            print(f"\n✅ 音頻生成完成！共 {len(generated_files)} 個文件")
         return generated_files
     
-    def _generate_silent_audio(self, tts_tasks: List[Dict], course_id: str) -> List[str]:
-        """生成靜音音頻（當 TTS 不可用時的後備方案）"""
+    def _synthesize(self, jobs: List[Any], context=None) -> List[Any]:
+        """
+        合成所有段落：長段落按句子切分，全部句子一起並行合成後再按段落無縫接合，
+        每段的耗時接近其中最長的一句
+
+        Args:
+            jobs: (文字, 輸出路徑, 預估時長) 列表
+            context: 執行上下文
+
+        Returns:
+            與 jobs 順序相同的輸出路徑，失敗的段落為 None
+        """
+        if not self.chunking:
+            return self.backend.batch_synthesize(jobs, context)
+
+        chunk_jobs = []
+        parts = {}   # 段落輸出路徑 -> 句子文件路徑（只有一句的段落直接寫到輸出路徑）
+        for text, filepath, duration in jobs:
+            sentences = split_sentences(text)
+            if len(sentences) == 1:
+                chunk_jobs.append((text, filepath, duration))
+                continue
+            base = os.path.splitext(filepath)[0]
+            paths = [f"{base}.part{k}.mp3" for k in range(len(sentences))]
+            parts[filepath] = paths
+            chunk_jobs.extend((sentence, path, None) for sentence, path in zip(sentences, paths))
+
+        all_parts = [path for paths in parts.values() for path in paths]
         try:
-            from pydub import AudioSegment
-            from pydub.generators import Sine
-            
-            generated_files = []
-            
-            for i, task in enumerate(tts_tasks, 1):
-                try:
-                    duration_ms = int(task.get('duration', 10) * 1000)  # 秒轉毫秒
-                    task_id = task.get('task_id', f'seg_{i}')
-                    filename = f"{course_id}_{task_id}.mp3"
-                    filepath = os.path.join(self.output_dir, filename)
-                    
-                    # 生成靜音
-                    silent = AudioSegment.silent(duration=duration_ms)
-                    silent.export(filepath, format="mp3")
-                    
-                    generated_files.append(filepath)
-                    print(f"  ⚪ 已生成靜音：{filename} ({duration_ms/1000:.1f}秒)")
-                    
-                except Exception as e:
-                    print(f"  ❌ 生成靜音音頻失敗 {task.get('task_id', i)}: {str(e)}")
-            
-            return generated_files
-            
-        except ImportError:
-            print("⚠️ pydub 未安裝，跳過音頻生成")
-            print("提示：運行 'pip install pydub' 安裝音頻處理功能")
-            return []
+            done = set(path for path in self.backend.batch_synthesize(chunk_jobs, context) if path)
+        except PipelineCancelled:
+            remove_files(all_parts)
+            raise
+
+        pause = config.TTS_SENTENCE_PAUSE_MS / 1000
+
+        def join(filepath: str):
+            # 取消後不再開始新的接合（已接合的輸出由 generate_audio 清理）
+            if context is not None:
+                context.check_cancelled()
+            paths = parts[filepath]
+            if not all(path in done for path in paths):
+                print(f"  ❌ 生成音頻失敗 {os.path.basename(filepath)}: 部分句子合成失敗")
+                return None
+            try:
+                concat_audio(paths, filepath, pause)
+            except Exception as e:
+                remove_files([filepath])
+                print(f"  ❌ 接合音頻失敗 {os.path.basename(filepath)}: {str(e)}")
+                return None
+            print(f"  🔗 已接合：{os.path.basename(filepath)}（{len(paths)} 句）")
+            return filepath
+
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, config.TTS_CONCURRENCY)) as pool:
+                joined = dict(zip(parts, pool.map(join, parts)))
+        finally:
+            remove_files(all_parts)
+
+        return [joined[filepath] if filepath in parts else (filepath if filepath in done else None)
+                for _, filepath, _ in jobs]
+    
+    def _task_path(self, task: Dict[str, Any], index: int, course_id: str) -> str:
+        """TTS 任務對應的輸出路徑"""
+        task_id = task.get('task_id', f'seg_{index}')
+        return os.path.join(self.output_dir, f"{course_id}_{task_id}.mp3")
 
 
 if __name__ == "__main__":
     # 測試代碼
     print("音頻生成器模組已載入")
-    print("支持的 TTS 引擎：edge (推薦), gtts, azure")
+    print(f"支持的 TTS 引擎：{', '.join(TTS_BACKENDS)}（edge 推薦，espeak 可離線）")
@@ -0,0 +1,127 @@
+"""
+字體註冊表 - 進程內共享的字體發現與快取
+字體路徑只探測一次，FreeTypeFont 按 (路徑, 字號) 快取，並快取每個字元的前進寬度供文字測量使用
+"""
+import os
+import platform
+import threading
+from typing import Dict, Tuple, Optional
+
+from PIL import ImageFont
+
+
+# 專案內附字體（優先）
+ASSETS_FONT = os.path.join(os.path.dirname(__file__), '..', 'assets', 'fonts', 'NotoSansTC-Bold.otf')
+
+# 各平台的系統中文字體候選
+SYSTEM_FONT_PATHS = {
+    "Windows": [
+        "C:/Windows/Fonts/msyh.ttc",
+        "C:/Windows/Fonts/simhei.ttf",
+        "C:/Windows/Fonts/simsun.ttc"
+    ],
+    "Darwin": [  # macOS
+        "/System/Library/Fonts/PingFang.ttc",
+        "/Library/Fonts/Arial Unicode.ttf"
+    ],
+    "Linux": [
+        "/usr/share/fonts/truetype/noto/NotoSansCJK-Bold.ttc",
+        "/usr/share/fonts/opentype/noto/NotoSansCJK-Bold.ttc",
+        "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
+    ]
+}
+
+_UNSET = object()
+
+
+class FontRegistry:
+    """字體註冊表（線程安全；fork 出的子進程沿用父進程已載入的字體）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._font_path = _UNSET
+        self._fonts: Dict[Tuple[Optional[str], int], ImageFont.ImageFont] = {}
+        self._advances: Dict[Tuple[str, int], Dict[str, float]] = {}
+
+    @property
+    def font_path(self) -> Optional[str]:
+        """可用的字體文件路徑（首次訪問時探測，找不到時為 None）"""
+        if self._font_path is _UNSET:
+            with self._lock:
+                if self._font_path is _UNSET:
+                    self._font_path = self._discover()
+        return self._font_path
+
+    def _discover(self) -> Optional[str]:
+        """按優先順序探測可載入的字體"""
+        candidates = [ASSETS_FONT] + SYSTEM_FONT_PATHS.get(platform.system(), SYSTEM_FONT_PATHS["Linux"])
+        for font_path in candidates:
+            if os.path.exists(font_path):
+                try:
+                    ImageFont.truetype(font_path, 12)
+                    return font_path
+                except Exception:
+                    continue
+
+        print("⚠️ 無法載入中文字體，使用預設字體")
+        return None
+
+    def get_font(self, size: int):
+        """
+        獲取指定字號的字體（同一進程內只從磁碟載入一次）
+
+        Args:
+            size: 字號
+
+        Returns:
+            FreeTypeFont（找不到字體時為 Pillow 預設字體）
+        """
+        font_path = self.font_path
+        font = self._fonts.get((font_path, size))
+        if font is not None:
+            return font
+
+        with self._lock:
+            font = self._fonts.get((font_path, size))
+            if font is None:
+                if font_path is not None:
+                    font = ImageFont.truetype(font_path, size)
+                else:
+                    font = ImageFont.load_default()
+                self._fonts[(font_path, size)] = font
+        return font
+
+    def font_key(self, font) -> Tuple[str, int]:
+        """字體的快取鍵 (路徑, 字號)"""
+        return (getattr(font, 'path', None) or 'default', getattr(font, 'size', 0))
+
+    def advance(self, font, char: str) -> float:
+        """單個字元（或字元簇）的前進寬度，按字體快取"""
+        advances = self._advances.get(self.font_key(font))
+        if advances is None:
+            advances = self._advances.setdefault(self.font_key(font), {})
+
+        width = advances.get(char)
+        if width is None:
+            width = font.getlength(char)
+            advances[char] = width
+        return width
+
+    def measure(self, text: str, font) -> float:
+        """以快取的字元寬度估算文字寬度（忽略字距調整）"""
+        return sum(self.advance(font, char) for char in text)
+
+    def _after_fork(self):
+        """fork 後重建鎖（fork 當下若有其他線程持有鎖，子進程中將永遠無法釋放）"""
+        self._lock = threading.Lock()
+
+
+_registry = FontRegistry()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_registry._after_fork)
+
+
+def get_font_registry() -> FontRegistry:
+    """獲取進程內共享的字體註冊表"""
+    return _registry
@@ -0,0 +1,105 @@
+"""
+幀緩存 - 投影片渲染結果在記憶體中直接交給視頻生成器
+視頻編碼直接使用 RGB 陣列，不必先寫 PNG 再解碼；
+供下載的 PNG 在背景線程中寫入（可設定壓縮等級）
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, List
+
+import numpy as np
+from PIL import Image
+
+
+class FrameStore:
+    """單次執行的投影片幀緩存（slide_id -> RGB 陣列）"""
+
+    def __init__(self, compress_level: int = None, write_png: bool = True, writer_threads: int = 2,
+                 keep_frames: bool = True):
+        """
+        初始化幀緩存
+
+        Args:
+            compress_level: PNG 壓縮等級（0-9，越低越快、文件越大），預設為 config.SLIDE_PNG_COMPRESS_LEVEL
+            write_png: 是否在背景寫出供下載的 PNG
+            writer_threads: 背景寫入線程數
+            keep_frames: 是否保留 RGB 陣列供視頻編碼讀取；
+                         False 時只在背景寫出 PNG，每張幀寫完即釋放（編碼器從 PNG 讀取時使用）
+        """
+        if compress_level is None:
+            import config
+            compress_level = config.SLIDE_PNG_COMPRESS_LEVEL
+
+        self.compress_level = compress_level
+        self.write_png = write_png
+        self.keep_frames = keep_frames
+        self._frames: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(max_workers=writer_threads) if write_png else None
+        self._pending: List = []
+
+    def put(self, slide_id: str, image: Image.Image, filepath: str = None, on_saved=None):
+        """
+        保存一張渲染好的投影片，並排程背景寫出 PNG
+
+        Args:
+            slide_id: 投影片 ID
+            image: 渲染結果
+            filepath: PNG 輸出路徑（None 表示文件已存在，不需寫出）
+            on_saved: PNG 寫出後在背景線程中調用（例如存入投影片快取）
+        """
+        if not self.keep_frames and not (self._writer is not None and filepath):
+            return
+        frame = np.asarray(image.convert('RGB'))
+        with self._lock:
+            if self.keep_frames:
+                self._frames[slide_id] = frame
+            if self._writer is not None and filepath:
+                self._pending.append(self._writer.submit(self._save_png, frame, filepath, on_saved))
+
+    def _save_png(self, frame: np.ndarray, filepath: str, on_saved=None):
+        """寫出 PNG（背景線程）"""
+        Image.fromarray(frame, 'RGB').save(filepath, 'PNG', compress_level=self.compress_level)
+        if on_saved is not None:
+            on_saved()
+
+    def get(self, slide_id: str) -> np.ndarray:
+        """獲取投影片的 RGB 陣列（不存在時返回 None）"""
+        return self._frames.get(slide_id)
+
+    def __contains__(self, slide_id: str) -> bool:
+        return slide_id in self._frames
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def wait(self):
+        """等待所有背景 PNG 寫入完成（之後投影片文件保證存在）"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        for future in wait(pending).done:
+            error = future.exception()
+            if error is not None:
+                print(f"  ⚠️ 投影片 PNG 寫入失敗：{str(error)}")
+
+    def discard(self):
+        """撤銷尚未開始的 PNG 寫入並等待進行中的寫入結束（用於取消執行）"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        for future in pending:
+            future.cancel()
+        wait(pending)
+
+    def release(self):
+        """釋放所有幀並停止保留之後放入的幀（PNG 照常在背景寫出）"""
+        with self._lock:
+            self.keep_frames = False
+            self._frames.clear()
+
+    def close(self):
+        """等待寫入完成並釋放所有幀"""
+        self.wait()
+        if self._writer is not None:
+            self._writer.shutdown(wait=True)
+        with self._lock:
+            self._frames.clear()
@@ -0,0 +1,146 @@
+"""
+HLS 分段輸出 - 每完成一章就切成 HLS 分段並追加到播放清單
+播放清單為 EVENT 類型，章節之間以 EXT-X-DISCONTINUITY 分隔；
+觀眾可以在後面的章節仍在編碼時開始觀看第一章，全部完成後加上 EXT-X-ENDLIST
+"""
+import math
+import os
+import shutil
+import threading
+from typing import List
+
+import config
+from .media_utils import get_ffmpeg_exe, run_ffmpeg, quote_concat_path
+
+PLAYLIST_NAME = "index.m3u8"
+SEGMENT_EXTENSIONS = {"mpegts": ".ts", "fmp4": ".m4s"}
+
+
+class HLSWriter:
+    """逐章追加的 HLS 播放清單"""
+
+    def __init__(self, output_dir: str, segment_seconds: float = None, segment_type: str = None):
+        """
+        初始化 HLS 輸出（清空目錄並寫出空的播放清單）
+
+        Args:
+            output_dir: 播放清單與分段的目錄
+            segment_seconds: 分段目標長度（秒），預設為 config.VIDEO_HLS_SEGMENT_SECONDS
+            segment_type: 分段格式（"mpegts" 或 "fmp4"），預設為 config.VIDEO_HLS_SEGMENT_TYPE
+        """
+        self.output_dir = output_dir
+        self.segment_seconds = segment_seconds or config.VIDEO_HLS_SEGMENT_SECONDS
+        self.segment_type = segment_type or config.VIDEO_HLS_SEGMENT_TYPE
+        if self.segment_type not in SEGMENT_EXTENSIONS:
+            raise ValueError(f"不支持的 HLS 分段格式：{self.segment_type}（可用：{', '.join(SEGMENT_EXTENSIONS)}）")
+
+        shutil.rmtree(self.output_dir, ignore_errors=True)
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.playlist_path = os.path.join(self.output_dir, PLAYLIST_NAME)
+        self._chapters: List[List[str]] = []
+        self._target_duration = math.ceil(self.segment_seconds)
+        self._lock = threading.Lock()
+        self._write_playlist(finished=False)
+
+    def add_chapter(self, clip_paths: List[str], audio_path: str = None,
+                    start: float = 0.0, duration: float = None, context=None):
+        """
+        將一章的視頻片段（串流複製）與對應時間範圍的音軌切成 HLS 分段，並追加到播放清單
+
+        Args:
+            clip_paths: 本章的視頻片段（參數相同、以關鍵幀開頭）
+            audio_path: 課程音軌，None 表示無音軌
+            start: 本章在課程中的起始秒數（用於截取音軌）
+            duration: 本章長度（秒）
+            context: 執行上下文
+        """
+        index = len(self._chapters)
+        chapter_dir = f"chapter_{index:03d}"
+        os.makedirs(os.path.join(self.output_dir, chapter_dir), exist_ok=True)
+        chapter_playlist = os.path.join(self.output_dir, chapter_dir, PLAYLIST_NAME)
+        list_path = os.path.join(self.output_dir, chapter_dir, "clips.ffconcat")
+
+        with open(list_path, 'w', encoding='utf-8') as f:
+            f.write("ffconcat version 1.0\n")
+            for path in clip_paths:
+                f.write(f"file {quote_concat_path(path)}\n")
+
+        command = [get_ffmpeg_exe(), "-y", "-loglevel", "error",
+                   "-f", "concat", "-safe", "0", "-i", list_path]
+        if audio_path:
+            # 音軌截取本章的時間範圍並重新編碼為 AAC（分段邊界精確，TS 也能容納）
+            command += ["-ss", f"{start:.6f}"]
+            if duration:
+                command += ["-t", f"{duration:.6f}"]
+            command += ["-i", audio_path, "-map", "0:v:0", "-map", "1:a:0",
+                        "-c:a", "aac", "-b:a", config.AUDIO_TRACK_BITRATE]
+        command += [
+            "-c:v", "copy",
+            "-f", "hls",
+            "-hls_time", f"{self.segment_seconds:g}",
+            "-hls_playlist_type", "vod",
+            "-hls_segment_type", self.segment_type,
+            "-hls_segment_filename",
+            os.path.join(self.output_dir, chapter_dir, "seg_%04d" + SEGMENT_EXTENSIONS[self.segment_type]),
+        ]
+        if self.segment_type == "fmp4":
+            command += ["-hls_fmp4_init_filename", "init.mp4"]
+        command.append(chapter_playlist)
+
+        try:
+            run_ffmpeg(command, context, description="HLS 分段")
+        finally:
+            os.remove(list_path)
+
+        # 取出本章的分段（路徑改為相對於主播放清單），追加到主播放清單；
+        # 關鍵幀在每個片段開頭重新起算，分段長度不一定等於 segment_seconds，
+        # EXT-X-TARGETDURATION 取實際最長分段的長度（無條件進位）
+        entries = []
+        target_duration = self._target_duration
+        with open(chapter_playlist, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith("#EXT-X-MAP:"):
+                    entries.append(line.replace('URI="', f'URI="{chapter_dir}/', 1))
+                elif line.startswith("#EXTINF:"):
+                    seconds = float(line.split(":", 1)[1].split(",", 1)[0])
+                    target_duration = max(target_duration, math.ceil(seconds))
+                    entries.append(line)
+                elif line and not line.startswith("#"):
+                    entries.append(f"{chapter_dir}/{line}")
+
+        with self._lock:
+            self._chapters.append(entries)
+            self._target_duration = max(self._target_duration, target_duration)
+            self._write_playlist(finished=False)
+            chapters = len(self._chapters)
+        print(f"  📺 HLS：第 {index + 1} 段已可播放（{sum(1 for e in entries if e.startswith('#EXTINF'))} 個分段）")
+        # 第一章寫入後播放清單即可播放，通知進度串流（任務狀態與前端播放器）
+        if context is not None:
+            context.emit("hls", {"playlist": self.playlist_path, "chapters": chapters})
+
+    def finish(self):
+        """所有章節完成，標記播放清單結束"""
+        with self._lock:
+            self._write_playlist(finished=True)
+
+    def _write_playlist(self, finished: bool):
+        """寫出主播放清單（先寫暫存文件再原子替換，播放器不會讀到一半的清單）"""
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:7",
+            f"#EXT-X-TARGETDURATION:{self._target_duration}",
+            "#EXT-X-MEDIA-SEQUENCE:0",
+            "#EXT-X-PLAYLIST-TYPE:EVENT",
+        ]
+        for index, entries in enumerate(self._chapters):
+            if index > 0:
+                lines.append("#EXT-X-DISCONTINUITY")
+            lines.extend(entries)
+        if finished:
+            lines.append("#EXT-X-ENDLIST")
+
+        temp_path = self.playlist_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(temp_path, self.playlist_path)
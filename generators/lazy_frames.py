@@ -0,0 +1,78 @@
+"""
+延遲解碼的投影片幀來源 - moviepy 合成時按時間取出當前投影片的畫面
+只有正在顯示的投影片才會被解碼，最近用過的幀保留在小型 LRU 中，
+記憶體用量與課程長度無關（不再為每張投影片預先建立 ImageClip）
+"""
+import bisect
+from collections import OrderedDict
+from typing import List, Tuple
+
+import numpy as np
+from PIL import Image
+
+
+class LazySlideFrames:
+    """按時間軸延遲解碼的投影片幀（供 moviepy VideoClip 的 frame_function 使用）"""
+
+    def __init__(self, schedule: List[Tuple[str, str, float]], frames=None, cache_size: int = None):
+        """
+        初始化幀來源
+
+        Args:
+            schedule: 視頻排程 [(slide_id, 投影片文件路徑, 顯示秒數)]
+            frames: 幀緩存（FrameStore），有對應的 RGB 陣列時不再解碼 PNG
+            cache_size: 保留的已解碼幀數，預設為 config.VIDEO_FRAME_CACHE_SIZE
+        """
+        if cache_size is None:
+            import config
+            cache_size = config.VIDEO_FRAME_CACHE_SIZE
+
+        self.schedule = schedule
+        self.frames = frames
+        self.cache_size = max(1, cache_size)
+        self.starts = []
+        elapsed = 0.0
+        for _, _, duration in schedule:
+            self.starts.append(elapsed)
+            elapsed += duration
+        self.duration = elapsed
+        self.decodes = 0
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._size = None
+
+    def get_frame(self, t: float) -> np.ndarray:
+        """時間 t（秒）顯示的投影片畫面（RGB 陣列）"""
+        index = min(max(bisect.bisect_right(self.starts, t) - 1, 0), len(self.schedule) - 1)
+        slide_id, path, _ = self.schedule[index]
+
+        frame = self._cache.get(path)
+        if frame is not None:
+            self._cache.move_to_end(path)
+            return frame
+
+        frame = self._decode(slide_id, path)
+        self._cache[path] = frame
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return frame
+
+    def _decode(self, slide_id: str, path: str) -> np.ndarray:
+        """解碼一張投影片（優先使用幀緩存），尺寸與第一張不同時縮放，避免編碼中途改變畫面大小"""
+        frame = self.frames.get(slide_id) if self.frames is not None else None
+        if frame is None:
+            self.decodes += 1
+            with Image.open(path) as image:
+                image = image.convert('RGB')
+                if self._size is not None and image.size != self._size:
+                    image = image.resize(self._size, Image.LANCZOS)
+                frame = np.asarray(image)
+        elif self._size is not None and (frame.shape[1], frame.shape[0]) != self._size:
+            frame = np.asarray(Image.fromarray(frame, 'RGB').resize(self._size, Image.LANCZOS))
+
+        if self._size is None:
+            self._size = (frame.shape[1], frame.shape[0])
+        return frame
+
+    def close(self):
+        """釋放已解碼的幀"""
+        self._cache.clear()
@@ -0,0 +1,142 @@
+"""
+斷行引擎 - 支援中日韓文字、拉丁文字與混排的快速斷行
+每個字元的寬度只測量一次（由字體註冊表快取），並遵守避頭尾（kinsoku）規則
+"""
+import re
+import unicodedata
+from typing import List, Tuple, Any
+
+from .font_registry import get_font_registry
+
+
+# 不可出現在行首的字元（句讀、閉括號等），溢出時懸掛在行尾
+NO_LINE_START = set(
+    "，。、；：！？）」』】》〉〕］｝…‥—ー～・％"
+    ",.;:!?)]}%'\"’”"
+    "ぁぃぅぇぉっゃゅょゎァィゥェォッャュョヮヵヶ々"
+)
+
+# 不可出現在行尾的字元（開括號等），斷行時移到下一行
+NO_LINE_END = set("（「『【《〈〔［｛([{‘“")
+
+# 拉丁單詞（含內部的撇號、連字號、小數點）視為不可分割的字元簇
+_TOKEN_PATTERN = re.compile(r"\s+|[A-Za-z0-9À-ɏ]+(?:['’\-.][A-Za-z0-9À-ɏ]+)*|.", re.DOTALL)
+
+
+class LineBreaker:
+    """斷行引擎"""
+
+    def __init__(self, registry=None):
+        """
+        初始化斷行引擎
+
+        Args:
+            registry: 字體註冊表（預設為進程共享的註冊表）
+        """
+        self.registry = registry or get_font_registry()
+
+    def tokenize(self, text: str) -> List[str]:
+        """
+        將文字切分為斷行單位：空白、拉丁單詞、單個中日韓字元或符號
+        （組合字元併入前一個單位）
+        """
+        tokens = []
+        for token in _TOKEN_PATTERN.findall(text):
+            if tokens and len(token) == 1 and unicodedata.combining(token):
+                tokens[-1] += token
+            else:
+                tokens.append(token)
+        return tokens
+
+    def measure(self, token: str, font) -> float:
+        """測量斷行單位的寬度（字元寬度來自快取）"""
+        advance = self.registry.advance
+        return sum(advance(font, char) for char in token)
+
+    def wrap(self, text: str, font, max_width: float) -> List[str]:
+        """
+        將文字斷行為不超過 max_width 的多行
+
+        Args:
+            text: 文字內容
+            font: 字體
+            max_width: 最大行寬（像素）
+
+        Returns:
+            行列表
+        """
+        lines = []
+        for paragraph in text.split('\n'):
+            lines.extend(self._wrap_paragraph(paragraph, font, max_width))
+        return [line for line in lines if line]
+
+    def wrap_batch(self, requests: List[Tuple[str, Any, float]]) -> List[List[str]]:
+        """
+        批次斷行（例如一次計算所有投影片的文字），共用同一份字元寬度快取
+
+        Args:
+            requests: (文字, 字體, 最大行寬) 列表
+
+        Returns:
+            與 requests 順序相同的行列表
+        """
+        return [self.wrap(text, font, max_width) for text, font, max_width in requests]
+
+    def _wrap_paragraph(self, text: str, font, max_width: float) -> List[str]:
+        """單一段落的貪婪斷行"""
+        lines = []
+        line: List[Tuple[str, float]] = []
+        line_width = 0.0
+
+        def flush():
+            while line and line[-1][0].isspace():
+                line.pop()
+            if line:
+                lines.append(''.join(token for token, _ in line))
+
+        for token in self.tokenize(text):
+            is_space = token.isspace()
+            if is_space:
+                if not line:
+                    continue
+                token = ' '
+
+            width = self.measure(token, font)
+
+            if line_width + width <= max_width or is_space:
+                line.append((token, width))
+                line_width += width
+                continue
+
+            # 避頭：不可出現在行首的符號懸掛在目前行尾
+            if token in NO_LINE_START and line:
+                line.append((token, width))
+                line_width += width
+                continue
+
+            # 避尾：行尾的開括號移到下一行
+            carry = []
+            while len(line) > 1 and line[-1][0] in NO_LINE_END:
+                carry.insert(0, line.pop())
+
+            flush()
+            line = carry
+            line_width = sum(w for _, w in line)
+
+            # 過長的單詞按字元拆分
+            if line_width + width > max_width and len(token) > 1:
+                for char in token:
+                    char_width = self.measure(char, font)
+                    if line and line_width + char_width > max_width:
+                        flush()
+                        line = []
+                        line_width = 0.0
+                    line.append((char, char_width))
+                    line_width += char_width
+                continue
+
+            line.append((token, width))
+            line_width += width
+
+        flush()
+        return lines
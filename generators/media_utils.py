@@ -0,0 +1,190 @@
+"""
+媒體生成共用工具
+"""
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+from typing import Iterable, List, Optional
+
+
+def remove_files(paths: Iterable[str]):
+    """刪除文件（忽略不存在或無法刪除的文件），用於清理被取消執行的部分輸出"""
+    for path in paths:
+        try:
+            if path and os.path.exists(path):
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def link_or_copy(source: str, destination: str):
+    """
+    將快取文件放到輸出路徑：優先建立硬連結，跨文件系統時改為複製
+    （目標已存在時先刪除，避免覆寫到與快取共用的 inode）
+    """
+    if os.path.lexists(destination):
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+
+
+def atomic_copy(source: str, destination: str):
+    """先複製到同目錄的暫存文件再原子替換（並行寫入同一目標也安全）"""
+    directory = os.path.dirname(destination)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    os.close(fd)
+    try:
+        shutil.copyfile(source, temp_path)
+        os.replace(temp_path, destination)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def file_digest(path: str) -> str:
+    """文件內容的 SHA-256（分塊讀取）"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def quote_concat_path(path: str) -> str:
+    """ffmpeg concat 清單中的文件路徑（絕對路徑，單引號跳脫）"""
+    return "'" + os.path.abspath(path).replace("'", "'\\''") + "'"
+
+
+def get_ffmpeg_exe() -> Optional[str]:
+    """ffmpeg 可執行文件路徑（優先使用 imageio-ffmpeg 附帶的版本，找不到時為 None）"""
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return shutil.which("ffmpeg")
+
+
+_DURATION_PATTERN = re.compile(r"Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)")
+
+
+def probe_duration(path: str) -> Optional[float]:
+    """
+    讀取音頻或視頻文件的時長（秒），只解析文件頭，不解碼內容
+
+    Returns:
+        時長；無法讀取時為 None
+    """
+    ffmpeg = get_ffmpeg_exe()
+    if not ffmpeg or not os.path.exists(path):
+        return None
+
+    try:
+        result = subprocess.run(
+            [ffmpeg, "-hide_banner", "-i", path],
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=30
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+    match = _DURATION_PATTERN.search(result.stderr.decode('utf-8', errors='replace'))
+    if not match:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def concat_audio(inputs: List[str], output: str, pause: float = 0.0, timeout: float = 300):
+    """
+    將多段音頻無縫接合為一個 MP3（解碼後接合再編碼一次，不留 MP3 幀填充造成的空隙）
+
+    Args:
+        inputs: 依序接合的音頻文件（取樣率與聲道需相同，例如同一 TTS 引擎的輸出）
+        output: 輸出的 MP3 路徑
+        pause: 相鄰兩段之間插入的靜音秒數
+        timeout: ffmpeg 逾時秒數
+
+    失敗時拋出 RuntimeError
+    """
+    ffmpeg = get_ffmpeg_exe()
+    if not ffmpeg:
+        raise RuntimeError("找不到 ffmpeg")
+
+    command = [ffmpeg, "-y", "-loglevel", "error"]
+    for path in inputs:
+        command += ["-i", path]
+
+    # 除最後一段外，每段末尾補上停頓，再以 concat 濾鏡接合
+    filters = []
+    labels = []
+    for index in range(len(inputs)):
+        if pause > 0 and index < len(inputs) - 1:
+            filters.append(f"[{index}:a]apad=pad_dur={pause:g}[p{index}]")
+            labels.append(f"[p{index}]")
+        else:
+            labels.append(f"[{index}:a]")
+    filters.append(f"{''.join(labels)}concat=n={len(inputs)}:v=0:a=1[out]")
+
+    command += ["-filter_complex", ";".join(filters), "-map", "[out]",
+                "-codec:a", "libmp3lame", "-q:a", "4", output]
+    run_ffmpeg(command, timeout=timeout, description="音頻接合")
+
+
+def run_ffmpeg(command: List[str], context=None, timeout: float = None, description: str = "ffmpeg"):
+    """
+    執行 ffmpeg 命令，期間定期檢查取消令牌（取消時終止進程並拋出 PipelineCancelled）
+
+    Args:
+        command: 完整命令（第一項為 ffmpeg 可執行文件）
+        context: 執行上下文
+        timeout: 逾時秒數（None 表示不限）
+        description: 錯誤訊息中的步驟名稱
+
+    失敗或逾時時拋出 RuntimeError
+    """
+    # 錯誤輸出寫到暫存文件，避免長時間編碼時管道緩衝區寫滿而阻塞
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=stderr)
+        deadline = time.monotonic() + timeout if timeout else None
+        try:
+            while True:
+                try:
+                    process.wait(timeout=0.2)
+                    break
+                except subprocess.TimeoutExpired:
+                    if context is not None:
+                        context.check_cancelled()
+                    if deadline is not None and time.monotonic() > deadline:
+                        raise RuntimeError(f"{description}逾時（{timeout:g} 秒）")
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+
+        if process.returncode != 0:
+            stderr.seek(0)
+            message = stderr.read().decode('utf-8', errors='replace').strip()
+            raise RuntimeError(f"{description}失敗：{message[-500:]}")
+
+
+def mux_audio(video_path: str, audio_path: str, output_path: str, context=None):
+    """
+    將已編碼的音軌與無音軌的視頻封裝為一個文件（兩者皆串流複製，不重新編碼）
+
+    Args:
+        video_path: 只有視頻軌的文件
+        audio_path: 已編碼的音軌（AAC 或 Opus）
+        output_path: 輸出文件
+        context: 執行上下文
+    """
+    run_ffmpeg(
+        [get_ffmpeg_exe(), "-y", "-loglevel", "error", "-i", video_path, "-i", audio_path,
+         "-map", "0:v:0", "-map", "1:a:0", "-c", "copy", "-movflags", "+faststart", output_path],
+        context, description="音視頻封裝"
+    )
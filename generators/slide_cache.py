@@ -0,0 +1,100 @@
+"""
+投影片快取 - 按渲染輸入的內容雜湊保存已渲染的投影片
+相同的投影片（例如「第 N 章」章節封面、重複生成的課程）跨執行直接取用，不再重新繪製與編碼
+"""
+import hashlib
+import json
+import os
+import shutil
+from typing import Dict, Any, Optional
+
+from .media_utils import link_or_copy, atomic_copy
+
+# 繪製程式碼改變時遞增，使舊的快取條目失效
+RENDER_VERSION = 1
+
+
+class SlideCache:
+    """內容定址的投影片快取（雜湊 -> PNG 文件）"""
+
+    def __init__(self, cache_dir: str = None):
+        """
+        初始化投影片快取
+
+        Args:
+            cache_dir: 快取目錄，預設為 config.SLIDE_CACHE_DIR
+        """
+        if cache_dir is None:
+            from config import SLIDE_CACHE_DIR
+            cache_dir = SLIDE_CACHE_DIR
+
+        self.cache_dir = cache_dir
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key(self, render_inputs: Dict[str, Any]) -> str:
+        """
+        計算渲染輸入的雜湊
+
+        Args:
+            render_inputs: 影響輸出像素的所有輸入（投影片類型、文字、顏色、解析度、字體等）
+
+        Returns:
+            快取鍵（SHA-256 十六進位字串）
+        """
+        payload = json.dumps(
+            {"version": RENDER_VERSION, **render_inputs},
+            ensure_ascii=False, sort_keys=True, default=list
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def path(self, key: str, suffix: str = '.png') -> str:
+        """快取條目的文件路徑（按雜湊前兩位分目錄；同一投影片的縮圖等衍生文件以 suffix 區分）"""
+        return os.path.join(self.cache_dir, key[:2], f"{key}{suffix}")
+
+    def fetch(self, key: str, filepath: str, suffix: str = '.png') -> bool:
+        """
+        將快取的投影片放到輸出路徑（優先建立硬連結，跨文件系統時改為複製）
+
+        Returns:
+            是否命中
+        """
+        cached_path = self.path(key, suffix)
+        if not os.path.exists(cached_path):
+            return False
+
+        try:
+            link_or_copy(cached_path, filepath)
+            return True
+        except OSError:
+            return False
+
+    def store(self, key: str, filepath: str, suffix: str = '.png'):
+        """
+        將剛渲染的投影片存入快取（先寫暫存文件再原子替換，並行寫入同一條目也安全）
+
+        Args:
+            key: 快取鍵
+            filepath: 已寫出的投影片 PNG（或縮圖）
+            suffix: 快取條目的副檔名
+        """
+        cached_path = self.path(key, suffix)
+        if os.path.exists(cached_path):
+            return
+
+        try:
+            atomic_copy(filepath, cached_path)
+        except OSError as e:
+            print(f"  ⚠️ 投影片快取寫入失敗：{str(e)}")
+
+    def clear(self):
+        """清空快取"""
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+
+def hit_rate(stats: Optional[Dict[str, int]]) -> float:
+    """快取命中率（0-1，沒有查詢時為 0）"""
+    if not stats:
+        return 0.0
+    total = stats.get("hits", 0) + stats.get("misses", 0)
+    return stats.get("hits", 0) / total if total else 0.0
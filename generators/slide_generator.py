@@ -2,20 +2,38 @@
 投影片生成器 - 將 JSON 配置轉換為實際的圖片檔案
 """
 import os
+import threading
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError, wait
 from typing import Dict, Any, List
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw
+import numpy as np
 import json
 
+import config
+from run_context import PipelineCancelled
+from .media_utils import remove_files
+from .font_registry import get_font_registry
+from .line_breaker import LineBreaker
+from .frame_store import FrameStore
+from .slide_cache import SlideCache
+
+
+# 設計網格：版面座標與字號以此解析度定義，其他解析度等比縮放
+DESIGN_WIDTH = 1920
+DESIGN_HEIGHT = 1080
+
 
 class SlideGenerator:
     """投影片生成器"""
     
-    def __init__(self, output_dir: str = None):
+    def __init__(self, output_dir: str = None, profile: str = None):
         """
         初始化投影片生成器
         
         Args:
             output_dir: 輸出目錄
+            profile: 解析度設定（config.SLIDE_PROFILES 中的名稱），預設為 config.SLIDE_PROFILE
         """
         if output_dir is None:
             from config import SLIDES_DIR
@@ -25,70 +43,59 @@ class SlideGenerator:
         os.makedirs(self.output_dir, exist_ok=True)
         
         # 投影片配置
-        self.width = 1920
-        self.height = 1080
+        self.profile = profile or config.SLIDE_PROFILE
+        if self.profile not in config.SLIDE_PROFILES:
+            raise ValueError(f"未知的投影片解析度設定：{self.profile}"
+                             f"（可用：{', '.join(config.SLIDE_PROFILES)}）")
+        self.width, self.height = config.SLIDE_PROFILES[self.profile]
+        self.scale = min(self.width / DESIGN_WIDTH, self.height / DESIGN_HEIGHT)
         self.default_bg_color = (102, 126, 234)  # #667eea
         self.text_color = (255, 255, 255)
+        self.thumbnail_width = config.SLIDE_THUMBNAIL_WIDTH
         
         # 載入字體（跨平台支持）
         self.title_font = self._load_font(80)
         self.subtitle_font = self._load_font(50)
         self.text_font = self._load_font(36)
         self.small_font = self._load_font(28)
-    
-    def _load_font(self, size: int):
-        """載入字體（跨平台支持）"""
-        import platform
-        import sys
-        
-        font_paths = []
-        system = platform.system()
-        
-        if system == "Windows":
-            font_paths = [
-                "C:/Windows/Fonts/msyh.ttc",
-                "C:/Windows/Fonts/simhei.ttf",
-                "C:/Windows/Fonts/simsun.ttc"
-            ]
-        elif system == "Darwin":  # macOS
-            font_paths = [
-                "/System/Library/Fonts/PingFang.ttc",
-                "/Library/Fonts/Arial Unicode.ttf"
-            ]
-        else:  # Linux
-            font_paths = [
-                "/usr/share/fonts/truetype/noto/NotoSansCJK-Bold.ttc",
-                "/usr/share/fonts/opentype/noto/NotoSansCJK-Bold.ttc",
-                "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
-            ]
-        
-        # 嘗試從 assets 目錄載入（優先）
-        assets_font = os.path.join(os.path.dirname(__file__), '..', 'assets', 'fonts', 'NotoSansTC-Bold.otf')
-        if os.path.exists(assets_font):
-            try:
-                return ImageFont.truetype(assets_font, size)
-            except:
-                pass
+        self.line_breaker = LineBreaker()
         
-        # 嘗試系統字體
-        for font_path in font_paths:
-            if os.path.exists(font_path):
-                try:
-                    return ImageFont.truetype(font_path, size)
-                except:
-                    continue
+        # 內容定址的投影片快取（跨執行共用）
+        self.slide_cache = SlideCache() if config.SLIDE_CACHE_ENABLED else None
         
-        # 如果都失敗，使用預設字體
-        print(f"⚠️ 無法載入中文字體，使用預設字體 (size={size})")
-        return ImageFont.load_default()
+        # 並行渲染進程池（首次使用時建立）
+        self._render_pool = None
+        self._render_pool_workers = 0
+        self._pool_lock = threading.Lock()
+    
+    def _load_font(self, size: int):
+        """載入字體（字號按設計網格縮放，由進程共享的字體註冊表快取）"""
+        return get_font_registry().get_font(max(1, self._px(size)))
     
-    def generate_slides(self, course_data: Dict[str, Any], course_id: str) -> List[str]:
+    def _px(self, value: float) -> int:
+        """將設計網格（1920x1080）上的座標或尺寸換算為目前解析度的像素"""
+        return int(round(value * self.scale))
+    
+    def thumbnail_path(self, filepath: str) -> str:
+        """投影片對應的 WebP 縮圖路徑（輸出目錄下的 thumbnails/）"""
+        filename = os.path.splitext(os.path.basename(filepath))[0] + '.webp'
+        return os.path.join(os.path.dirname(filepath), 'thumbnails', filename)
+    
+    def generate_slides(self, course_data: Dict[str, Any], course_id: str,
+                        workers: int = None, context=None,
+                        frame_store: FrameStore = None) -> List[str]:
         """
         生成所有投影片
         
         Args:
             course_data: 完整的課程數據（包含 visual_design）
             course_id: 課程 ID（用於命名文件）
+            workers: 並行渲染的進程數，預設為 config.SLIDE_RENDER_WORKERS（1 為逐張生成）
+            context: 執行上下文（取消時停止渲染並清理已生成的投影片）
+            frame_store: 幀緩存；提供時渲染結果直接以 RGB 陣列交給視頻生成器，
+                         PNG 改由幀緩存在背景寫出（frame_store.wait() 後文件保證存在）
+            
+        快取命中與未命中次數記錄在 context.stats["slide_cache"]
             
         Returns:
             生成的投影片文件路徑列表
@@ -99,57 +106,294 @@ class SlideGenerator:
         slides_data = visual_design.get('slides', [])
         style = visual_design.get('style', {})
         
-        # 更新背景色（如果有）
+        # 本次執行的背景色（不修改實例狀態，生成器可跨執行共用）
+        bg_color = self._background_color(style)
+        
+        # 批次計算所有投影片的斷行
+        layouts = self._layout_text(slides_data)
+        
+        # 準備渲染任務（文件名與順序與逐張生成時完全相同）
+        tasks = []
+        for i, (slide, layout) in enumerate(zip(slides_data, layouts), 1):
+            filename = f"{course_id}_slide_{slide.get('slide_id', i)}.png"
+            tasks.append((slide, os.path.join(self.output_dir, filename), bg_color, layout,
+                          frame_store is not None))
+        
+        # 按渲染輸入雜湊查詢快取，只渲染未命中的投影片
+        cache_keys = [None] * len(tasks)
+        if self.slide_cache is not None:
+            cache_keys = [self.slide_cache.key(self._render_inputs(slide, bg_color))
+                          for slide in slides_data]
+        cache_stats = {"hits": 0, "misses": 0}
+        if context is not None:
+            context.stats["slide_cache"] = cache_stats
+        
+        hits = [key is not None and self.slide_cache.fetch(key, task[1])
+                for key, task in zip(cache_keys, tasks)]
+        misses = [task for task, hit in zip(tasks, hits) if not hit]
+        if self.slide_cache is not None:
+            # 輸出文件可能是先前快取命中時建立的硬連結，先解除連結再覆寫，避免改動快取內容
+            remove_files(task[1] for task in misses)
+        
+        if workers is None:
+            workers = config.SLIDE_RENDER_WORKERS
+        
+        if workers > 1 and len(misses) > 1:
+            # 並行模式：按原順序返回結果，單張失敗不影響其他投影片
+            outcomes = self._render_parallel(misses, workers, context)
+        else:
+            outcomes = self._render_serial(misses, context)
+        
+        generated_files = []
+        try:
+            for i, (task, key, hit) in enumerate(zip(tasks, cache_keys, hits), 1):
+                slide, filepath = task[0], task[1]
+                slide_id = str(slide.get('slide_id', i))
+                
+                if hit:
+                    cache_stats["hits"] += 1
+                    self._fetch_cached_thumbnail(key, filepath)
+                    if frame_store is not None:
+                        frame_store.put(slide_id, Image.open(filepath))
+                    generated_files.append(filepath)
+                    print(f"  ♻️ 快取命中：{os.path.basename(filepath)}")
+                    if context is not None:
+                        context.report_progress(i, len(tasks), "slide")
+                    continue
+                
+                error, image = next(outcomes)
+                if key is not None:
+                    cache_stats["misses"] += 1
+                if error is None:
+                    if image is not None:
+                        on_saved = None
+                        if key is not None:
+                            on_saved = lambda key=key, filepath=filepath: self.slide_cache.store(key, filepath)
+                        frame_store.put(slide_id, image, filepath, on_saved=on_saved)
+                    elif key is not None:
+                        self.slide_cache.store(key, filepath)
+                    if key is not None and self.thumbnail_width:
+                        self.slide_cache.store(key, self.thumbnail_path(filepath), self._thumbnail_suffix())
+                    generated_files.append(filepath)
+                    print(f"  ✅ 已生成：{os.path.basename(filepath)}")
+                else:
+                    print(f"  ❌ 生成投影片失敗 {slide.get('slide_id', i)}: {error}")
+                if context is not None:
+                    context.report_progress(i, len(tasks), "slide")
+        except PipelineCancelled:
+            if frame_store is not None:
+                frame_store.discard()
+            remove_files([task[1] for task in tasks] + [self.thumbnail_path(task[1]) for task in tasks])
+            print("🛑 投影片生成已取消，已清理部分文件")
+            raise
+        
+        if self.slide_cache is not None:
+            print(f"\n✅ 投影片生成完成！共 {len(generated_files)} 張"
+                  f"（快取命中 {cache_stats['hits']}/{len(tasks)}）")
+        else:
+            print(f"\n✅ 投影片生成完成！共 {len(generated_files)} 張")
+        return generated_files
+    
+    def _background_color(self, style: Dict[str, Any]) -> tuple:
+        """由視覺風格的主色決定背景色（無效時使用預設色）"""
+        bg_color = self.default_bg_color
         if 'primary_color' in style:
             try:
                 color_hex = style['primary_color'].lstrip('#')
-                self.default_bg_color = tuple(int(color_hex[i:i+2], 16) for i in (0, 2, 4))
+                bg_color = tuple(int(color_hex[i:i+2], 16) for i in (0, 2, 4))
             except:
                 pass
+        return bg_color
+    
+    def _render_inputs(self, slide: Dict[str, Any], bg_color: tuple) -> Dict[str, Any]:
+        """
+        影響投影片像素的所有輸入（用於計算快取鍵）
         
-        generated_files = []
+        只取繪製時實際用到的欄位，slide_id 等不影響畫面的欄位不計入，
+        因此不同課程中相同的章節封面會得到相同的鍵
+        """
+        slide_type = slide.get('slide_type', 'content')
+        content = slide.get('content', {})
         
-        for i, slide in enumerate(slides_data, 1):
-            try:
-                filename = f"{course_id}_slide_{slide.get('slide_id', i)}.png"
-                filepath = os.path.join(self.output_dir, filename)
-                
-                # 根據投影片類型生成
-                slide_type = slide.get('slide_type', 'content')
-                if slide_type == 'title':
-                    self._generate_title_slide(slide, filepath)
-                elif slide_type == 'chapter':
-                    self._generate_chapter_slide(slide, filepath)
-                else:
-                    self._generate_content_slide(slide, filepath)
-                
-                generated_files.append(filepath)
-                print(f"  ✅ 已生成：{filename}")
-                
-            except Exception as e:
-                print(f"  ❌ 生成投影片失敗 {slide.get('slide_id', i)}: {str(e)}")
+        if slide_type == 'title':
+            text = {"title": slide.get('title', '課程標題'), "subtitle": content.get('subtitle', '')}
+        elif slide_type == 'chapter':
+            text = {"chapter_number": slide.get('chapter_number', 1), "title": slide.get('title', '')}
+        else:
+            slide_type = 'content'
+            text = {
+                "title": slide.get('title', ''),
+                "text": content.get('text', ''),
+                "bullet_points": content.get('bullet_points', [])[:5]
+            }
         
-        print(f"\n✅ 投影片生成完成！共 {len(generated_files)} 張")
-        return generated_files
+        font_path = get_font_registry().font_path
+        return {
+            "slide_type": slide_type,
+            "text": text,
+            "bg_color": bg_color,
+            "text_color": self.text_color,
+            "resolution": (self.width, self.height),
+            "font": {
+                "path": os.path.basename(font_path) if font_path else None,
+                "bytes": os.path.getsize(font_path) if font_path else 0,
+                "sizes": [font.size for font in (self.title_font, self.subtitle_font,
+                                                 self.text_font, self.small_font)
+                          if hasattr(font, 'size')]
+            },
+            "compress_level": config.SLIDE_PNG_COMPRESS_LEVEL
+        }
+    
+    def _render_serial(self, tasks: List[tuple], context=None):
+        """逐張渲染（每張之前檢查取消令牌）"""
+        for task in tasks:
+            if context is not None:
+                context.check_cancelled()
+            yield _render_slide_with(self, task)
+    
+    def _render_parallel(self, tasks: List[tuple], workers: int, context=None):
+        """進程池渲染，按提交順序產出結果；取消時撤銷未開始的任務"""
+        pool = self._get_render_pool(workers)
+        futures = [pool.submit(_render_slide_task, task) for task in tasks]
+        try:
+            for future in futures:
+                while True:
+                    if context is not None:
+                        context.check_cancelled()
+                    try:
+                        yield future.result(timeout=0.2)
+                        break
+                    except FutureTimeoutError:
+                        continue
+        except PipelineCancelled:
+            for future in futures:
+                future.cancel()
+            wait(futures)
+            raise
     
-    def _generate_title_slide(self, slide: Dict[str, Any], filepath: str):
+    def _get_render_pool(self, workers: int) -> ProcessPoolExecutor:
+        """獲取常駐的渲染進程池（worker 啟動時預先載入字體，跨執行重用）"""
+        with self._pool_lock:
+            if self._render_pool is None or self._render_pool_workers != workers:
+                if self._render_pool is not None:
+                    self._render_pool.shutdown(wait=True)
+                self._render_pool = ProcessPoolExecutor(
+                    max_workers=workers,
+                    initializer=_init_render_worker,
+                    initargs=(self.output_dir, self.profile)
+                )
+                self._render_pool_workers = workers
+            return self._render_pool
+    
+    def close(self):
+        """關閉渲染進程池"""
+        with self._pool_lock:
+            if self._render_pool is not None:
+                self._render_pool.shutdown(wait=True)
+                self._render_pool = None
+                self._render_pool_workers = 0
+    
+    def _render_slide(self, slide: Dict[str, Any], filepath: str, bg_color: tuple,
+                      layout: Dict[str, Any] = None):
+        """生成單張投影片並寫出 PNG 與縮圖"""
+        img = self._draw_slide(slide, bg_color, layout)
+        img.save(filepath, 'PNG', compress_level=config.SLIDE_PNG_COMPRESS_LEVEL)
+        self._save_thumbnail(img, filepath)
+    
+    def _save_thumbnail(self, img: Image.Image, filepath: str):
+        """寫出投影片的 WebP 縮圖（供網頁介面預覽）"""
+        if not self.thumbnail_width:
+            return
+        
+        thumb_path = self.thumbnail_path(filepath)
+        os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+        # 縮圖可能是快取命中時建立的硬連結，先解除連結再寫入
+        remove_files([thumb_path])
+        
+        width = min(self.thumbnail_width, img.width)
+        height = max(1, round(img.height * width / img.width))
+        thumb = img.resize((width, height), Image.LANCZOS, reducing_gap=2.0)
+        thumb.save(thumb_path, 'WEBP', quality=80)
+    
+    def _thumbnail_suffix(self) -> str:
+        """縮圖在投影片快取中的副檔名（包含縮圖寬度）"""
+        return f".thumb{self.thumbnail_width}.webp"
+    
+    def _fetch_cached_thumbnail(self, key: str, filepath: str):
+        """快取命中時取得縮圖（縮圖尚未快取時由投影片縮放後存入快取）"""
+        if not self.thumbnail_width:
+            return
+        
+        thumb_path = self.thumbnail_path(filepath)
+        os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+        if not self.slide_cache.fetch(key, thumb_path, self._thumbnail_suffix()):
+            with Image.open(filepath) as img:
+                self._save_thumbnail(img, filepath)
+            self.slide_cache.store(key, thumb_path, self._thumbnail_suffix())
+    
+    def _draw_slide(self, slide: Dict[str, Any], bg_color: tuple,
+                    layout: Dict[str, Any] = None) -> Image.Image:
+        """根據投影片類型繪製單張投影片（不寫出文件）"""
+        slide_type = slide.get('slide_type', 'content')
+        if slide_type == 'title':
+            return self._generate_title_slide(slide, bg_color)
+        elif slide_type == 'chapter':
+            return self._generate_chapter_slide(slide, bg_color)
+        else:
+            return self._generate_content_slide(slide, bg_color, layout)
+    
+    def _layout_text(self, slides: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        批次計算內容投影片的斷行（所有投影片共用同一份字元寬度快取）
+        
+        Args:
+            slides: 投影片列表
+            
+        Returns:
+            與 slides 順序相同的斷行結果（標題、章節投影片為 None）：
+            {"text_lines": [...], "bullet_lines": [[...], ...]}
+        """
+        max_width = self.width - self._px(120)
+        requests = []
+        owners = []
+        layouts = [None] * len(slides)
+        
+        for index, slide in enumerate(slides):
+            if slide.get('slide_type', 'content') in ('title', 'chapter'):
+                continue
+            layouts[index] = {"text_lines": [], "bullet_lines": []}
+            content = slide.get('content', {})
+            
+            text = content.get('text', '')
+            if text:
+                requests.append((text, self.text_font, max_width))
+                owners.append((index, "text_lines"))
+            for point in content.get('bullet_points', [])[:5]:  # 最多5個要點
+                requests.append((point, self.small_font, max_width - self._px(40)))
+                owners.append((index, "bullet_lines"))
+        
+        for (index, key), lines in zip(owners, self.line_breaker.wrap_batch(requests)):
+            if key == "text_lines":
+                layouts[index][key] = lines[:8]  # 最多8行
+            else:
+                layouts[index][key].append(lines[:2])  # 每個要點最多2行
+        
+        return layouts
+    
+    def _generate_title_slide(self, slide: Dict[str, Any],
+                              bg_color: tuple = None) -> Image.Image:
         """生成標題投影片"""
-        img = Image.new('RGB', (self.width, self.height), self.default_bg_color)
+        bg_color = bg_color or self.default_bg_color
+        img = _background_canvas(bg_color, 'title', self.width, self.height).copy()
         draw = ImageDraw.Draw(img)
         
-        # 繪製漸層效果（簡化版）
-        for i in range(self.height):
-            alpha = int(255 * (1 - i / self.height * 0.3))
-            color = tuple(min(255, c + alpha // 10) for c in self.default_bg_color)
-            draw.rectangle([(0, i), (self.width, i+1)], fill=color)
-        
         # 標題
         title = slide.get('title', '課程標題')
         bbox = draw.textbbox((0, 0), title, font=self.title_font)
         text_width = bbox[2] - bbox[0]
         text_height = bbox[3] - bbox[1]
         x = (self.width - text_width) // 2
-        y = (self.height - text_height) // 2 - 100
+        y = (self.height - text_height) // 2 - self._px(100)
         draw.text((x, y), title, fill=self.text_color, font=self.title_font)
         
         # 副標題
@@ -159,14 +403,16 @@ class SlideGenerator:
             bbox = draw.textbbox((0, 0), subtitle, font=self.subtitle_font)
             text_width = bbox[2] - bbox[0]
             x = (self.width - text_width) // 2
-            y = (self.height - text_height) // 2 + 50
+            y = (self.height - text_height) // 2 + self._px(50)
             draw.text((x, y), subtitle, fill=self.text_color, font=self.subtitle_font)
         
-        img.save(filepath, 'PNG')
+        return img
     
-    def _generate_chapter_slide(self, slide: Dict[str, Any], filepath: str):
+    def _generate_chapter_slide(self, slide: Dict[str, Any],
+                                bg_color: tuple = None) -> Image.Image:
         """生成章節投影片"""
-        img = Image.new('RGB', (self.width, self.height), self.default_bg_color)
+        bg_color = bg_color or self.default_bg_color
+        img = _background_canvas(bg_color, 'chapter', self.width, self.height).copy()
         draw = ImageDraw.Draw(img)
         
         # 章節編號
@@ -175,74 +421,112 @@ class SlideGenerator:
         bbox = draw.textbbox((0, 0), chapter_text, font=self.subtitle_font)
         text_width = bbox[2] - bbox[0]
         x = (self.width - text_width) // 2
-        draw.text((x, 300), chapter_text, fill=self.text_color, font=self.subtitle_font)
+        draw.text((x, self._px(300)), chapter_text, fill=self.text_color, font=self.subtitle_font)
         
         # 章節標題
         title = slide.get('title', '')
         bbox = draw.textbbox((0, 0), title, font=self.title_font)
         text_width = bbox[2] - bbox[0]
         x = (self.width - text_width) // 2
-        draw.text((x, 450), title, fill=self.text_color, font=self.title_font)
+        draw.text((x, self._px(450)), title, fill=self.text_color, font=self.title_font)
         
-        img.save(filepath, 'PNG')
+        return img
     
-    def _generate_content_slide(self, slide: Dict[str, Any], filepath: str):
+    def _generate_content_slide(self, slide: Dict[str, Any], bg_color: tuple = None,
+                                layout: Dict[str, Any] = None) -> Image.Image:
         """生成內容投影片"""
-        img = Image.new('RGB', (self.width, self.height), self.default_bg_color)
+        bg_color = bg_color or self.default_bg_color
+        layout = layout or self._layout_text([slide])[0]
+        img = _background_canvas(bg_color, 'content', self.width, self.height).copy()
         draw = ImageDraw.Draw(img)
         
-        # 標題區域
+        # 標題區域（標題欄背景已包含在背景畫布中）
         title = slide.get('title', '')
-        draw.rectangle([(0, 0), (self.width, 150)], fill=(0, 0, 0, 50))
-        draw.text((60, 50), title, fill=self.text_color, font=self.subtitle_font)
+        px = self._px
+        draw.text((px(60), px(50)), title, fill=self.text_color, font=self.subtitle_font)
         
-        # 內容區域
-        content = slide.get('content', {})
-        y_offset = 220
+        # 內容區域（斷行結果已在 _layout_text 中批次計算）
+        y_offset = px(220)
         
         # 主要文字
-        text = content.get('text', '')
-        if text:
-            # 文字換行處理
-            max_width = self.width - 120
-            lines = self._wrap_text(text, self.text_font, max_width)
-            for line in lines[:8]:  # 最多8行
-                draw.text((60, y_offset), line, fill=self.text_color, font=self.text_font)
-                y_offset += 50
+        for line in layout["text_lines"]:
+            draw.text((px(60), y_offset), line, fill=self.text_color, font=self.text_font)
+            y_offset += px(50)
         
         # 要點列表
-        bullet_points = content.get('bullet_points', [])
-        if bullet_points:
-            y_offset += 30
-            for point in bullet_points[:5]:  # 最多5個要點
-                draw.ellipse([(60, y_offset + 15), (75, y_offset + 30)], fill=self.text_color)
-                point_lines = self._wrap_text(point, self.small_font, max_width - 40)
-                for line in point_lines[:2]:  # 每個要點最多2行
-                    draw.text((100, y_offset), line, fill=self.text_color, font=self.small_font)
-                    y_offset += 40
-        
-        img.save(filepath, 'PNG')
+        if layout["bullet_lines"]:
+            y_offset += px(30)
+            for point_lines in layout["bullet_lines"]:
+                draw.ellipse([(px(60), y_offset + px(15)), (px(75), y_offset + px(30))], fill=self.text_color)
+                for line in point_lines:
+                    draw.text((px(100), y_offset), line, fill=self.text_color, font=self.small_font)
+                    y_offset += px(40)
+        
+        return img
     
     def _wrap_text(self, text: str, font, max_width: int) -> List[str]:
-        """文字換行處理"""
-        words = text.split()
-        lines = []
-        current_line = []
-        
-        for word in words:
-            test_line = ' '.join(current_line + [word])
-            bbox = ImageDraw.Draw(Image.new('RGB', (1, 1))).textbbox((0, 0), test_line, font=font)
-            if bbox[2] - bbox[0] <= max_width:
-                current_line.append(word)
-            else:
-                if current_line:
-                    lines.append(' '.join(current_line))
-                current_line = [word]
-        
-        if current_line:
-            lines.append(' '.join(current_line))
-        
-        return lines
+        """文字換行處理（支援中日韓文字與避頭尾規則）"""
+        return self.line_breaker.wrap(text, font, max_width)
+
+
+@lru_cache(maxsize=config.SLIDE_BACKGROUND_CACHE_SIZE)
+def _background_canvas(bg_color: tuple, slide_type: str, width: int, height: int) -> Image.Image:
+    """
+    生成投影片背景畫布（按背景色、投影片類型、解析度快取，調用方需 copy() 後再繪製）
+    
+    - title：由上到下逐漸變暗的漸層
+    - content：純色背景 + 頂部標題欄（高度按設計網格縮放）
+    - 其他：純色背景
+    """
+    canvas = np.empty((height, width, 3), dtype=np.uint8)
+    
+    if slide_type == 'title':
+        # 每一行的顏色：min(255, c + alpha // 10)，alpha 隨行號線性遞減
+        rows = np.arange(height)
+        alpha = (255 * (1 - rows / height * 0.3)).astype(np.int64)
+        row_colors = np.minimum(255, np.asarray(bg_color, dtype=np.int64)[None, :] + (alpha // 10)[:, None])
+        canvas[:] = row_colors.astype(np.uint8)[:, None, :]
+    else:
+        canvas[:] = bg_color
+        if slide_type == 'content':
+            canvas[:round(151 * height / DESIGN_HEIGHT)] = 0
+    
+    return Image.fromarray(canvas, 'RGB')
+
+
+# ========== 並行渲染（進程池 worker）==========
+# 每個 worker 進程持有一個 SlideGenerator，字體在 worker 啟動時載入一次
+_worker_generator = None
+
+
+def _init_render_worker(output_dir: str, profile: str):
+    """進程池 worker 初始化：預先建立生成器並載入字體"""
+    global _worker_generator
+    _worker_generator = SlideGenerator(output_dir, profile)
+
+
+def _render_slide_with(generator: SlideGenerator, task: tuple):
+    """
+    渲染單張投影片
+    
+    Returns:
+        (錯誤訊息, 圖像)：成功時錯誤訊息為 None；需要交給幀緩存時返回圖像而不寫出 PNG
+    """
+    slide, filepath, bg_color, layout, return_frame = task
+    try:
+        if return_frame:
+            image = generator._draw_slide(slide, bg_color, layout)
+            generator._save_thumbnail(image, filepath)
+            return None, image
+        generator._render_slide(slide, filepath, bg_color, layout)
+        return None, None
+    except Exception as e:
+        return str(e), None
+
+
+def _render_slide_task(task: tuple):
+    """進程池任務入口"""
+    return _render_slide_with(_worker_generator, task)
 
 
 if __name__ == "__main__":
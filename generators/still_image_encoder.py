@@ -0,0 +1,229 @@
+"""
+靜態投影片編碼 - 以 ffmpeg concat demuxer 直接按每張投影片的時長編碼
+每張投影片只解碼一次，由 ffmpeg 以低幀率重複輸出（-tune stillimage），
+不必把每一幀都經過 Python 傳給 x264；音軌串流複製。
+長課程可按章節分段並行編碼（參數完全相同），再以串流複製接合，不需第二次編碼
+"""
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from typing import Callable, List, Tuple
+
+import config
+from run_context import PipelineCancelled
+from .media_utils import remove_files, get_ffmpeg_exe, run_ffmpeg, quote_concat_path
+
+# 編碼排程的項目：(投影片圖片路徑, 顯示秒數)
+ScheduleEntry = Tuple[str, float]
+
+
+def write_concat_list(entries: List[ScheduleEntry], list_path: str):
+    """
+    寫出 ffmpeg concat demuxer 的清單文件（每張圖片附顯示時長）
+
+    concat demuxer 會忽略最後一項的 duration，因此最後一張圖片重複列出一次
+    """
+    lines = ["ffconcat version 1.0"]
+    for path, duration in entries:
+        lines.append(f"file {quote_concat_path(path)}")
+        lines.append(f"duration {duration:.6f}")
+    lines.append(f"file {quote_concat_path(entries[-1][0])}")
+    with open(list_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def quantize_durations(durations: List[float], fps: float) -> List[float]:
+    """
+    將每張投影片的起訖時間對齊到幀邊界（按累計時間取整，誤差不累積）
+
+    分段編碼時每段的長度因此都是整數幀，接合後與單次編碼的時間軸完全一致；
+    對齊後可能為 0（短於半幀的投影片），呼叫端應略過
+    """
+    aligned = []
+    elapsed = 0.0
+    previous_frame = 0
+    for duration in durations:
+        elapsed += duration
+        frame = round(elapsed * fps)
+        aligned.append((frame - previous_frame) / fps)
+        previous_frame = frame
+    return aligned
+
+
+class StillImageEncoder:
+    """靜態投影片視頻編碼器（ffmpeg）"""
+
+    def __init__(self, fps: float = None, preset: str = None, crf: int = None,
+                 size: Tuple[int, int] = None, keyframe_interval: float = None):
+        """
+        初始化編碼器（未指定的參數取自 config.VIDEO_PROFILE 編碼設定）
+
+        Args:
+            fps: 輸出幀率（投影片靜止，低幀率即可）
+            preset: x264 preset
+            crf: x264 CRF 畫質
+            size: 輸出寬高（None 表示沿用投影片尺寸）
+            keyframe_interval: 固定的關鍵幀間隔秒數（HLS 分段對齊用，None 由 x264 決定）
+        """
+        profile = config.VIDEO_PROFILES.get(config.VIDEO_PROFILE, config.VIDEO_PROFILES["standard"])
+        self.fps = fps or profile["fps"] or config.VIDEO_DEFAULT_FPS
+        self.preset = preset or profile["preset"]
+        self.crf = crf if crf is not None else profile["crf"]
+        self.size = size
+        self.keyframe_interval = keyframe_interval
+
+    def available(self) -> bool:
+        """ffmpeg 是否可用"""
+        return get_ffmpeg_exe() is not None
+
+    def encode(self, entries: List[ScheduleEntry], output_path: str,
+               audio_path: str = None, context=None, threads: int = None) -> str:
+        """
+        編碼視頻
+
+        Args:
+            entries: (投影片圖片路徑, 顯示秒數) 列表，按播放順序（時長應已對齊幀邊界）
+            output_path: 輸出的 MP4 路徑
+            audio_path: 已編碼的音軌（串流複製封裝），None 表示無音軌
+            context: 執行上下文（取消時終止 ffmpeg 並刪除未完成的視頻）
+            threads: x264 線程數（None 由 x264 自動決定）
+
+        Returns:
+            輸出路徑；失敗時拋出 RuntimeError
+        """
+        if not entries:
+            raise RuntimeError("沒有可編碼的投影片")
+
+        fd, list_path = tempfile.mkstemp(prefix="slides_", suffix=".ffconcat",
+                                         dir=os.path.dirname(output_path) or None)
+        os.close(fd)
+        try:
+            write_concat_list(entries, list_path)
+
+            command = [get_ffmpeg_exe(), "-y", "-loglevel", "error",
+                       "-f", "concat", "-safe", "0", "-i", list_path]
+            if audio_path:
+                command += ["-i", audio_path]
+            # 先縮放與轉換色彩格式（每張投影片一次），再由 fps 濾鏡重複幀；x264 需要偶數寬高
+            scale = f"scale={self.size[0]}:{self.size[1]}" if self.size else "scale=trunc(iw/2)*2:trunc(ih/2)*2"
+            command += [
+                "-map", "0:v:0",
+                "-vf", f"{scale},format=yuv420p,fps={self.fps:g}",
+                "-c:v", "libx264", "-preset", self.preset, "-tune", "stillimage", "-crf", str(self.crf),
+            ]
+            if self.keyframe_interval:
+                command += ["-force_key_frames", f"expr:gte(t,n_forced*{self.keyframe_interval:g})"]
+            if threads:
+                command += ["-threads", str(threads)]
+            if audio_path:
+                command += ["-map", "1:a:0", "-c:a", "copy"]
+            # 清單最後重複列出的圖片會讓 fps 濾鏡多輸出一幀，按排程總長截斷（分段接合後不累積誤差）
+            total = sum(duration for _, duration in entries)
+            command += ["-t", f"{total:.6f}", "-movflags", "+faststart", output_path]
+
+            run_ffmpeg(command, context, description="視頻編碼")
+        except (PipelineCancelled, RuntimeError):
+            remove_files([output_path])
+            raise
+        finally:
+            remove_files([list_path])
+
+        return output_path
+
+    def encode_parts(self, parts: List[List[ScheduleEntry]], output_path: str,
+                     audio_path: str = None, context=None, workers: int = None,
+                     threads: int = None) -> str:
+        """
+        分段並行編碼後以串流複製接合（同時封裝音軌）
+
+        Args:
+            parts: 各段的 (投影片圖片路徑, 顯示秒數) 列表（例如每章一段）
+            output_path: 輸出的 MP4 路徑
+            audio_path: 已編碼的音軌，None 表示無音軌
+            context: 執行上下文（取消時終止所有 ffmpeg 並刪除分段文件）
+            workers: 同時編碼的段數，預設為可用線程數
+            threads: 本次編碼可用的 x264 線程總數（平均分給各段），預設為 CPU 核心數
+
+        Returns:
+            輸出路徑；失敗時拋出 RuntimeError
+        """
+        threads = threads or os.cpu_count() or 1
+
+        base = os.path.splitext(output_path)[0]
+        part_paths = [f"{base}.part{index}.mp4" for index in range(len(parts))]
+
+        try:
+            self.encode_many(list(zip(parts, part_paths)), context, workers or threads, threads)
+            self.concat(part_paths, output_path, audio_path, context)
+        finally:
+            remove_files(part_paths)
+
+        return output_path
+
+    def encode_many(self, jobs: List[Tuple[List[ScheduleEntry], str]], context=None,
+                    workers: int = 1, threads: int = None, on_done: Callable[[int], None] = None):
+        """
+        並行編碼多個獨立片段（每個片段只有視頻軌，參數完全相同，可直接串流複製接合）
+
+        Args:
+            jobs: (片段的投影片排程, 輸出路徑) 列表
+            context: 執行上下文
+            workers: 同時編碼的片段數
+            threads: x264 線程總數（平均分給各片段）
+            on_done: 每個片段完成時以其在 jobs 中的索引調用（在調用者的線程中）
+        """
+        workers = max(1, min(workers, len(jobs)))
+        per_job = max(1, (threads or os.cpu_count() or 1) // workers)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(self.encode, entries, path, None, context, per_job): index
+                       for index, (entries, path) in enumerate(jobs)}
+            try:
+                for future in as_completed(futures):
+                    future.result()
+                    if on_done is not None:
+                        on_done(futures[future])
+            except BaseException:
+                # 一段失敗或取消時撤銷未開始的片段，並等待進行中的 ffmpeg 結束
+                for future in futures:
+                    future.cancel()
+                wait(futures)
+                remove_files(path for _, path in jobs)
+                raise
+
+    def concat(self, clip_paths: List[str], output_path: str, audio_path: str = None, context=None) -> str:
+        """
+        以串流複製接合參數相同的片段（同時封裝音軌），不重新編碼
+
+        Args:
+            clip_paths: 依序接合的片段
+            output_path: 輸出的 MP4 路徑
+            audio_path: 已編碼的音軌，None 表示無音軌
+            context: 執行上下文
+        """
+        list_path = f"{os.path.splitext(output_path)[0]}.clips.ffconcat"
+        try:
+            with open(list_path, 'w', encoding='utf-8') as f:
+                f.write("ffconcat version 1.0\n")
+                for path in clip_paths:
+                    f.write(f"file {quote_concat_path(path)}\n")
+
+            command = [get_ffmpeg_exe(), "-y", "-loglevel", "error",
+                       "-f", "concat", "-safe", "0", "-i", list_path]
+            if audio_path:
+                command += ["-i", audio_path, "-map", "0:v:0", "-map", "1:a:0"]
+            command += ["-c", "copy", "-movflags", "+faststart", output_path]
+            run_ffmpeg(command, context, description="片段接合")
+        except (PipelineCancelled, RuntimeError):
+            remove_files([output_path])
+            raise
+        finally:
+            remove_files([list_path])
+
+        return output_path
+
+    @property
+    def settings(self) -> dict:
+        """影響編碼結果的參數（用於片段快取鍵）"""
+        return {"fps": self.fps, "preset": self.preset, "crf": self.crf,
+                "size": list(self.size) if self.size else None, "codec": "libx264", "tune": "stillimage",
+                "keyframe_interval": self.keyframe_interval, "trimmed": True}
@@ -0,0 +1,408 @@
+"""
+TTS 後端 - 語音合成引擎的統一介面
+每個後端提供單段合成、批次合成（有上限的並行 + 失敗退避重試）、時長測量與能力描述；
+AudioGenerator 只負責快取與文件命名，不再依引擎名稱分支
+"""
+import asyncio
+import os
+import re
+import shutil
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Dict, Any, List, Optional, Tuple
+
+import config
+from run_context import PipelineCancelled
+from .media_utils import remove_files, probe_duration, get_ffmpeg_exe
+
+# 批次合成的工作項：(朗讀文字, 輸出路徑, 預估時長秒數)
+SynthesisJob = Tuple[str, str, Optional[float]]
+
+# 句末標點（含其後的引號、括號）或換行視為句子邊界
+_SENTENCE_END = re.compile(r"[。！？!?；;…]+[」』”’）)\]]*|\.(?=\s)|\n+")
+
+
+def split_sentences(text: str, min_chars: int = None) -> List[str]:
+    """
+    在句子邊界切分朗讀文字（標點保留在句尾）
+
+    Args:
+        text: 朗讀文字
+        min_chars: 短於此字數的句子併入下一句，預設為 config.TTS_CHUNK_MIN_CHARS
+
+    Returns:
+        句子列表（沒有邊界時為只含原文的列表）
+    """
+    if min_chars is None:
+        min_chars = config.TTS_CHUNK_MIN_CHARS
+
+    sentences = []
+    start = 0
+    for match in _SENTENCE_END.finditer(text):
+        sentences.append(text[start:match.end()])
+        start = match.end()
+    sentences.append(text[start:])
+
+    chunks = []
+    buffer = ""
+    for sentence in sentences:
+        buffer += sentence
+        if len(buffer.strip()) >= min_chars:
+            chunks.append(buffer.strip())
+            buffer = ""
+    if buffer.strip():
+        # 結尾的短句併入上一句
+        if chunks:
+            chunks[-1] += buffer.rstrip()
+        else:
+            chunks.append(buffer.strip())
+    return chunks or [text]
+
+
+class TTSBackend:
+    """TTS 後端基底類別（子類別實作 synthesize）"""
+
+    name = "base"
+    voice = ""
+    rate = ""
+    network = False      # 是否需要網路
+    cacheable = True     # 合成結果是否可寫入語音快取
+    chunkable = True     # 是否可按句子切分後並行合成
+
+    @property
+    def concurrency(self) -> int:
+        """批次合成時的最大並行數"""
+        return max(1, config.TTS_CONCURRENCY)
+
+    @property
+    def capabilities(self) -> Dict[str, Any]:
+        """後端能力描述"""
+        return {
+            "name": self.name,
+            "voice": self.voice,
+            "rate": self.rate,
+            "network": self.network,
+            "cacheable": self.cacheable,
+            "chunkable": self.chunkable,
+            "concurrency": self.concurrency,
+            "format": "mp3"
+        }
+
+    def available(self) -> bool:
+        """依賴是否已安裝"""
+        return True
+
+    def install_hint(self) -> str:
+        """依賴未安裝時的提示"""
+        return ""
+
+    def synthesize(self, text: str, filepath: str, duration: float = None):
+        """
+        合成單段語音（阻塞），失敗時拋出異常
+
+        Args:
+            text: 朗讀文字
+            filepath: 輸出的 MP3 路徑
+            duration: 預估時長（秒），只有不朗讀文字的後端會使用
+        """
+        raise NotImplementedError
+
+    def duration(self, filepath: str) -> Optional[float]:
+        """實測音頻時長（秒）"""
+        return probe_duration(filepath)
+
+    def report(self, text: str, filepath: str, duration: float = None):
+        """單段合成完成的日誌"""
+        print(f"  ✅ 已生成：{os.path.basename(filepath)} ({len(text)} 字)")
+
+    def batch_synthesize(self, jobs: List[SynthesisJob], context=None) -> List[Optional[str]]:
+        """
+        以線程池並行合成（每段失敗時退避重試）
+
+        Args:
+            jobs: (文字, 輸出路徑, 預估時長) 列表
+            context: 執行上下文（取消時撤銷未開始的工作）
+
+        Returns:
+            與 jobs 順序相同的輸出路徑，失敗的工作為 None
+        """
+        def run(job: SynthesisJob) -> Optional[str]:
+            text, filepath, duration = job
+
+            def attempt():
+                self.synthesize(text, filepath, duration)
+                self.report(text, filepath, duration)
+                return filepath
+
+            def backoff(delay: float):
+                if context is not None:
+                    if context.cancel_token.wait(delay):
+                        context.check_cancelled()
+                else:
+                    time.sleep(delay)
+
+            return _with_retries(attempt, filepath, backoff, context)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            futures = [pool.submit(run, job) for job in jobs]
+            try:
+                results = []
+                for future in futures:
+                    while True:
+                        if context is not None:
+                            context.check_cancelled()
+                        try:
+                            results.append(future.result(timeout=0.2))
+                            break
+                        except FutureTimeoutError:
+                            continue
+                    if context is not None:
+                        context.report_progress(len(results), len(jobs), "tts_task")
+            except PipelineCancelled:
+                for future in futures:
+                    future.cancel()
+                raise
+
+        return results
+
+
+def _with_retries(attempt, filepath: str, backoff, context=None):
+    """執行合成，失敗時刪除部分輸出並按指數退避重試；用盡次數後返回 None"""
+    for index in range(config.TTS_MAX_RETRIES):
+        if context is not None:
+            context.check_cancelled()
+        try:
+            return attempt()
+        except PipelineCancelled:
+            raise
+        except Exception as e:
+            remove_files([filepath])
+            if index == config.TTS_MAX_RETRIES - 1:
+                print(f"  ❌ 生成音頻失敗 {os.path.basename(filepath)}: {str(e)}")
+                return None
+            delay = config.TTS_RETRY_BACKOFF * (2 ** index)
+            print(f"  ⚠️ {os.path.basename(filepath)} 合成失敗，{delay:.1f} 秒後重試：{str(e)}")
+            backoff(delay)
+
+
+class EdgeTTSBackend(TTSBackend):
+    """Edge TTS（推薦，質量好且免費；需要網路）"""
+
+    name = "edge"
+    network = True
+
+    def __init__(self, voice: str = None, rate: str = None):
+        self.voice = voice or config.EDGE_TTS_VOICE
+        self.rate = rate or config.EDGE_TTS_RATE
+
+    def available(self) -> bool:
+        try:
+            import edge_tts  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def install_hint(self) -> str:
+        return "pip install edge-tts"
+
+    def synthesize(self, text: str, filepath: str, duration: float = None):
+        asyncio.run(self._save(text, filepath))
+
+    async def _save(self, text: str, filepath: str, context=None):
+        import edge_tts
+        communicate = edge_tts.Communicate(text, self.voice, rate=self.rate)
+        await _await_cancellable(communicate.save(filepath), context)
+
+    def batch_synthesize(self, jobs: List[SynthesisJob], context=None) -> List[Optional[str]]:
+        """在單一事件循環中並行合成（以信號量限制同時連線數）"""
+        return asyncio.run(self._batch(jobs, context))
+
+    async def _batch(self, jobs: List[SynthesisJob], context=None) -> List[Optional[str]]:
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run(job: SynthesisJob) -> Optional[str]:
+            text, filepath, _ = job
+            async with semaphore:
+                for index in range(config.TTS_MAX_RETRIES):
+                    if context is not None:
+                        context.check_cancelled()
+                    try:
+                        await self._save(text, filepath, context)
+                        self.report(text, filepath)
+                        return filepath
+                    except PipelineCancelled:
+                        raise
+                    except Exception as e:
+                        remove_files([filepath])
+                        if index == config.TTS_MAX_RETRIES - 1:
+                            print(f"  ❌ 生成音頻失敗 {os.path.basename(filepath)}: {str(e)}")
+                            return None
+                        delay = config.TTS_RETRY_BACKOFF * (2 ** index)
+                        print(f"  ⚠️ {os.path.basename(filepath)} 合成失敗，{delay:.1f} 秒後重試：{str(e)}")
+                        await _await_cancellable(asyncio.sleep(delay), context)
+
+        completed = 0
+
+        async def tracked(job: SynthesisJob) -> Optional[str]:
+            nonlocal completed
+            result = await run(job)
+            completed += 1
+            if context is not None:
+                context.report_progress(completed, len(jobs), "tts_task")
+            return result
+
+        # 並行合成，結果按工作順序返回
+        tasks = [asyncio.ensure_future(tracked(job)) for job in jobs]
+        try:
+            return await asyncio.gather(*tasks)
+        except PipelineCancelled:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+
+class GTTSBackend(TTSBackend):
+    """gTTS（備選，免費但質量一般；需要網路）"""
+
+    name = "gtts"
+    network = True
+
+    def __init__(self, voice: str = None, rate: str = None):
+        self.voice = voice or "zh-TW"
+        self.rate = rate or "normal"
+
+    def available(self) -> bool:
+        try:
+            from gtts import gTTS  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def install_hint(self) -> str:
+        return "pip install gtts"
+
+    def synthesize(self, text: str, filepath: str, duration: float = None):
+        from gtts import gTTS
+        tts = gTTS(text=text, lang=self.voice, slow=self.rate == "slow")
+        tts.save(filepath)
+
+
+class EspeakBackend(TTSBackend):
+    """espeak-ng 本機合成（不需網路，延遲可預測；按 CPU 核心數並行）"""
+
+    name = "espeak"
+    network = False
+
+    def __init__(self, voice: str = None, rate: str = None):
+        self.voice = voice or config.ESPEAK_VOICE
+        self.rate = str(rate or config.ESPEAK_RATE)
+        self.executable = shutil.which("espeak-ng") or shutil.which("espeak")
+
+    @property
+    def concurrency(self) -> int:
+        # 本機合成受 CPU 限制，不受網路連線數限制
+        return max(1, config.ESPEAK_CONCURRENCY or os.cpu_count() or 1)
+
+    def available(self) -> bool:
+        return self.executable is not None and get_ffmpeg_exe() is not None
+
+    def install_hint(self) -> str:
+        return "apt install espeak-ng（或 brew install espeak-ng）"
+
+    def synthesize(self, text: str, filepath: str, duration: float = None):
+        # espeak 輸出 WAV 到標準輸出，由 ffmpeg 編碼為 MP3（不落地暫存文件）；
+        # 文字放在 "--" 之後，以 "-" 開頭的文字（例如 "-5 度"）不會被當成選項
+        speak = subprocess.Popen(
+            [self.executable, "-v", self.voice, "-s", self.rate, "--stdout", "--", text],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        try:
+            encode = subprocess.run(
+                [get_ffmpeg_exe(), "-y", "-loglevel", "error", "-f", "wav", "-i", "pipe:0",
+                 "-codec:a", "libmp3lame", "-q:a", "4", filepath],
+                stdin=speak.stdout, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                timeout=config.TIMEOUT
+            )
+        finally:
+            speak.stdout.close()
+            speak_error = speak.stderr.read()
+            speak.stderr.close()
+            speak.wait()
+
+        if speak.returncode != 0:
+            raise RuntimeError(f"espeak 失敗：{speak_error.decode('utf-8', errors='replace').strip()}")
+        if encode.returncode != 0:
+            raise RuntimeError(f"ffmpeg 編碼失敗：{encode.stderr.decode('utf-8', errors='replace').strip()}")
+
+
+class SilentBackend(TTSBackend):
+    """靜音音頻（當 TTS 不可用時的後備方案，按預估時長生成）"""
+
+    name = "silent"
+    cacheable = False
+    chunkable = False    # 按預估時長生成，與文字無關
+
+    def available(self) -> bool:
+        try:
+            from pydub import AudioSegment  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def install_hint(self) -> str:
+        return "pip install pydub"
+
+    def synthesize(self, text: str, filepath: str, duration: float = None):
+        from pydub import AudioSegment
+        duration_ms = int((duration or 10) * 1000)  # 秒轉毫秒
+        silent = AudioSegment.silent(duration=duration_ms)
+        silent.export(filepath, format="mp3")
+
+    def report(self, text: str, filepath: str, duration: float = None):
+        print(f"  ⚪ 已生成靜音：{os.path.basename(filepath)} ({duration or 10:.1f}秒)")
+
+
+TTS_BACKENDS = {
+    "edge": EdgeTTSBackend,
+    "gtts": GTTSBackend,
+    "espeak": EspeakBackend,
+    "silent": SilentBackend,
+}
+
+
+def create_backend(engine: str) -> TTSBackend:
+    """
+    按名稱建立 TTS 後端
+
+    Args:
+        engine: 引擎名稱（TTS_BACKENDS 中的鍵）
+
+    Returns:
+        TTS 後端；名稱未知時拋出 ValueError
+    """
+    if engine not in TTS_BACKENDS:
+        raise ValueError(f"未知的 TTS 引擎：{engine}（可用：{', '.join(TTS_BACKENDS)}）")
+    return TTS_BACKENDS[engine]()
+
+
+async def _await_cancellable(coro, context=None):
+    """等待協程完成，期間定期檢查取消令牌，取消時中止協程"""
+    if context is None:
+        return await coro
+
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=0.2)
+            if done:
+                return task.result()
+            context.check_cancelled()
+    except PipelineCancelled:
+        task.cancel()
+        try:
+            await task
+        except (asyncio.CancelledError, Exception):
+            pass
+        raise
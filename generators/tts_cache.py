@@ -0,0 +1,167 @@
+"""
+語音快取 - 按正規化文字、聲音、語速與引擎的雜湊保存合成結果
+跨課程共用（例如相同的開場白與結語），重新生成課程時不需要再調用 TTS；
+磁碟用量超過上限時按最近使用時間淘汰
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from typing import Dict, Any, Optional, List
+
+from .media_utils import link_or_copy, atomic_copy, remove_files
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """正規化文字（NFKC、合併空白），使僅有全半形或空白差異的句子共用快取"""
+    return _WHITESPACE.sub(' ', unicodedata.normalize('NFKC', text)).strip()
+
+
+class TTSCache:
+    """內容定址的語音快取（雜湊 -> 音頻文件 + 時長）"""
+
+    def __init__(self, cache_dir: str = None, max_bytes: int = None):
+        """
+        初始化語音快取
+
+        Args:
+            cache_dir: 快取目錄，預設為 config.TTS_CACHE_DIR
+            max_bytes: 磁碟用量上限（位元組），預設為 config.TTS_CACHE_MAX_MB
+        """
+        if cache_dir is None or max_bytes is None:
+            import config
+            cache_dir = cache_dir or config.TTS_CACHE_DIR
+            max_bytes = max_bytes if max_bytes is not None else config.TTS_CACHE_MAX_MB * 1024 * 1024
+
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._total_bytes = None
+
+    def key(self, text: str, voice: str, rate: str, engine: str,
+            options: Dict[str, Any] = None) -> str:
+        """
+        計算合成輸入的雜湊
+
+        Args:
+            text: 朗讀文字（計算前先正規化）
+            voice: 聲音（或語言）
+            rate: 語速
+            engine: TTS 引擎
+            options: 其他影響輸出的設定（例如句子切分的停頓長度）
+
+        Returns:
+            快取鍵（SHA-256 十六進位字串）
+        """
+        inputs = {"text": normalize_text(text), "voice": voice, "rate": rate, "engine": engine}
+        if options:
+            inputs["options"] = options
+        payload = json.dumps(inputs, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _paths(self, key: str, extension: str = '.mp3'):
+        """快取條目的音頻與元數據路徑（按雜湊前兩位分目錄）"""
+        base = os.path.join(self.cache_dir, key[:2], key)
+        return base + extension, base + '.json'
+
+    def fetch(self, key: str, filepath: str) -> Optional[Dict[str, Any]]:
+        """
+        將快取的音頻放到輸出路徑（硬連結或複製），並更新最近使用時間
+
+        Returns:
+            命中時返回元數據（含 duration），否則為 None
+        """
+        audio_path, meta_path = self._paths(key, os.path.splitext(filepath)[1])
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            link_or_copy(audio_path, filepath)
+            now = time.time()
+            os.utime(audio_path, (now, now))
+            os.utime(meta_path, (now, now))
+            return meta
+        except (OSError, ValueError):
+            return None
+
+    def store(self, key: str, filepath: str, duration: float = None):
+        """
+        將剛合成的音頻存入快取，超過用量上限時淘汰最久未使用的條目
+
+        Args:
+            key: 快取鍵
+            filepath: 已合成的音頻文件
+            duration: 實測時長（秒）
+        """
+        audio_path, meta_path = self._paths(key, os.path.splitext(filepath)[1])
+        if os.path.exists(meta_path):
+            return
+
+        try:
+            atomic_copy(filepath, audio_path)
+            size = os.path.getsize(audio_path)
+            meta = {"duration": duration, "bytes": size, "created_at": time.time()}
+            with open(meta_path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+            # 元數據最後寫入：存在元數據即代表音頻完整
+            os.replace(meta_path + '.tmp', meta_path)
+        except OSError as e:
+            print(f"  ⚠️ 語音快取寫入失敗：{str(e)}")
+            return
+
+        with self._lock:
+            if self._total_bytes is not None:
+                self._total_bytes += size
+        if self.total_bytes() > self.max_bytes:
+            self.evict()
+
+    def total_bytes(self) -> int:
+        """快取目前的磁碟用量（首次調用時掃描目錄）"""
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(entry["bytes"] for entry in self._entries())
+            return self._total_bytes
+
+    def _entries(self) -> List[Dict[str, Any]]:
+        """列出所有快取條目（音頻、元數據路徑，大小，最近使用時間）"""
+        entries = []
+        for directory, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(('.json', '.tmp')):
+                    continue
+                audio_path = os.path.join(directory, name)
+                meta_path = os.path.splitext(audio_path)[0] + '.json'
+                try:
+                    stat = os.stat(audio_path)
+                except OSError:
+                    continue
+                entries.append({
+                    "audio": audio_path,
+                    "meta": meta_path,
+                    "bytes": stat.st_size,
+                    "used_at": stat.st_mtime
+                })
+        return entries
+
+    def evict(self):
+        """按最近使用時間淘汰條目，直到用量降到上限的 90% 以下"""
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda entry: entry["used_at"])
+            total = sum(entry["bytes"] for entry in entries)
+            target = self.max_bytes * 0.9
+            removed = 0
+            for entry in entries:
+                if total <= target:
+                    break
+                # 先刪元數據，避免其他線程命中只剩一半的條目
+                remove_files([entry["meta"], entry["audio"]])
+                total -= entry["bytes"]
+                removed += 1
+            self._total_bytes = total
+        if removed:
+            print(f"  🧹 語音快取已淘汰 {removed} 個條目")
@@ -0,0 +1,247 @@
+"""
+向量投影片匯出 - 將 visual_design.slides 輸出為輕量的 SVG 投影片（供網頁顯示）
+版面與 SlideGenerator 完全相同（共用設計網格與斷行結果），字體以子集 WOFF 內嵌；
+視頻仍使用 PIL 點陣渲染
+"""
+import base64
+import io
+import os
+from functools import lru_cache
+from typing import Dict, Any, List
+from xml.sax.saxutils import escape
+
+import config
+from run_context import PipelineCancelled
+from .media_utils import remove_files
+from .font_registry import get_font_registry
+from .slide_generator import SlideGenerator, DESIGN_HEIGHT
+
+# 內嵌字體的 font-family 名稱（未內嵌時退回系統字體）
+FONT_FAMILY = "SlideFont"
+FALLBACK_FONTS = "'Noto Sans TC', 'PingFang TC', 'Microsoft JhengHei', sans-serif"
+
+
+class VectorSlideExporter:
+    """SVG 投影片匯出器"""
+
+    def __init__(self, output_dir: str = None, profile: str = None,
+                 renderer: SlideGenerator = None, embed_fonts: bool = None):
+        """
+        初始化向量投影片匯出器
+
+        Args:
+            output_dir: 輸出目錄，預設為 config.VECTOR_SLIDES_DIR
+            profile: 解析度設定（決定 SVG 的 viewBox），預設為 config.SLIDE_PROFILE
+            renderer: 提供版面與字體的投影片生成器（預設建立新的實例）
+            embed_fonts: 是否內嵌字體子集（需要 fonttools），預設為 config.SLIDE_VECTOR_EMBED_FONTS
+        """
+        if output_dir is None:
+            output_dir = config.VECTOR_SLIDES_DIR
+
+        self.output_dir = output_dir
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        self.renderer = renderer or SlideGenerator(profile=profile)
+        self.embed_fonts = config.SLIDE_VECTOR_EMBED_FONTS if embed_fonts is None else embed_fonts
+        self._fonttools_available = None
+
+    def export_slides(self, course_data: Dict[str, Any], course_id: str,
+                      context=None) -> List[str]:
+        """
+        匯出所有投影片為 SVG
+
+        Args:
+            course_data: 完整的課程數據（包含 visual_design）
+            course_id: 課程 ID（用於命名文件）
+            context: 執行上下文（取消時停止匯出並清理已生成的文件）
+
+        Returns:
+            生成的 SVG 文件路徑列表
+        """
+        print("\n🖋️ 開始匯出向量投影片...")
+
+        visual_design = course_data.get('results', {}).get('visual_design', {})
+        slides_data = visual_design.get('slides', [])
+        bg_color = self.renderer._background_color(visual_design.get('style', {}))
+        layouts = self.renderer._layout_text(slides_data)
+
+        generated_files = []
+        try:
+            for i, (slide, layout) in enumerate(zip(slides_data, layouts), 1):
+                if context is not None:
+                    context.check_cancelled()
+
+                filename = f"{course_id}_slide_{slide.get('slide_id', i)}.svg"
+                filepath = os.path.join(self.output_dir, filename)
+                try:
+                    svg = self.render_svg(slide, bg_color, layout)
+                    with open(filepath, 'w', encoding='utf-8') as f:
+                        f.write(svg)
+                    generated_files.append(filepath)
+                    print(f"  ✅ 已匯出：{filename} ({len(svg.encode('utf-8')) / 1024:.1f} KB)")
+                except Exception as e:
+                    print(f"  ❌ 匯出投影片失敗 {slide.get('slide_id', i)}: {str(e)}")
+        except PipelineCancelled:
+            remove_files(generated_files)
+            print("🛑 向量投影片匯出已取消，已清理部分文件")
+            raise
+
+        print(f"\n✅ 向量投影片匯出完成！共 {len(generated_files)} 張")
+        return generated_files
+
+    def render_svg(self, slide: Dict[str, Any], bg_color: tuple,
+                   layout: Dict[str, Any] = None) -> str:
+        """
+        將單張投影片轉換為 SVG 文字
+
+        Args:
+            slide: 投影片數據
+            bg_color: 背景色
+            layout: 斷行結果（內容投影片），未提供時即時計算
+
+        Returns:
+            SVG 文件內容
+        """
+        r = self.renderer
+        slide_type = slide.get('slide_type', 'content')
+        content = slide.get('content', {})
+        elements = []
+        texts = []
+
+        def text(value: str, x: float, y: float, font, anchor: str = 'start'):
+            texts.append(value)
+            elements.append(self._text(value, x, y, font, anchor))
+
+        if slide_type == 'title':
+            # 與點陣背景相同的漸層：頂部 +25，底部 +17（每個色版上限 255）
+            top = tuple(min(255, c + 25) for c in bg_color)
+            bottom = tuple(min(255, c + 17) for c in bg_color)
+            elements.append(
+                '<defs><linearGradient id="bg" x1="0" y1="0" x2="0" y2="1">'
+                f'<stop offset="0" stop-color="{_hex(top)}"/>'
+                f'<stop offset="1" stop-color="{_hex(bottom)}"/>'
+                '</linearGradient></defs>'
+                f'<rect width="{r.width}" height="{r.height}" fill="url(#bg)"/>'
+            )
+
+            title = slide.get('title', '課程標題')
+            text_height = _text_height(title, r.title_font)
+            y = (r.height - text_height) // 2 - r._px(100)
+            text(title, r.width / 2, y, r.title_font, anchor='middle')
+
+            subtitle = content.get('subtitle', '')
+            if subtitle:
+                y = (r.height - text_height) // 2 + r._px(50)
+                text(subtitle, r.width / 2, y, r.subtitle_font, anchor='middle')
+
+        elif slide_type == 'chapter':
+            elements.append(f'<rect width="{r.width}" height="{r.height}" fill="{_hex(bg_color)}"/>')
+            chapter_text = f"第 {slide.get('chapter_number', 1)} 章"
+            text(chapter_text, r.width / 2, r._px(300), r.subtitle_font, anchor='middle')
+            text(slide.get('title', ''), r.width / 2, r._px(450), r.title_font, anchor='middle')
+
+        else:
+            layout = layout or r._layout_text([slide])[0]
+            px = r._px
+            header_height = round(151 * r.height / DESIGN_HEIGHT)
+            elements.append(f'<rect width="{r.width}" height="{r.height}" fill="{_hex(bg_color)}"/>')
+            elements.append(f'<rect width="{r.width}" height="{header_height}" fill="#000000"/>')
+            text(slide.get('title', ''), px(60), px(50), r.subtitle_font)
+
+            y_offset = px(220)
+            for line in layout["text_lines"]:
+                text(line, px(60), y_offset, r.text_font)
+                y_offset += px(50)
+
+            if layout["bullet_lines"]:
+                y_offset += px(30)
+                for point_lines in layout["bullet_lines"]:
+                    cx = (px(60) + px(75)) / 2
+                    cy = y_offset + (px(15) + px(30)) / 2
+                    radius = (px(75) - px(60)) / 2
+                    elements.append(f'<circle cx="{cx:g}" cy="{cy:g}" r="{radius:g}" fill="{_hex(r.text_color)}"/>')
+                    for line in point_lines:
+                        text(line, px(100), y_offset, r.small_font)
+                        y_offset += px(40)
+
+        style = self._font_face(''.join(texts))
+        return (
+            f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {r.width} {r.height}" '
+            f'width="{r.width}" height="{r.height}">'
+            f'<style>{style}text{{font-family:{FONT_FAMILY},{FALLBACK_FONTS};'
+            f'font-weight:bold;fill:{_hex(r.text_color)};white-space:pre}}</style>'
+            + ''.join(elements) +
+            '</svg>'
+        )
+
+    def _text(self, text: str, x: float, y: float, font, anchor: str = 'start') -> str:
+        """
+        文字元素：座標與 PIL 相同（y 為字體上緣），換算為 SVG 的基線位置
+        """
+        ascent = font.getmetrics()[0] if hasattr(font, 'getmetrics') else 0
+        size = getattr(font, 'size', 10)
+        anchor_attr = f' text-anchor="{anchor}"' if anchor != 'start' else ''
+        return (f'<text x="{x:g}" y="{y + ascent:g}" font-size="{size}"{anchor_attr}>'
+                f'{escape(text)}</text>')
+
+    def _font_face(self, text: str) -> str:
+        """內嵌只包含投影片所用字元的字體子集（WOFF，base64）"""
+        font_path = get_font_registry().font_path
+        if not self.embed_fonts or not font_path or not text:
+            return ""
+
+        if self._fonttools_available is None:
+            try:
+                import fontTools.subset  # noqa: F401
+                self._fonttools_available = True
+            except ImportError:
+                self._fonttools_available = False
+                print("⚠️ fonttools 未安裝，向量投影片將使用系統字體")
+                print("提示：運行 'pip install fonttools' 以內嵌字體子集")
+        if not self._fonttools_available:
+            return ""
+
+        data = _subset_font(font_path, ''.join(sorted(set(text))))
+        src = f"data:font/woff;base64,{base64.b64encode(data).decode('ascii')}"
+        return f"@font-face{{font-family:{FONT_FAMILY};src:url('{src}') format('woff')}}"
+
+
+@lru_cache(maxsize=4)
+def _font_bytes(font_path: str) -> bytes:
+    """字體文件內容（同一進程內只讀取一次）"""
+    with open(font_path, 'rb') as f:
+        return f.read()
+
+
+@lru_cache(maxsize=256)
+def _subset_font(font_path: str, chars: str) -> bytes:
+    """產生只包含指定字元的 WOFF 字體子集（相同字元集重用結果，例如重複的章節封面）"""
+    from fontTools import subset
+    from fontTools.ttLib import TTFont
+
+    options = subset.Options()
+    options.desubroutinize = True
+    # 點陣渲染（Pillow 基本排版）不使用 OpenType 排版特性，去掉後子集更小、產生更快
+    options.layout_features = []
+    options.drop_tables += ['GSUB', 'GPOS', 'GDEF', 'FFTM']
+    options.hinting = False
+    font = TTFont(io.BytesIO(_font_bytes(font_path)), fontNumber=0, lazy=True)
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(text=chars)
+    subsetter.subset(font)
+
+    buffer = io.BytesIO()
+    font.flavor = 'woff'
+    font.save(buffer)
+    return buffer.getvalue()
+
+
+def _text_height(text: str, font) -> int:
+    """與 PIL textbbox 相同的文字高度"""
+    bbox = font.getbbox(text)
+    return bbox[3] - bbox[1]
+
+
+def _hex(color: tuple) -> str:
+    """RGB 元組轉為 #rrggbb"""
+    return '#{:02x}{:02x}{:02x}'.format(*color[:3])
@@ -1,37 +1,82 @@
 """
 視頻生成器 - 將投影片和音頻合成為視頻
-使用 moviepy 庫進行視頻合成
+預設以 ffmpeg concat demuxer 按投影片時長直接編碼（靜態投影片快速路徑），
+ffmpeg 不可用或失敗時使用 moviepy 逐幀合成
 """
 import os
-from typing import Dict, Any, List
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Tuple
 import json
 
+import config
+from run_context import PipelineCancelled
+from .media_utils import remove_files, mux_audio, link_or_copy, file_digest
+from .slide_cache import SlideCache
+from .audio_assembler import AudioAssembler
+from .still_image_encoder import StillImageEncoder, quantize_durations
+from .hls_writer import HLSWriter, PLAYLIST_NAME
+from .lazy_frames import LazySlideFrames
+
+# 視頻排程的項目：(slide_id, 投影片文件路徑, 顯示秒數)
+SlideSchedule = List[Tuple[str, str, float]]
+
 
 class VideoGenerator:
     """視頻生成器"""
     
-    def __init__(self, output_dir: str = None):
+    def __init__(self, output_dir: str = None, encoder: str = None, profile: str = None):
         """
         初始化視頻生成器
         
         Args:
             output_dir: 輸出目錄
+            encoder: 編碼方式（"ffmpeg" 或 "moviepy"），預設為 config.VIDEO_ENCODER
+            profile: 預設編碼設定（config.VIDEO_PROFILES 的鍵），預設為 config.VIDEO_PROFILE
         """
         if output_dir is None:
             from config import VIDEO_DIR
             output_dir = VIDEO_DIR
         
         self.output_dir = output_dir
+        self.encoder = encoder or config.VIDEO_ENCODER
+        self.profile = profile or config.VIDEO_PROFILE
         os.makedirs(self.output_dir, exist_ok=True)
         
+        # 課程音軌以 ffmpeg 一次組裝並編碼（不可用時退回 moviepy 解碼接合）
+        self.audio_assembler = AudioAssembler()
+        self.still_encoder = StillImageEncoder()
+        # 每段投影片的編碼結果按內容快取（與投影片快取相同的內容定址儲存）
+        self.clip_cache = SlideCache(config.VIDEO_CLIP_CACHE_DIR) if config.VIDEO_CLIP_CACHE_ENABLED else None
+        
+        # 同一進程中同時進行的編碼數（多個請求共用 CPU 時平分 x264 線程）
+        self._active_encodes = 0
+        self._encodes_lock = threading.Lock()
+        
         # 檢查依賴
         self._check_dependencies()
     
+    @property
+    def reads_frames(self) -> bool:
+        """編碼時是否讀取幀緩存中的 RGB 陣列（只有 moviepy 合成會讀取；ffmpeg 直接讀取 PNG）"""
+        return not (self.encoder == "ffmpeg" and self.ffmpeg_available) and self.moviepy_available
+    
+    def hls_dir(self, course_id: str) -> str:
+        """課程 HLS 輸出目錄（播放清單與分段）"""
+        return os.path.join(self.output_dir, f"{course_id}_hls")
+    
+    def hls_playlist_path(self, course_id: str) -> str:
+        """課程 HLS 主播放清單路徑"""
+        return os.path.join(self.hls_dir(course_id), PLAYLIST_NAME)
+    
     def _check_dependencies(self):
         """檢查並安裝必要的依賴"""
+        self.ffmpeg_available = self.still_encoder.available()
         try:
             # moviepy 2.x 使用新的導入方式
-            from moviepy import ImageClip, AudioFileClip, concatenate_videoclips
+            from moviepy import VideoClip, AudioFileClip
             self.moviepy_available = True
             print("✅ moviepy 已就緒")
         except ImportError:
@@ -40,7 +85,8 @@ class VideoGenerator:
             print("提示：運行 'pip install moviepy' 安裝視頻處理功能")
     
     def generate_video(self, course_data: Dict[str, Any], course_id: str, 
-                      slide_files: List[str], audio_files: List[str]) -> str:
+                      slide_files: List[str], audio_files: List[str],
+                      context=None, frames=None, profile: str = None) -> str:
         """
         生成視頻
         
@@ -49,24 +95,36 @@ class VideoGenerator:
             course_id: 課程 ID
             slide_files: 投影片文件列表
             audio_files: 音頻文件列表
+            context: 執行上下文（取消時中止編碼並刪除未完成的視頻）
+            frames: 幀緩存（FrameStore）；moviepy 合成時直接使用記憶體中的 RGB 陣列，不再解碼 PNG
+            profile: 編碼設定，預設為 context.video_profile，其次為建立時指定的設定
             
         Returns:
             生成的視頻文件路徑
         """
         print("\n🎬 開始生成視頻...")
         
-        if not self.moviepy_available:
-            print("❌ 視頻生成失敗：moviepy 未安裝")
+        # 先移除先前執行留下的 HLS 目錄（本次關閉 HLS 或失敗時，/outputs 不再提供舊的播放清單）
+        shutil.rmtree(self.hls_dir(course_id), ignore_errors=True)
+        
+        if not self.moviepy_available and not self.ffmpeg_available:
+            print("❌ 視頻生成失敗：moviepy 未安裝且找不到 ffmpeg")
             return ""
         
         if not slide_files:
             print("❌ 沒有投影片文件")
             return ""
         
+        # 輸出文件
+        output_filename = f"{course_id}_final.mp4"
+        output_path = os.path.join(self.output_dir, output_filename)
+        temp_audio_path = os.path.join(self.output_dir, f"{course_id}_temp_audio.m4a")
+        track_path = os.path.join(self.output_dir, f"{course_id}_track{self.audio_assembler.extension}")
+        video_only_path = os.path.join(self.output_dir, f"{course_id}_video_only.mp4")
+        # HLS 分段只在 ffmpeg 路徑輸出（每完成一章即追加到播放清單）
+        hls_dir = self.hls_dir(course_id) if config.VIDEO_HLS else None
+        
         try:
-            # moviepy 2.x 使用新的導入方式
-            from moviepy import ImageClip, AudioFileClip, concatenate_videoclips, CompositeAudioClip
-            
             # 獲取時間軸信息
             production = course_data.get('results', {}).get('production', {})
             timeline = production.get('timeline', [])
@@ -87,101 +145,479 @@ class VideoGenerator:
             if slide_dict:
                 print(f"  示例 slide_id: {list(slide_dict.keys())[:3]}")
             
-            # 創建視頻片段列表
-            video_clips = []
+            # 先組裝音軌：段落的實際起訖時間用於校正投影片時長
+            track = self._assemble_audio(audio_files, track_path, context) if audio_files else None
+            if track is not None:
+                if context is not None:
+                    context.stats["audio_track"] = {k: v for k, v in track.items() if k != "path"}
+                if timeline and slides_timeline:
+                    slides_timeline = self._sync_slides_timeline(timeline, slides_timeline, track, course_id)
             
             if timeline and slides_timeline:
                 # 方案A：根據時間軸精確控制（推薦）
                 print("使用精確時間軸生成視頻...")
-                video_clips = self._generate_with_timeline(
-                    slide_dict, audio_files, timeline, slides_timeline
-                )
+                schedule = self._timeline_schedule(slide_dict, slides_timeline)
             else:
                 # 方案B：簡單模式，每張投影片固定時長
                 print("使用簡單模式生成視頻...")
-                video_clips = self._generate_simple(slide_dict, audio_files)
+                schedule = self._simple_schedule(slide_dict)
             
-            if not video_clips:
+            if not schedule:
                 print("❌ 沒有生成任何視頻片段")
                 return ""
             
-            # 合併所有片段
-            print("正在合併視頻片段...")
-            final_video = concatenate_videoclips(video_clips, method="chain")
+            # 編碼設定：請求指定的設定 + 製片方案的 video_config（解析度、幀率），不超過投影片的渲染尺寸
+            settings = self._encoder_settings(
+                profile or getattr(context, 'video_profile', None) or self.profile,
+                production.get('video_config', {}),
+                self._slide_size(schedule[0][1])
+            )
+            size = f"{settings['size'][0]}x{settings['size'][1]}" if settings['size'] else "原尺寸"
+            print(f"  編碼設定：{settings['name']}（preset {settings['preset']}，CRF {settings['crf']}，"
+                  f"{settings['fps']:g} fps，{size}）")
             
-            # 添加音頻（如果有）
-            if audio_files:
+            # 快速路徑：ffmpeg 按投影片時長直接編碼（音軌需已由 ffmpeg 組裝）
+            if self.encoder == "ffmpeg" and self.ffmpeg_available and (track is not None or not audio_files):
+                try:
+                    chapters = {
+                        str(slide.get('slide_id')): slide.get('chapter_number')
+                        for slide in course_data.get('results', {}).get('visual_design', {}).get('slides', [])
+                    }
+                    self._encode_with_ffmpeg(schedule, output_path, settings, track, frames, context,
+                                             chapters, hls_dir)
+                    remove_files([track_path])
+                    print(f"✅ 視頻生成完成：{output_path}")
+                    return output_path
+                except RuntimeError as e:
+                    if hls_dir is not None:
+                        shutil.rmtree(hls_dir, ignore_errors=True)
+                    if not self.moviepy_available:
+                        raise
+                    print(f"⚠️ ffmpeg 編碼失敗，改用 moviepy：{str(e)}")
+            
+            if not self.moviepy_available:
+                print("❌ 視頻生成失敗：moviepy 未安裝")
+                return ""
+            
+            self._encode_with_moviepy(schedule, audio_files, track, output_path, settings,
+                                      video_only_path, temp_audio_path, frames, context)
+            remove_files([track_path])
+            
+            print(f"✅ 視頻生成完成：{output_path}")
+            return output_path
+            
+        except PipelineCancelled:
+            remove_files([output_path, temp_audio_path, track_path, video_only_path])
+            if hls_dir is not None:
+                shutil.rmtree(hls_dir, ignore_errors=True)
+            print("🛑 視頻編碼已取消，已刪除未完成的文件")
+            raise
+        except Exception as e:
+            remove_files([track_path, video_only_path])
+            print(f"❌ 視頻生成失敗：{str(e)}")
+            import traceback
+            traceback.print_exc()
+            return ""
+    
+    def _slide_size(self, path: str) -> Optional[Tuple[int, int]]:
+        """投影片的渲染尺寸（只讀取圖片標頭），無法讀取時返回 None"""
+        try:
+            from PIL import Image
+            with Image.open(path) as image:
+                return image.size
+        except Exception as e:
+            print(f"⚠️ 無法讀取投影片尺寸：{str(e)}")
+            return None
+    
+    def _encoder_settings(self, profile: str, video_config: Dict[str, Any],
+                          slide_size: Tuple[int, int] = None) -> Dict[str, Any]:
+        """
+        合併編碼設定與製片方案的 video_config
+        
+        輸出高度不超過投影片的渲染高度（slide_size），
+        preview / 720p 投影片不會被放大成 video_config 的 1080p
+        
+        Returns:
+            {"name", "preset", "crf", "fps", "size"}；size 為輸出寬高（None 表示沿用投影片尺寸，
+            寬度 -2 表示按比例縮放）
+        """
+        if profile not in config.VIDEO_PROFILES:
+            print(f"⚠️ 編碼設定 '{profile}' 不存在，改用 standard")
+            profile = "standard"
+        settings = config.VIDEO_PROFILES[profile]
+        
+        size = None
+        resolution = str(video_config.get('resolution', ''))
+        if 'x' in resolution:
+            try:
+                width, height = (int(value) for value in resolution.lower().split('x', 1))
+                size = (width - width % 2, height - height % 2)
+            except ValueError:
+                print(f"⚠️ 無法解析解析度：{resolution}")
+        
+        max_height = settings.get("max_height")
+        if max_height:
+            if size is None:
+                size = (-2, max_height)
+            elif size[1] > max_height:
+                width = round(size[0] * max_height / size[1])
+                size = (width - width % 2, max_height)
+        
+        if slide_size and size is not None:
+            slide_height = slide_size[1] - slide_size[1] % 2
+            if size[1] > slide_height:
+                width = size[0] if size[0] < 0 else round(size[0] * slide_height / size[1])
+                size = (width - width % 2, slide_height)
+        
+        return {
+            "name": profile,
+            "preset": settings["preset"],
+            "crf": settings["crf"],
+            "fps": settings.get("fps") or video_config.get('fps') or config.VIDEO_DEFAULT_FPS,
+            "size": size
+        }
+    
+    @contextmanager
+    def _encode_slot(self):
+        """佔用一個編碼名額，產生本次編碼可用的線程數（CPU 核心數 / 同時進行的編碼數）"""
+        with self._encodes_lock:
+            self._active_encodes += 1
+            active = self._active_encodes
+        try:
+            yield max(1, (os.cpu_count() or 1) // active)
+        finally:
+            with self._encodes_lock:
+                self._active_encodes -= 1
+    
+    def _encode_with_ffmpeg(self, schedule: SlideSchedule, output_path: str, settings: Dict[str, Any],
+                            track: Dict[str, Any] = None, frames=None, context=None,
+                            chapters: Dict[str, Any] = None, hls_dir: str = None):
+        """
+        以 concat demuxer 編碼靜態投影片（每張投影片只解碼一次），音軌串流複製；
+        有多個章節時各章並行編碼，再以串流複製接合；
+        指定 hls_dir 時按章節依序編碼，每完成一章即切成 HLS 分段追加到播放清單
+        """
+        if frames is not None:
+            # 幀交接模式下 PNG 在背景寫出，編碼前確認文件已完成；
+            # concat demuxer 直接讀取 PNG，不使用記憶體中的幀，立即釋放
+            frames.wait()
+            if frames.keep_frames:
+                print("  ℹ️ ffmpeg 從 PNG 編碼，幀交接不適用，已釋放記憶體中的投影片幀")
+                frames.release()
+        
+        # HLS 分段需要在固定間隔上有關鍵幀，才能按 VIDEO_HLS_SEGMENT_SECONDS 切分
+        keyframe_interval = config.VIDEO_HLS_SEGMENT_SECONDS if hls_dir is not None else None
+        encoder = StillImageEncoder(settings["fps"], settings["preset"], settings["crf"], settings["size"],
+                                    keyframe_interval)
+        
+        # 起訖時間對齊幀邊界，單次與分段編碼的時間軸一致
+        fps = encoder.fps
+        durations = quantize_durations([duration for _, _, duration in schedule], fps)
+        schedule = [(slide_id, path, duration)
+                    for (slide_id, path, _), duration in zip(schedule, durations) if duration > 0]
+        
+        total = sum(duration for _, _, duration in schedule)
+        audio_path = track["path"] if track is not None else None
+        split = config.VIDEO_PARALLEL_ENCODE or hls_dir is not None
+        parts = self._split_parts(schedule, chapters or {}) if split else [schedule]
+        
+        with self._encode_slot() as threads:
+            if hls_dir is not None:
+                print(f"正在編碼視頻（ffmpeg，stillimage，HLS {len(parts)} 段，共 {threads} 線程）："
+                      f"{os.path.basename(output_path)}")
+                print(f"視頻時長：{total:.1f}秒")
+                hls = HLSWriter(hls_dir)
+                self._encode_clips(parts, encoder, output_path, audio_path, context, threads, hls)
+                hls.finish()
+                print(f"  📺 HLS 播放清單：{hls.playlist_path}")
+            elif self.clip_cache is not None:
+                print(f"正在編碼視頻（ffmpeg，stillimage，按段落快取，{len(parts)} 段，共 {threads} 線程）："
+                      f"{os.path.basename(output_path)}")
+                print(f"視頻時長：{total:.1f}秒")
+                self._encode_clips(parts, encoder, output_path, audio_path, context, threads)
+            elif len(parts) > 1:
+                workers = min(config.VIDEO_ENCODE_WORKERS or threads, len(parts))
+                print(f"正在編碼視頻（ffmpeg，stillimage，{len(parts)} 段 / {workers} 並行，"
+                      f"共 {threads} 線程）：{os.path.basename(output_path)}")
+                print(f"視頻時長：{total:.1f}秒")
+                encoder.encode_parts(
+                    [[(path, duration) for _, path, duration in part] for part in parts],
+                    output_path, audio_path, context, workers, threads
+                )
+            else:
+                print(f"正在編碼視頻（ffmpeg，stillimage，{threads} 線程）：{os.path.basename(output_path)}")
+                print(f"視頻時長：{total:.1f}秒")
+                encoder.encode(
+                    [(path, duration) for _, path, duration in schedule],
+                    output_path, audio_path, context, threads
+                )
+    
+    def _encode_clips(self, groups: List[SlideSchedule], encoder: StillImageEncoder, output_path: str,
+                      audio_path: str = None, context=None, threads: int = 1, hls: HLSWriter = None):
+        """
+        每段投影片獨立編碼為片段並按內容快取（投影片圖片、時長、編碼參數的雜湊），
+        只編碼改變的段落，其餘直接取用快取，最後以串流複製接合
+        
+        未快取的片段以 VIDEO_ENCODE_WORKERS 並行編碼，每完成一組（章節）回報一次進度；
+        指定 hls 時各組按順序編碼，每組完成後即切成 HLS 分段，不必等整部課程編碼完。
+        編碼與重用的秒數記錄在 context.stats["video_clip_cache"]
+        """
+        clip_dir = tempfile.mkdtemp(prefix="clips_", dir=self.output_dir)
+        stats = {"hits": 0, "misses": 0, "encoded_seconds": 0.0, "reused_seconds": 0.0}
+        digests = {}
+        clip_paths = []
+        encoded = {}      # 本次已編碼（或將編碼）的快取鍵 -> 片段路徑
+        plans = []        # 每組：(片段路徑, 要編碼的片段, 要存入快取的條目, 重複段落)
+        try:
+            for group in groups:
+                group_paths = []
+                jobs = []
+                keys = {}         # 本組要編碼並存入快取的條目
+                duplicates = []   # 同一次執行中內容相同的段落：(片段路徑, 首次出現的片段路徑)
+                for _, path, duration in group:
+                    if path not in digests:
+                        digests[path] = file_digest(path)
+                    inputs = {
+                        "kind": "video_clip",
+                        "image": digests[path],
+                        "duration": round(duration, 6),
+                        "encoder": encoder.settings
+                    }
+                    # 快取停用時（僅 HLS 模式會走到這裡）仍以相同的輸入辨識重複段落
+                    key = (self.clip_cache.key(inputs) if self.clip_cache is not None
+                           else json.dumps(inputs, sort_keys=True))
+                    clip_path = os.path.join(clip_dir, f"clip_{len(clip_paths)}.mp4")
+                    clip_paths.append(clip_path)
+                    group_paths.append(clip_path)
+                    
+                    if self.clip_cache is not None and self.clip_cache.fetch(key, clip_path, '.mp4'):
+                        stats["hits"] += 1
+                        stats["reused_seconds"] += duration
+                    elif key in encoded:
+                        stats["hits"] += 1
+                        stats["reused_seconds"] += duration
+                        duplicates.append((clip_path, encoded[key]))
+                    else:
+                        stats["misses"] += 1
+                        stats["encoded_seconds"] += duration
+                        encoded[key] = keys[key] = clip_path
+                        jobs.append(([(path, duration)], clip_path))
+                plans.append((group_paths, jobs, keys, duplicates))
+            
+            if hls is not None:
+                elapsed = 0.0
+                for number, (group, (group_paths, jobs, keys, duplicates)) in enumerate(zip(groups, plans), 1):
+                    self._encode_group(encoder, jobs, keys, duplicates, context, threads)
+                    duration = sum(entry[2] for entry in group)
+                    hls.add_chapter(group_paths, audio_path, elapsed, duration, context)
+                    elapsed += duration
+                    if context is not None:
+                        context.report_progress(number, len(groups), "chapter")
+            else:
+                # 各組的片段一起並行編碼，組內片段全部完成時回報章節進度
+                jobs = [job for _, group_jobs, _, _ in plans for job in group_jobs]
+                owners = [index for index, (_, group_jobs, _, _) in enumerate(plans) for _ in group_jobs]
+                remaining = [len(group_jobs) for _, group_jobs, _, _ in plans]
+                
+                def report():
+                    if context is not None:
+                        context.report_progress(sum(1 for count in remaining if count == 0),
+                                                len(groups), "chapter")
+                
+                def job_done(index: int):
+                    remaining[owners[index]] -= 1
+                    if remaining[owners[index]] == 0:
+                        report()
+                
+                if 0 in remaining:
+                    report()
+                if jobs:
+                    # VIDEO_PARALLEL_ENCODE 關閉時依序編碼，每段使用全部線程
+                    workers = (min(config.VIDEO_ENCODE_WORKERS or threads, len(jobs))
+                               if config.VIDEO_PARALLEL_ENCODE else 1)
+                    encoder.encode_many(jobs, context, workers, threads, job_done)
+                for _, _, keys, duplicates in plans:
+                    self._encode_group(encoder, [], keys, duplicates, context, threads)
+            
+            print(f"  🎞️ 片段：編碼 {stats['misses']} 段（{stats['encoded_seconds']:.1f} 秒），"
+                  f"重用 {stats['hits']} 段（{stats['reused_seconds']:.1f} 秒）")
+            encoder.concat(clip_paths, output_path, audio_path, context)
+        finally:
+            shutil.rmtree(clip_dir, ignore_errors=True)
+        
+        if context is not None:
+            context.stats["video_clip_cache"] = stats
+    
+    def _encode_group(self, encoder: StillImageEncoder, jobs: List[Tuple[List[Tuple[str, float]], str]],
+                      keys: Dict[str, str], duplicates: List[Tuple[str, str]], context=None, threads: int = 1):
+        """編碼一組片段（jobs 為空表示已編碼），存入快取並連結同次執行中的重複段落"""
+        if jobs:
+            workers = min(config.VIDEO_ENCODE_WORKERS or threads, len(jobs))
+            encoder.encode_many(jobs, context, workers, threads)
+        if self.clip_cache is not None:
+            for key, clip_path in keys.items():
+                self.clip_cache.store(key, clip_path, '.mp4')
+        for clip_path, source in duplicates:
+            link_or_copy(source, clip_path)
+    
+    def _split_parts(self, schedule: SlideSchedule, chapters: Dict[str, Any]) -> List[SlideSchedule]:
+        """
+        按章節把排程切成可獨立編碼的分段（連續同章的投影片為一段），
+        超過 VIDEO_PART_MAX_SECONDS 的章節再按投影片切分
+        """
+        parts = []
+        current = []
+        current_chapter = None
+        elapsed = 0.0
+        for entry in schedule:
+            slide_id, _, duration = entry
+            chapter = chapters.get(slide_id)
+            if current and (chapter != current_chapter or elapsed + duration > config.VIDEO_PART_MAX_SECONDS):
+                parts.append(current)
+                current, elapsed = [], 0.0
+            current.append(entry)
+            current_chapter = chapter
+            elapsed += duration
+        if current:
+            parts.append(current)
+        return parts
+    
+    def _encode_with_moviepy(self, schedule: SlideSchedule, audio_files: List[str],
+                             track: Dict[str, Any], output_path: str, settings: Dict[str, Any],
+                             video_only_path: str, temp_audio_path: str, frames=None, context=None):
+        """
+        以 moviepy 逐幀合成（ffmpeg 快速路徑不可用時的後備方案）
+        
+        畫面由 LazySlideFrames 按時間延遲解碼（只保留最近幾張），記憶體用量不隨投影片數增長；
+        所有片段在結束時（包括失敗與取消）確定關閉
+        """
+        # moviepy 2.x 使用新的導入方式
+        from moviepy import VideoClip
+        
+        if frames is not None and not frames.keep_frames:
+            # 幀緩存不保留陣列時從 PNG 解碼，先確認背景寫入已完成
+            frames.wait()
+        source = LazySlideFrames(schedule, frames)
+        video = VideoClip(frame_function=source.get_frame, duration=source.duration)
+        final_video = video
+        audio_clips = []
+        combined_audio = None
+        
+        try:
+            # 添加音頻（ffmpeg 組裝失敗時退回 moviepy 解碼接合）
+            if audio_files and track is None:
                 try:
                     print("正在添加音頻軌道...")
                     from moviepy import AudioFileClip, concatenate_audioclips
                     audio_clips = [AudioFileClip(f) for f in audio_files if os.path.exists(f)]
                     if audio_clips:
                         combined_audio = concatenate_audioclips(audio_clips)
-                        final_video = final_video.with_audio(combined_audio)
+                        final_video = video.with_audio(combined_audio)
                         print(f"✅ 音頻添加成功 ({combined_audio.duration:.1f}秒)")
                 except Exception as e:
                     print(f"⚠️ 音頻添加失敗: {str(e)}")
             
-            # 輸出文件
-            output_filename = f"{course_id}_final.mp4"
-            output_path = os.path.join(self.output_dir, output_filename)
-            
-            print(f"正在渲染視頻：{output_filename}")
-            print(f"視頻時長：{final_video.duration:.1f}秒")
-            final_video.write_videofile(
-                output_path,
-                fps=24,
-                codec='libx264',
-                audio_codec='aac',
-                threads=4,
-                preset='medium'
-            )
+            if context is not None:
+                context.check_cancelled()
             
-            # 清理資源
-            for clip in video_clips:
-                clip.close()
-            final_video.close()
-            
-            print(f"✅ 視頻生成完成：{output_path}")
-            return output_path
+            ffmpeg_params = ['-crf', str(settings['crf'])]
+            if settings['size']:
+                ffmpeg_params += ['-vf', f"scale={settings['size'][0]}:{settings['size'][1]}"]
             
+            print(f"正在渲染視頻：{os.path.basename(output_path)}")
+            print(f"視頻時長：{final_video.duration:.1f}秒")
+            with self._encode_slot() as threads:
+                final_video.write_videofile(
+                    video_only_path if track is not None else output_path,
+                    fps=settings['fps'],
+                    codec='libx264',
+                    audio=track is None,
+                    audio_codec='aac',
+                    temp_audiofile=temp_audio_path,
+                    threads=threads,
+                    preset=settings['preset'],
+                    ffmpeg_params=ffmpeg_params,
+                    logger=_make_cancellable_logger(context) if context is not None else "bar"
+                )
+            print(f"  🖼️ 投影片解碼 {source.decodes} 次（{len(schedule)} 段）")
+        finally:
+            # 清理資源：音頻讀取進程與已解碼的幀
+            for clip in [final_video, video, combined_audio] + audio_clips:
+                if clip is not None:
+                    clip.close()
+            source.close()
+        
+        if track is not None:
+            # 已編碼的音軌直接封裝（串流複製，不重新編碼）
+            mux_audio(video_only_path, track["path"], output_path, context)
+            remove_files([video_only_path])
+    
+    def _assemble_audio(self, audio_files: List[str], track_path: str, context=None):
+        """以 ffmpeg 組裝課程音軌，失敗時返回 None（改用 moviepy 接合）"""
+        if not self.audio_assembler.available():
+            return None
+        
+        print("正在組裝音軌...")
+        durations = context.stats.get("audio_durations") if context is not None else None
+        try:
+            return self.audio_assembler.assemble(audio_files, track_path, durations, context)
+        except PipelineCancelled:
+            raise
         except Exception as e:
-            print(f"❌ 視頻生成失敗：{str(e)}")
-            import traceback
-            traceback.print_exc()
-            return ""
+            print(f"⚠️ 音軌組裝失敗，改用 moviepy 接合：{str(e)}")
+            return None
     
-    def _generate_with_timeline(self, slide_dict: Dict[str, str], 
-                                audio_files: List[str],
-                                timeline: List[Dict],
-                                slides_timeline: List[Dict]) -> List:
-        """使用時間軸生成視頻（精確控制）"""
-        from moviepy import ImageClip, AudioFileClip
+    def _sync_slides_timeline(self, timeline: List[Dict], slides_timeline: List[Dict],
+                              track: Dict[str, Any], course_id: str) -> List[Dict]:
+        """
+        以音軌中段落的實際起訖時間取代預估時長（段落有多張投影片時平均分配）
         
-        clips = []
+        Returns:
+            校正後的投影片時間軸（找不到對應音頻的投影片保留原時長）
+        """
+        padding = self.audio_assembler.padding
+        offsets = {os.path.basename(segment["file"]): segment for segment in track["segments"]}
+        last_file = os.path.basename(track["segments"][-1]["file"])
+        
+        synced = {}
+        for entry in timeline:
+            audio_name = f"{course_id}_{entry.get('segment_id')}.mp3"
+            segment = offsets.get(audio_name)
+            slide_ids = entry.get('slide_ids', [])
+            if segment is None or not slide_ids:
+                continue
+            length = segment["duration"] + (padding if audio_name != last_file else 0.0)
+            share = length / len(slide_ids)
+            for k, slide_id in enumerate(slide_ids):
+                synced[slide_id] = {
+                    "start_time": segment["start"] + k * share,
+                    "end_time": segment["start"] + (k + 1) * share,
+                    "duration": share
+                }
         
-        # 根據 slides_timeline 創建片段
+        if synced:
+            print(f"  🎯 已按實際音頻時長校正 {len(synced)} 張投影片")
+        return [{**slide, **synced.get(slide.get('slide_id'), {})} for slide in slides_timeline]
+    
+    def _timeline_schedule(self, slide_dict: Dict[str, str],
+                           slides_timeline: List[Dict]) -> SlideSchedule:
+        """使用時間軸排程投影片（精確控制）"""
+        schedule = []
+        
+        # 根據 slides_timeline 排程
         for slide_info in slides_timeline:
             slide_id = slide_info.get('slide_id')
             duration = slide_info.get('duration', 5)
             
             if slide_id in slide_dict:
-                slide_path = slide_dict[slide_id]
-                
-                # 創建圖像片段
-                img_clip = ImageClip(slide_path, duration=duration)
-                clips.append(img_clip)
-                
+                schedule.append((slide_id, slide_dict[slide_id], duration))
                 print(f"  ✅ 添加投影片：{slide_id} (時長 {duration}秒)")
         
-        return clips
+        return schedule
     
-    def _generate_simple(self, slide_dict: Dict[str, str], 
-                        audio_files: List[str]) -> List:
+    def _simple_schedule(self, slide_dict: Dict[str, str]) -> SlideSchedule:
         """簡單模式: 每張投影片固定時長"""
-        from moviepy import ImageClip, AudioFileClip
-        
-        clips = []
+        schedule = []
         default_duration = 10  # 每張投影片默認 10 秒
         
         # 按 slide_id 排序
@@ -189,11 +625,25 @@ class VideoGenerator:
                              key=lambda x: int(x[0].replace('slide_', '')))
         
         for slide_id, slide_path in sorted_slides:
-            img_clip = ImageClip(slide_path, duration=default_duration)
-            clips.append(img_clip)
+            schedule.append((slide_id, slide_path, default_duration))
             print(f"  ✅ 添加投影片：{slide_id} (時長 {default_duration}秒)")
         
-        return clips
+        return schedule
+
+
+def _make_cancellable_logger(context):
+    """
+    建立 moviepy 進度記錄器：每次進度更新（每幀）時檢查取消令牌，
+    取消時拋出 PipelineCancelled，moviepy 會關閉 ffmpeg 寫入進程
+    """
+    from proglog import TqdmProgressBarLogger
+    
+    class CancellableLogger(TqdmProgressBarLogger):
+        def bars_callback(self, bar, attr, value, old_value=None):
+            context.check_cancelled()
+            super().bars_callback(bar, attr, value, old_value)
+    
+    return CancellableLogger()
 
 
 if __name__ == "__main__":
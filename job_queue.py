@@ -0,0 +1,272 @@
+"""
+JobQueue - 進程內的課程生成任務佇列
+/api/generate 只負責排入任務並立即返回 job_id，由常駐的背景工作線程依序執行；
+狀態、階段、進度與結果連結可隨時查詢（不需要外部 broker），
+狀態變化與執行進度同時發佈到每個任務的事件頻道（供 SSE 進度串流）
+"""
+import queue
+import threading
+import time
+import uuid
+from typing import Dict, Any, Callable, Optional
+
+from run_context import RunContext
+from progress_stream import EventChannel
+
+# 任務狀態
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobQueueFull(Exception):
+    """排隊中的任務已達上限"""
+
+
+class Job:
+    """單個課程生成任務"""
+
+    def __init__(self, job_id: str, request: Dict[str, Any],
+                 media_url: Callable[[str], str] = None):
+        """
+        初始化任務
+
+        Args:
+            job_id: 任務 ID（同時作為 RunContext.run_id）
+            request: 生成參數（topic、target_audience、duration_minutes、deadline_seconds、video_profile）
+            media_url: 輸出文件路徑 -> 網址（用於在任務執行中發佈 HLS 播放清單網址）
+        """
+        self.job_id = job_id
+        self.request = request
+        self.media_url = media_url
+        self.hls_url: Optional[str] = None
+        self.status = QUEUED
+        self.context: Optional[RunContext] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.events = EventChannel()
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def to_dict(self) -> Dict[str, Any]:
+        """任務狀態（供 GET /api/jobs/<job_id> 返回）"""
+        with self._lock:
+            progress = self.context.get_progress() if self.context is not None else {}
+            data = {
+                "job_id": self.job_id,
+                "status": self.status,
+                "stage": progress.get("stage", QUEUED if self.status == QUEUED else None),
+                "stage_label": progress.get("label"),
+                "progress": 1.0 if self.status == SUCCEEDED else progress.get("progress", 0.0),
+                "eta_seconds": progress.get("eta_seconds"),
+                "topic": self.request.get("topic"),
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+            }
+            if self.hls_url:
+                data["hls_url"] = self.hls_url
+            if self.error:
+                data["error"] = self.error
+            if self.result is not None:
+                data["result"] = self.result
+            return data
+
+    def publish_event(self, event: str, data: Dict[str, Any]):
+        """
+        RunContext 事件 -> 事件頻道
+
+        HLS 播放清單的第一章寫入後即記錄並發佈播放清單網址（不對外公開文件路徑），
+        前端可以在任務仍在執行時開始播放
+        """
+        if event == "hls":
+            if self.media_url is None:
+                return
+            url = self.media_url(data["playlist"])
+            with self._lock:
+                self.hls_url = url
+            data = {"hls_url": url, "chapters": data.get("chapters")}
+        self.events.publish(event, data)
+
+    def publish_status(self):
+        """發佈目前的任務狀態；任務已結束時關閉事件頻道"""
+        self.events.publish("status", self.to_dict())
+        if self.finished:
+            self.events.close()
+
+
+class JobQueue:
+    """固定數量工作線程的任務佇列（首次排入任務時才啟動線程，gunicorn fork 後也安全）"""
+
+    def __init__(self, runner: Callable[[Job], Dict[str, Any]], workers: int = None,
+                 max_queued: int = None, history_limit: int = None,
+                 media_url: Callable[[str], str] = None):
+        """
+        初始化任務佇列
+
+        Args:
+            runner: 執行任務的函數，接收已建立 context 的 Job，返回結果（含 success / cancelled / error）
+            workers: 同時執行的任務數，預設為 config.JOB_WORKERS
+            max_queued: 排隊中任務的上限（0 表示不限），預設為 config.JOB_QUEUE_MAX
+            history_limit: 保留供查詢的已結束任務數，預設為 config.JOB_HISTORY_LIMIT
+            media_url: 輸出文件路徑 -> 網址（執行中產生的 HLS 播放清單以網址發佈），None 表示不發佈
+        """
+        if workers is None or max_queued is None or history_limit is None:
+            import config
+            workers = workers or config.JOB_WORKERS
+            max_queued = max_queued if max_queued is not None else config.JOB_QUEUE_MAX
+            history_limit = history_limit if history_limit is not None else config.JOB_HISTORY_LIMIT
+
+        self.runner = runner
+        self.workers = max(1, workers)
+        self.max_queued = max_queued
+        self.history_limit = history_limit
+        self.media_url = media_url
+        self._queue: "queue.Queue[Job]" = queue.Queue()
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def submit(self, request: Dict[str, Any], job_id: str = None) -> Job:
+        """
+        排入任務
+
+        Args:
+            request: 生成參數
+            job_id: 客戶端指定的任務 ID，預設自動生成
+
+        Returns:
+            已排入的任務
+
+        Raises:
+            ValueError: 相同 job_id 的任務尚未結束
+            JobQueueFull: 排隊中的任務已達上限
+        """
+        job = Job(job_id or uuid.uuid4().hex[:12], request, self.media_url)
+        with self._lock:
+            existing = self._jobs.get(job.job_id)
+            if existing is not None and not existing.finished:
+                raise ValueError("相同 job_id 的任務正在執行")
+            queued = sum(1 for item in self._jobs.values() if item.status == QUEUED)
+            if self.max_queued and queued >= self.max_queued:
+                raise JobQueueFull(f"排隊中的任務已達上限（{self.max_queued}）")
+            self._jobs[job.job_id] = job
+            self._prune()
+            self._start_workers()
+        job.publish_status()
+        self._queue.put(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """查詢任務（不存在或已被清除時返回 None）"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def position(self, job: Job) -> int:
+        """排隊中的任務前面還有幾個任務（已開始執行時為 0）"""
+        if job.status != QUEUED:
+            return 0
+        with self._lock:
+            return sum(1 for item in self._jobs.values()
+                       if item.status == QUEUED and item.created_at < job.created_at)
+
+    def cancel(self, job_id: str, reason: str = "使用者已取消") -> Optional[Job]:
+        """
+        取消任務：排隊中的任務直接標記為已取消，執行中的任務透過取消令牌盡快停止
+
+        Returns:
+            被取消的任務（不存在或已結束時返回 None）
+        """
+        job = self.get(job_id)
+        if job is None:
+            return None
+        with job._lock:
+            if job.status == QUEUED:
+                job.status = CANCELLED
+                job.error = reason
+                job.finished_at = time.time()
+            elif job.status == RUNNING:
+                job.context.cancel_token.cancel(reason)
+            else:
+                return None
+        if job.finished:
+            job.publish_status()
+        return job
+
+    def stats(self) -> Dict[str, int]:
+        """各狀態的任務數"""
+        with self._lock:
+            counts = {state: 0 for state in (QUEUED, RUNNING) + FINISHED_STATES}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+            return counts
+
+    def _start_workers(self):
+        """啟動工作線程（調用時已持有 self._lock）"""
+        self._threads = [thread for thread in self._threads if thread.is_alive()]
+        for index in range(len(self._threads), self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _work(self):
+        """工作線程：依序取出任務執行"""
+        while True:
+            job = self._queue.get()
+            try:
+                self._run(job)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job: Job):
+        """執行單個任務（期限從開始執行時起算，排隊時間不佔用期限）"""
+        with job._lock:
+            if job.status != QUEUED:
+                return
+            request = job.request
+            job.context = RunContext(
+                run_id=job.job_id,
+                deadline_seconds=request.get("deadline_seconds"),
+                video_profile=request.get("video_profile")
+            )
+            job.status = RUNNING
+            job.started_at = time.time()
+            job.context.add_listener(job.publish_event)
+        job.publish_status()
+
+        try:
+            result = self.runner(job)
+            status = (CANCELLED if result.get("cancelled")
+                      else SUCCEEDED if result.get("success") else FAILED)
+            error = result.get("error")
+        except Exception as e:
+            print(f"❌ 任務 {job.job_id} 執行失敗：{str(e)}")
+            import traceback
+            traceback.print_exc()
+            result, status, error = None, FAILED, str(e)
+
+        with job._lock:
+            job.result = result
+            job.status = status
+            job.error = error
+            job.finished_at = time.time()
+            # 失敗或取消時 HLS 目錄已被清除
+            if status != SUCCEEDED:
+                job.hls_url = None
+        job.publish_status()
+
+    def _prune(self):
+        """只保留最近 history_limit 個已結束的任務（調用時已持有 self._lock）"""
+        finished = sorted((job for job in self._jobs.values() if job.finished),
+                          key=lambda job: job.finished_at or job.created_at)
+        for job in finished[:max(0, len(finished) - self.history_limit)]:
+            del self._jobs[job.job_id]
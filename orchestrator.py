@@ -3,6 +3,7 @@ Orchestrator - 協調者
 負責協調所有 Agent 的執行順序和數據流
 """
 import json
+import os
 import time
 from typing import Dict, Any, List
 from agents import (
@@ -11,11 +12,54 @@ from agents import (
     VisualArtistAgent,
     ProducerAgent
 )
-from generators import SlideGenerator, AudioGenerator, VideoGenerator
+from generators import SlideGenerator, AudioGenerator, VideoGenerator, FrameStore, VectorSlideExporter
+from generators.slide_cache import hit_rate
+from generators.media_utils import remove_files
+from run_context import RunContext, PipelineCancelled
+from course_artifact import save_course_artifact
+import config
+
+
+# Agent 執行階段（依序執行，後一階段依賴前一階段的結果）
+PIPELINE_STAGES = [
+    {"key": "curriculum", "agent": "curriculum_designer", "step": "curriculum_design",
+     "label": "教學設計", "error": "課程大綱生成失敗"},
+    {"key": "scripts", "agent": "scriptwriter", "step": "scriptwriting",
+     "label": "腳本撰寫", "error": "教學腳本生成失敗"},
+    {"key": "visual_design", "agent": "visual_artist", "step": "visual_design",
+     "label": "視覺設計", "error": "視覺設計生成失敗"},
+    {"key": "production", "agent": "producer", "step": "production",
+     "label": "製片協調", "error": "製片方案生成失敗"},
+]
+
+# 進度回報的階段與各自佔整體進度的權重（LLM 階段通常最耗時）
+PROGRESS_STAGES = [(stage["key"], stage["label"], 0.15) for stage in PIPELINE_STAGES] + [
+    ("slides", "投影片生成", 0.1),
+    ("audio", "語音合成", 0.15),
+    ("video", "視頻合成", 0.15),
+]
+
+
+def report_stage(context: RunContext, stage: str):
+    """將執行階段、階段開始時的整體進度與階段權重寫入 context"""
+    if stage == "done":
+        context.set_stage("done", "完成", 1.0)
+        return
+    start = 0.0
+    for key, label, weight in PROGRESS_STAGES:
+        if key == stage:
+            context.set_stage(key, label, start, weight)
+            return
+        start += weight
 
 
 class Orchestrator:
-    """多 Agent 協調者"""
+    """
+    多 Agent 協調者
+    
+    Agent 與媒體生成器在初始化時建立一次，之後可跨執行、跨線程重用；
+    每次執行的狀態（執行日誌、決策日誌）保存在 RunContext 中。
+    """
     
     def __init__(self, generate_media: bool = True):
         self.agents = {
@@ -24,21 +68,25 @@ class Orchestrator:
             "visual_artist": VisualArtistAgent(),
             "producer": ProducerAgent()
         }
-        self.execution_log = []
         self.generate_media = generate_media
         
         # 初始化媒體生成器
         if generate_media:
             self.slide_generator = SlideGenerator()
-            self.audio_generator = AudioGenerator(engine="edge")  # 使用 Edge TTS
+            self.audio_generator = AudioGenerator()  # 引擎由 config.TTS_ENGINE 決定（預設 Edge TTS）
             self.video_generator = VideoGenerator()
+            # 向量投影片與點陣投影片共用同一份版面與字體
+            self.vector_exporter = (VectorSlideExporter(renderer=self.slide_generator)
+                                    if config.SLIDE_VECTOR_EXPORT else None)
         else:
             self.slide_generator = None
             self.audio_generator = None
             self.video_generator = None
+            self.vector_exporter = None
         
     def execute_pipeline(self, topic: str, target_audience: str = "初學者", 
-                         duration_minutes: int = 10) -> Dict[str, Any]:
+                         duration_minutes: int = 10,
+                         context: RunContext = None) -> Dict[str, Any]:
         """
         執行完整的課程生成流程
         
@@ -46,6 +94,7 @@ class Orchestrator:
             topic: 課程主題
             target_audience: 目標受眾
             duration_minutes: 課程時長
+            context: 執行上下文，未提供時自動建立
             
         Returns:
             完整的課程數據包
@@ -57,104 +106,33 @@ class Orchestrator:
         print(f"⏱️  時長：約 {duration_minutes} 分鐘")
         print("=" * 60)
         
+        if context is None:
+            context = RunContext()
+        
         start_time = time.time()
+        course_request = {
+            "topic": topic,
+            "target_audience": target_audience,
+            "duration_minutes": duration_minutes
+        }
         results = {}
         
         try:
-            # Step 1: Curriculum Designer Agent
-            print("\n【階段 1/4】教學設計")
-            curriculum_result = self.agents["curriculum_designer"].execute(
-                topic=topic,
-                target_audience=target_audience,
-                duration_minutes=duration_minutes
-            )
-            
-            if not curriculum_result["success"]:
-                raise Exception("課程大綱生成失敗")
-            
-            results["curriculum"] = curriculum_result["data"]
-            self._log_step("curriculum_design", curriculum_result)
-            
-            # Step 2: Scriptwriter Agent
-            print("\n【階段 2/4】腳本撰寫")
-            script_result = self.agents["scriptwriter"].execute(
-                curriculum=results["curriculum"]
-            )
-            
-            if not script_result["success"]:
-                raise Exception("教學腳本生成失敗")
-            
-            results["scripts"] = script_result["data"]
-            self._log_step("scriptwriting", script_result)
-            
-            # Step 3: Visual Artist Agent
-            print("\n【階段 3/4】視覺設計")
-            visual_result = self.agents["visual_artist"].execute(
-                scripts=results["scripts"]
-            )
-            
-            if not visual_result["success"]:
-                raise Exception("視覺設計生成失敗")
-            
-            results["visual_design"] = visual_result["data"]
-            self._log_step("visual_design", visual_result)
-            
-            # Step 4: Producer Agent
-            print("\n【階段 4/4】製片協調")
-            producer_result = self.agents["producer"].execute(
-                scripts=results["scripts"],
-                slides=results["visual_design"]
-            )
-            
-            if not producer_result["success"]:
-                raise Exception("製片方案生成失敗")
-            
-            results["production"] = producer_result["data"]
-            self._log_step("production", producer_result)
+            # Step 1-4: 依序執行四個 Agent
+            for index, stage in enumerate(PIPELINE_STAGES, 1):
+                context.check_cancelled()
+                report_stage(context, stage["key"])
+                print(f"\n【階段 {index}/{len(PIPELINE_STAGES)}】{stage['label']}")
+                self._run_stage(stage, course_request, results, context)
             
             # Step 5: 媒體生成（如果啟用）
             media_files = {}
             if self.generate_media:
-                print("\n【階段 5/6】媒體生成")
-                course_id = f"course_{int(time.time())}"
-                
-                # 組裝完整數據包
-                full_data = {
-                    "success": True,
-                    "topic": topic,
-                    "results": results
-                }
-                
-                # 生成投影片
-                try:
-                    slide_files = self.slide_generator.generate_slides(full_data, course_id)
-                    media_files["slides"] = slide_files
-                except Exception as e:
-                    print(f"⚠️ 投影片生成失敗：{str(e)}")
-                    media_files["slides"] = []
-                
-                # 生成音頻
-                try:
-                    audio_files = self.audio_generator.generate_audio(full_data, course_id)
-                    media_files["audio"] = audio_files
-                except Exception as e:
-                    print(f"⚠️ 音頻生成失敗：{str(e)}")
-                    media_files["audio"] = []
-                
-                # 生成視頻
-                print("\n【階段 6/6】視頻合成")
-                try:
-                    video_file = self.video_generator.generate_video(
-                        full_data, course_id,
-                        media_files.get("slides", []),
-                        media_files.get("audio", [])
-                    )
-                    media_files["video"] = video_file
-                except Exception as e:
-                    print(f"⚠️ 視頻生成失敗：{str(e)}")
-                    media_files["video"] = ""
+                context.check_cancelled()
+                media_files = self._generate_media(topic, results, context)
             
             # 完成
+            report_stage(context, "done")
             elapsed_time = time.time() - start_time
             print("\n" + "=" * 60)
             print(f"✅ 所有 Agent 執行完成！耗時：{elapsed_time:.2f} 秒")
@@ -163,46 +141,367 @@ class Orchestrator:
                 print(f"   - 投影片：{len(media_files.get('slides', []))} 張")
                 print(f"   - 音頻：{len(media_files.get('audio', []))} 個")
                 print(f"   - 視頻：{'有' if media_files.get('video') else '無'}")
+                self._print_cache_stats(context.stats)
             print("=" * 60)
             
             return {
                 "success": True,
+                "run_id": context.run_id,
+                "course_id": context.course_id,
                 "topic": topic,
                 "results": results,
                 "media_files": media_files if self.generate_media else {},
-                "execution_log": self.execution_log,
+                "execution_log": context.execution_log,
+                "stats": context.stats,
                 "elapsed_time": elapsed_time,
                 "timestamp": time.time()
             }
             
+        except PipelineCancelled as e:
+            print(f"\n🛑 流程已取消: {str(e)}")
+            return {
+                "success": False,
+                "cancelled": True,
+                "run_id": context.run_id,
+                "course_id": context.course_id,
+                "error": str(e),
+                "results": results,
+                "execution_log": context.execution_log
+            }
         except Exception as e:
             print(f"\n❌ 流程執行失敗: {str(e)}")
             return {
                 "success": False,
+                "run_id": context.run_id,
+                "course_id": context.course_id,
                 "error": str(e),
                 "results": results,
-                "execution_log": self.execution_log
+                "execution_log": context.execution_log
             }
     
-    def _log_step(self, step_name: str, result: Dict[str, Any]):
-        """記錄執行步驟"""
-        self.execution_log.append({
-            "step": step_name,
-            "timestamp": time.time(),
-            "success": result.get("success", False),
-            "agent": result.get("agent", "unknown")
-        })
+    def execute_batch(self, topics: List[Any], target_audience: str = "初學者",
+                      duration_minutes: int = 10) -> Dict[str, Any]:
+        """
+        批次生成課程（按模型分組排程）
+        
+        先讓所有主題完成教學設計階段，再統一進入腳本撰寫階段，依此類推，
+        讓同一個模型在整個階段期間常駐，避免每門課程都輪流載入三個模型。
+        單一主題失敗只會將該主題標記為失敗，不影響其他主題。
+        
+        Args:
+            topics: 主題列表，元素可為字串或包含 topic / target_audience /
+                    duration_minutes 的字典
+            target_audience: 預設目標受眾
+            duration_minutes: 預設課程時長
+            
+        Returns:
+            批次執行摘要（包含每門課程的結果與吞吐量）
+        """
+        jobs = []
+        batch_id = int(time.time())
+        for index, item in enumerate(topics, 1):
+            error = None
+            if isinstance(item, str):
+                item = {"topic": item}
+            elif not isinstance(item, dict):
+                error = f"無效的主題項目（需為字串或物件）：{item!r}"
+                item = {}
+            topic = item.get("topic", "")
+            if error is None and not (isinstance(topic, str) and topic.strip()):
+                error = "缺少課程主題"
+            jobs.append({
+                "index": index,
+                "request": {
+                    "topic": topic if isinstance(topic, str) else str(topic),
+                    "target_audience": item.get("target_audience", target_audience),
+                    "duration_minutes": item.get("duration_minutes", duration_minutes)
+                },
+                "results": {},
+                "context": RunContext(course_id=f"course_{batch_id}_{index}"),
+                "error": error,
+                # 每門課程只計入自己各階段的執行時間（不含等待其他主題的時間）
+                "elapsed_time": 0.0
+            })
+        
+        print("=" * 60)
+        print("🚀 AI 磨課師批次生成啟動")
+        print(f"📚 主題數量：{len(jobs)}")
+        print("=" * 60)
+        
+        batch_start = time.time()
+        
+        for job in jobs:
+            if job["error"] is not None:
+                print(f"  ❌ [{job['index']}] {job['error']}")
+        
+        # 按階段執行：同一階段的所有主題使用同一個常駐模型
+        previous_agent = None
+        for index, stage in enumerate(PIPELINE_STAGES, 1):
+            agent = self.agents[stage["agent"]]
+            pending = [job for job in jobs if job["error"] is None]
+            
+            if previous_agent is not None and previous_agent.model != agent.model:
+                previous_agent.release_model()
+            previous_agent = agent
+            
+            print(f"\n【批次階段 {index}/{len(PIPELINE_STAGES)}】{stage['label']}"
+                  f"（模型：{agent.model}，{len(pending)} 個主題）")
+            stage_start = time.time()
+            
+            for job in pending:
+                job_start = time.time()
+                try:
+                    report_stage(job["context"], stage["key"])
+                    self._run_stage(stage, job["request"], job["results"], job["context"])
+                except Exception as e:
+                    job["error"] = str(e)
+                    print(f"  ❌ [{job['index']}] {job['request']['topic']}：{str(e)}")
+                finally:
+                    job["elapsed_time"] += time.time() - job_start
+            
+            print(f"  ⏱️ 階段耗時：{time.time() - stage_start:.2f} 秒")
+        
+        # 媒體生成（逐一主題執行，模型已不再需要）
+        courses = []
+        for job in jobs:
+            topic = job["request"]["topic"]
+            context = job["context"]
+            if job["error"] is not None:
+                courses.append({
+                    "success": False,
+                    "run_id": context.run_id,
+                    "course_id": context.course_id,
+                    "topic": topic,
+                    "error": job["error"],
+                    "results": job["results"],
+                    "execution_log": context.execution_log
+                })
+                continue
+            
+            media_files = {}
+            if self.generate_media:
+                media_start = time.time()
+                media_files = self._generate_media(topic, job["results"], context)
+                job["elapsed_time"] += time.time() - media_start
+            
+            courses.append({
+                "success": True,
+                "run_id": context.run_id,
+                "course_id": context.course_id,
+                "topic": topic,
+                "results": job["results"],
+                "media_files": media_files,
+                "execution_log": context.execution_log,
+                "stats": context.stats,
+                "elapsed_time": job["elapsed_time"],
+                "timestamp": time.time()
+            })
+        
+        elapsed_time = time.time() - batch_start
+        succeeded = sum(1 for course in courses if course["success"])
+        courses_per_hour = succeeded / elapsed_time * 3600 if elapsed_time > 0 else 0.0
+        
+        print("\n" + "=" * 60)
+        print(f"✅ 批次生成完成：成功 {succeeded}/{len(courses)}，耗時 {elapsed_time:.2f} 秒")
+        print(f"📈 吞吐量：{courses_per_hour:.1f} 門課程/小時")
+        cache_stats = {}
+        for name in ("slide_cache", "tts_cache", "video_clip_cache"):
+            cache_stats[name] = {"hits": 0, "misses": 0}
+            for job in jobs:
+                for key, value in job["context"].stats.get(name, {}).items():
+                    cache_stats[name][key] = cache_stats[name].get(key, 0) + value
+        self._print_cache_stats(cache_stats)
+        print("=" * 60)
+        
+        return {
+            "success": succeeded > 0,
+            "total": len(courses),
+            "succeeded": succeeded,
+            "failed": len(courses) - succeeded,
+            "courses": courses,
+            "elapsed_time": elapsed_time,
+            "courses_per_hour": courses_per_hour,
+            "slide_cache": cache_stats["slide_cache"],
+            "tts_cache": cache_stats["tts_cache"],
+            "video_clip_cache": cache_stats["video_clip_cache"],
+            "timestamp": time.time()
+        }
+    
+    def _print_cache_stats(self, stats: Dict[str, Any]):
+        """顯示投影片、語音與視頻片段快取的命中率"""
+        for name, label, miss_label in (("slide_cache", "投影片快取", "渲染"),
+                                        ("tts_cache", "語音快取", "合成"),
+                                        ("video_clip_cache", "片段快取", "編碼")):
+            cache = stats.get(name)
+            if cache and (cache["hits"] or cache["misses"]):
+                print(f"♻️ {label}：命中 {cache['hits']} 個，{miss_label} {cache['misses']} 個"
+                      f"（命中率 {hit_rate(cache):.0%}）")
+                if "encoded_seconds" in cache:
+                    print(f"   編碼 {cache['encoded_seconds']:.1f} 秒，重用 {cache['reused_seconds']:.1f} 秒")
+    
+    def _run_stage(self, stage: Dict[str, str], course_request: Dict[str, Any],
+                   results: Dict[str, Any], context: RunContext):
+        """
+        執行單一 Agent 階段，並將結果寫入 results
+        
+        Args:
+            stage: PIPELINE_STAGES 中的階段定義
+            course_request: 課程請求（topic / target_audience / duration_minutes）
+            results: 目前已完成的階段結果
+            context: 執行上下文
+        """
+        key = stage["key"]
+        if key == "curriculum":
+            kwargs = dict(course_request)
+        elif key == "scripts":
+            kwargs = {"curriculum": results["curriculum"]}
+        elif key == "visual_design":
+            kwargs = {"scripts": results["scripts"]}
+        else:
+            kwargs = {"scripts": results["scripts"], "slides": results["visual_design"]}
+        
+        stage_result = self.agents[stage["agent"]].execute(context=context, **kwargs)
+        
+        if not stage_result["success"]:
+            raise Exception(stage["error"])
+        
+        results[key] = stage_result["data"]
+        context.log_step(stage["step"], stage_result)
+    
+    def _generate_media(self, topic: str, results: Dict[str, Any],
+                        context: RunContext) -> Dict[str, Any]:
+        """
+        生成投影片、音頻和視頻
+        
+        Args:
+            topic: 課程主題
+            results: 四個 Agent 的結果
+            context: 執行上下文（course_id 用於命名文件）
+            
+        Returns:
+            媒體文件路徑
+        """
+        print("\n【階段 5/6】媒體生成")
+        media_files = {}
+        
+        # 組裝完整數據包
+        full_data = {
+            "success": True,
+            "topic": topic,
+            "results": results
+        }
+        
+        # 投影片以記憶體陣列直接交給視頻生成器（PNG 在背景寫出）；
+        # 視頻生成器不讀取陣列時（ffmpeg 從 PNG 編碼）不保留幀，只在背景寫出 PNG
+        frame_store = None
+        if config.SLIDE_FRAME_HANDOFF:
+            keep_frames = self.video_generator is not None and self.video_generator.reads_frames
+            if not keep_frames:
+                print("ℹ️ 視頻由 ffmpeg 從 PNG 編碼，幀交接只在背景寫出 PNG，不保留投影片幀")
+            frame_store = FrameStore(keep_frames=keep_frames)
+        
+        try:
+            return self._generate_media_files(full_data, context, media_files, frame_store)
+        finally:
+            if frame_store is not None:
+                frame_store.close()
     
-    def get_decision_logs(self) -> Dict[str, List[Dict[str, Any]]]:
+    def _generate_media_files(self, full_data: Dict[str, Any], context: RunContext,
+                              media_files: Dict[str, Any],
+                              frame_store: FrameStore = None) -> Dict[str, Any]:
+        """依序生成投影片、音頻和視頻，結果寫入 media_files"""
+        course_id = context.course_id
+        
+        # 生成投影片
+        report_stage(context, "slides")
+        try:
+            slide_files = self.slide_generator.generate_slides(
+                full_data, course_id, context=context, frame_store=frame_store
+            )
+            media_files["slides"] = slide_files
+            media_files["thumbnails"] = [
+                path for path in map(self.slide_generator.thumbnail_path, slide_files)
+                if os.path.exists(path)
+            ]
+        except PipelineCancelled:
+            raise
+        except Exception as e:
+            print(f"⚠️ 投影片生成失敗：{str(e)}")
+            media_files["slides"] = []
+            media_files["thumbnails"] = []
+        
+        # 匯出向量投影片（網頁顯示用，視頻仍使用點陣投影片）
+        if self.vector_exporter is not None:
+            try:
+                media_files["vector_slides"] = self.vector_exporter.export_slides(
+                    full_data, course_id, context=context
+                )
+            except PipelineCancelled:
+                if frame_store is not None:
+                    frame_store.discard()
+                remove_files(media_files.get("slides", []))
+                raise
+            except Exception as e:
+                print(f"⚠️ 向量投影片匯出失敗：{str(e)}")
+                media_files["vector_slides"] = []
+        
+        # 生成音頻
+        report_stage(context, "audio")
+        try:
+            audio_files = self.audio_generator.generate_audio(full_data, course_id, context=context)
+            media_files["audio"] = audio_files
+        except PipelineCancelled:
+            if frame_store is not None:
+                frame_store.discard()
+            remove_files(media_files.get("slides", []) + media_files.get("vector_slides", []))
+            raise
+        except Exception as e:
+            print(f"⚠️ 音頻生成失敗：{str(e)}")
+            media_files["audio"] = []
+        
+        # 生成視頻
+        print("\n【階段 6/6】視頻合成")
+        report_stage(context, "video")
+        try:
+            video_file = self.video_generator.generate_video(
+                full_data, course_id,
+                media_files.get("slides", []),
+                media_files.get("audio", []),
+                context=context,
+                frames=frame_store
+            )
+            media_files["video"] = video_file
+            hls_playlist = self.video_generator.hls_playlist_path(course_id)
+            if video_file and config.VIDEO_HLS and os.path.exists(hls_playlist):
+                media_files["hls_playlist"] = hls_playlist
+        except PipelineCancelled:
+            if frame_store is not None:
+                frame_store.discard()
+            remove_files(media_files.get("slides", []) + media_files.get("vector_slides", [])
+                         + media_files.get("audio", []))
+            raise
+        except Exception as e:
+            print(f"⚠️ 視頻生成失敗：{str(e)}")
+            media_files["video"] = ""
+        
+        return media_files
+    
+    def get_decision_logs(self, context: RunContext = None) -> Dict[str, List[Dict[str, Any]]]:
         """
         獲取所有 Agent 的決策日誌
         
+        Args:
+            context: 執行上下文，未提供時返回未使用上下文的調用記錄
+            
         Returns:
             所有 Agent 的對話歷史
         """
         logs = {}
         for agent_name, agent in self.agents.items():
-            logs[agent_name] = agent.get_decision_log()
+            if context is not None:
+                logs[agent_name] = context.get_decision_log(agent.name)
+            else:
+                logs[agent_name] = agent.get_decision_log()
         return logs
     
     def save_results(self, results: Dict[str, Any], output_path: str):
@@ -219,3 +518,29 @@ class Orchestrator:
             print(f"💾 結果已保存到：{output_path}")
         except Exception as e:
             print(f"❌ 保存失敗: {str(e)}")
+    
+    def save_artifact(self, result: Dict[str, Any], context: RunContext = None,
+                      artifact_dir: str = None) -> str:
+        """
+        以精簡存檔格式保存結果（大型文字與決策日誌壓縮存為 blob）
+        
+        Args:
+            result: 執行結果
+            context: 執行上下文（用於保存決策日誌）
+            artifact_dir: 存檔目錄，預設為 outputs/courses/<course_id>
+            
+        Returns:
+            manifest 文件路徑（失敗時返回空字串）
+        """
+        if artifact_dir is None:
+            course_id = result.get("course_id") or f"course_{int(time.time())}"
+            artifact_dir = os.path.join(config.COURSES_DIR, course_id)
+        
+        try:
+            decision_logs = self.get_decision_logs(context) if context is not None else None
+            manifest_path = save_course_artifact(result, artifact_dir, decision_logs)
+            print(f"💾 課程存檔已保存到：{artifact_dir}")
+            return manifest_path
+        except Exception as e:
+            print(f"❌ 存檔失敗: {str(e)}")
+            return ""
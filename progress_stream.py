@@ -0,0 +1,305 @@
+"""
+進度串流 - 以 Server-Sent Events 推送任務的階段、進度、LLM 輸出與預估剩餘時間
+
+發佈端（工作線程）只把事件追加到每個任務的環形緩衝區並喚醒訂閱者，不會被訂閱者阻塞；
+ProgressStreamServer 在單一 asyncio 事件循環中服務所有 SSE 連線，
+閒置的監聽者只佔用一個協程與一個 socket，不佔用 gunicorn 的請求線程
+"""
+import asyncio
+import json
+import re
+import threading
+from collections import deque
+from typing import Callable, Dict, Any, List, Optional, Tuple
+from urllib.parse import urlsplit, parse_qs
+
+# (序號, 事件類型, JSON 資料)
+StreamEvent = Tuple[int, str, str]
+
+EVENTS_PATH = re.compile(r'^(?:/api)?/jobs/([A-Za-z0-9_-]{1,64})/events$')
+RETRY_MS = 3000
+
+
+class EventChannel:
+    """單個任務的事件頻道（環形緩衝區 + 喚醒回調，發佈不會等待訂閱者）"""
+
+    def __init__(self, capacity: int = None):
+        """
+        初始化事件頻道
+
+        Args:
+            capacity: 緩衝的事件數，預設為 config.SSE_BUFFER_EVENTS；
+                      斷線重連時游標早於緩衝區的訂閱者會先收到狀態快照
+        """
+        if capacity is None:
+            import config
+            capacity = config.SSE_BUFFER_EVENTS
+
+        self._events: "deque[StreamEvent]" = deque(maxlen=capacity)
+        self._seq = 0
+        self._wakers: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+        self.closed = False
+
+    @property
+    def last_id(self) -> int:
+        with self._lock:
+            return self._seq
+
+    def publish(self, event: str, data: Dict[str, Any]):
+        """發佈事件並喚醒所有訂閱者"""
+        payload = json.dumps(data, ensure_ascii=False, default=str)
+        with self._lock:
+            if self.closed:
+                return
+            self._seq += 1
+            self._events.append((self._seq, event, payload))
+            wakers = list(self._wakers)
+        for wake in wakers:
+            wake()
+
+    def close(self):
+        """任務結束：訂閱者送完剩餘事件後斷開"""
+        with self._lock:
+            self.closed = True
+            wakers = list(self._wakers)
+        for wake in wakers:
+            wake()
+
+    def since(self, cursor: int) -> Tuple[List[StreamEvent], bool, bool]:
+        """
+        取出序號大於 cursor 的事件
+
+        Returns:
+            (事件列表, 頻道是否已關閉, 是否有事件已被擠出緩衝區)
+        """
+        with self._lock:
+            oldest = self._events[0][0] if self._events else self._seq + 1
+            events = [item for item in self._events if item[0] > cursor]
+            return events, self.closed, cursor < oldest - 1
+
+    def subscribe(self, wake: Callable[[], None]):
+        """註冊喚醒回調（在發佈者的線程中調用，必須立即返回）"""
+        with self._lock:
+            self._wakers.append(wake)
+
+    def unsubscribe(self, wake: Callable[[], None]):
+        with self._lock:
+            if wake in self._wakers:
+                self._wakers.remove(wake)
+
+
+def format_event(seq: int, event: str, payload: str) -> str:
+    """SSE 文字格式"""
+    return f"id: {seq}\nevent: {event}\ndata: {payload}\n\n"
+
+
+def pending_chunks(job, cursor: Optional[int]) -> Tuple[List[str], int, bool]:
+    """
+    訂閱者下一批要送出的 SSE 文字
+
+    首次連線（或游標已早於緩衝區）時先送出任務狀態快照，之後為快照之後的事件
+
+    Returns:
+        (SSE 文字列表, 新游標, 頻道是否已關閉)
+    """
+    channel = job.events
+    chunks = []
+    gap = False
+    if cursor is not None:
+        events, closed, gap = channel.since(cursor)
+    if cursor is None or gap:
+        cursor = channel.last_id
+        chunks.append(format_event(cursor, "snapshot", json.dumps(job.to_dict(), ensure_ascii=False,
+                                                                  default=str)))
+        events, closed, _ = channel.since(cursor)
+    for seq, event, payload in events:
+        chunks.append(format_event(seq, event, payload))
+        cursor = seq
+    return chunks, cursor, closed
+
+
+def parse_cursor(value: Optional[str]) -> Optional[int]:
+    """Last-Event-ID（無效時視為首次連線）"""
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+def iter_events(job, cursor: Optional[int], heartbeat: float):
+    """
+    同步 SSE 產生器（由 Flask 路由提供串流時使用，每個連線佔用一個請求線程）
+    """
+    waker = threading.Event()
+    job.events.subscribe(waker.set)
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+        while True:
+            waker.clear()
+            chunks, cursor, closed = pending_chunks(job, cursor)
+            for chunk in chunks:
+                yield chunk
+            if closed:
+                break
+            if not waker.wait(heartbeat):
+                yield ": keepalive\n\n"
+    finally:
+        job.events.unsubscribe(waker.set)
+
+
+class ProgressStreamServer:
+    """asyncio SSE 伺服器（背景線程中的單一事件循環服務所有連線）"""
+
+    def __init__(self, lookup: Callable[[str], Any], host: str = None, port: int = None,
+                 heartbeat: float = None):
+        """
+        初始化串流伺服器
+
+        Args:
+            lookup: job_id -> Job（不存在時返回 None）
+            host: 監聽地址，預設為 config.HOST
+            port: 監聽端口，預設為 config.SSE_PORT
+            heartbeat: 無事件時送出 keepalive 註解的間隔（秒），預設為 config.SSE_HEARTBEAT_SECONDS
+        """
+        import config
+        self.lookup = lookup
+        self.host = host or config.HOST
+        self.port = port if port is not None else config.SSE_PORT
+        self.heartbeat = heartbeat or config.SSE_HEARTBEAT_SECONDS
+        self.connections = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._started = threading.Event()
+        self._lock = threading.Lock()
+        self._error: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self._loop is not None and self._error is None
+
+    def start(self) -> bool:
+        """
+        在背景線程啟動伺服器（只啟動一次；gunicorn fork 之後首次使用時才啟動）
+
+        Returns:
+            是否正在運行（端口被佔用等失敗時返回 False，由 Flask 路由提供串流）
+        """
+        with self._lock:
+            if self._loop is None and self._error is None:
+                thread = threading.Thread(target=self._run, name="progress-stream", daemon=True)
+                thread.start()
+                self._started.wait(timeout=5)
+        return self.running
+
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            server = loop.run_until_complete(
+                asyncio.start_server(self._handle, self.host, self.port)
+            )
+        except OSError as e:
+            self._error = str(e)
+            print(f"⚠️ 進度串流伺服器啟動失敗（改由 Flask 路由提供）：{str(e)}")
+            self._started.set()
+            loop.close()
+            return
+
+        self._loop = loop
+        print(f"📡 進度串流伺服器：http://{self.host}:{self.port}/jobs/<job_id>/events")
+        self._started.set()
+        try:
+            loop.run_forever()
+        finally:
+            server.close()
+            loop.close()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """處理一個 HTTP 連線（只支援 GET /jobs/<job_id>/events）"""
+        self.connections += 1
+        try:
+            try:
+                head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=10)
+            except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                return
+
+            lines = head.decode('latin-1').split("\r\n")
+            parts = lines[0].split(" ")
+            headers = {}
+            for line in lines[1:]:
+                if ":" in line:
+                    name, value = line.split(":", 1)
+                    headers[name.strip().lower()] = value.strip()
+
+            if len(parts) != 3 or parts[0] not in ("GET", "OPTIONS"):
+                await self._reply(writer, "405 Method Not Allowed", "只支援 GET")
+                return
+            if parts[0] == "OPTIONS":
+                await self._reply(writer, "204 No Content", "")
+                return
+
+            url = urlsplit(parts[1])
+            match = EVENTS_PATH.match(url.path)
+            job = self.lookup(match.group(1)) if match else None
+            if job is None:
+                await self._reply(writer, "404 Not Found", "找不到任務")
+                return
+
+            query = parse_qs(url.query)
+            cursor = parse_cursor(headers.get("last-event-id") or query.get("last_event_id", [None])[0])
+            await self._stream(job, cursor, writer)
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def _stream(self, job, cursor: Optional[int], writer: asyncio.StreamWriter):
+        """送出事件直到任務結束；每個連線只在有事件時被喚醒"""
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+
+        def wake():
+            loop.call_soon_threadsafe(event.set)
+
+        writer.write((
+            "HTTP/1.1 200 OK\r\n"
+            "Content-Type: text/event-stream; charset=utf-8\r\n"
+            "Cache-Control: no-cache\r\n"
+            "Connection: keep-alive\r\n"
+            "X-Accel-Buffering: no\r\n"
+            "Access-Control-Allow-Origin: *\r\n"
+            "\r\n"
+            f"retry: {RETRY_MS}\n\n"
+        ).encode('utf-8'))
+
+        job.events.subscribe(wake)
+        try:
+            while True:
+                event.clear()
+                chunks, cursor, closed = pending_chunks(job, cursor)
+                if chunks:
+                    writer.write("".join(chunks).encode('utf-8'))
+                await writer.drain()
+                if closed:
+                    break
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=self.heartbeat)
+                except asyncio.TimeoutError:
+                    writer.write(b": keepalive\n\n")
+        finally:
+            job.events.unsubscribe(wake)
+
+    async def _reply(self, writer: asyncio.StreamWriter, status: str, message: str):
+        """送出簡單的文字回應"""
+        body = message.encode('utf-8')
+        writer.write((
+            f"HTTP/1.1 {status}\r\n"
+            "Content-Type: text/plain; charset=utf-8\r\n"
+            "Access-Control-Allow-Origin: *\r\n"
+            "Access-Control-Allow-Headers: Last-Event-ID, Cache-Control\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n"
+            "\r\n"
+        ).encode('utf-8') + body)
+        await writer.drain()
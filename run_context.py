@@ -0,0 +1,224 @@
+"""
+RunContext - 單次課程生成的執行上下文
+保存每次執行獨立的狀態（執行日誌、決策日誌、統計、取消令牌），
+讓 Agent 與媒體生成器實例可以跨請求、跨線程共用
+"""
+import threading
+import time
+import uuid
+from typing import Dict, Any, List, Callable
+
+# LLM 輸出片段合併後發佈的最短間隔（秒），避免每個 token 都喚醒所有訂閱者
+TOKEN_FLUSH_SECONDS = 0.25
+
+
+class PipelineCancelled(Exception):
+    """執行已被取消或已超過期限"""
+
+
+class CancellationToken:
+    """取消令牌：可由其他線程取消，或在期限到達時自動視為取消"""
+
+    def __init__(self, deadline_seconds: float = None):
+        """
+        初始化取消令牌
+
+        Args:
+            deadline_seconds: 從現在起的執行期限（秒），None 表示不限時
+        """
+        self._event = threading.Event()
+        self.reason = ""
+        self.deadline = time.time() + deadline_seconds if deadline_seconds else None
+
+    def cancel(self, reason: str = "執行已取消"):
+        """取消執行"""
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    @property
+    def is_cancelled(self) -> bool:
+        """是否已取消（含期限已到）"""
+        if self._event.is_set():
+            return True
+        if self.deadline is not None and time.time() >= self.deadline:
+            self.cancel("已超過執行期限")
+            return True
+        return False
+
+    def remaining(self) -> float:
+        """距離期限的剩餘秒數（不限時返回 None）"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.time())
+
+    def raise_if_cancelled(self):
+        """已取消時拋出 PipelineCancelled"""
+        if self.is_cancelled:
+            raise PipelineCancelled(self.reason)
+
+    def wait(self, timeout: float) -> bool:
+        """
+        等待指定秒數（可被取消或期限提前喚醒）
+
+        Returns:
+            是否已取消
+        """
+        remaining = self.remaining()
+        if remaining is not None:
+            timeout = min(timeout, remaining)
+        self._event.wait(timeout)
+        return self.is_cancelled
+
+
+class RunContext:
+    """單次執行的上下文"""
+
+    def __init__(self, course_id: str = None, run_id: str = None,
+                 deadline_seconds: float = None, video_profile: str = None):
+        """
+        初始化執行上下文
+
+        Args:
+            course_id: 課程 ID（用於命名輸出文件），預設自動生成
+            run_id: 執行 ID，預設自動生成
+            deadline_seconds: 執行期限（秒），None 表示不限時
+            video_profile: 視頻編碼設定（config.VIDEO_PROFILES 的鍵），None 表示使用預設
+        """
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.course_id = course_id or f"course_{int(time.time())}_{self.run_id[:6]}"
+        self.cancel_token = CancellationToken(deadline_seconds)
+        self.video_profile = video_profile
+        self.created_at = time.time()
+        self.execution_log: List[Dict[str, Any]] = []
+        self.decision_logs: Dict[str, List[Dict[str, Any]]] = {}
+        self.stats: Dict[str, Any] = {}
+        self.progress: Dict[str, Any] = {}
+        self._stage_span = 0.0
+        self._listeners: List[Callable[[str, Dict[str, Any]], None]] = []
+        self._tokens: Dict[str, List[str]] = {}
+        self._tokens_flushed_at = 0.0
+        self._lock = threading.Lock()
+
+    def check_cancelled(self):
+        """已取消或超過期限時拋出 PipelineCancelled"""
+        self.cancel_token.raise_if_cancelled()
+
+    def add_listener(self, callback: Callable[[str, Dict[str, Any]], None]):
+        """註冊進度事件的接收者（callback(event, data)，在執行線程中調用，必須立即返回）"""
+        with self._lock:
+            self._listeners.append(callback)
+
+    def emit(self, event: str, data: Dict[str, Any]):
+        """發佈進度事件給所有接收者（接收者的錯誤不影響執行）"""
+        with self._lock:
+            listeners = list(self._listeners)
+        for callback in listeners:
+            try:
+                callback(event, data)
+            except Exception as e:
+                print(f"  ⚠️ 進度事件發佈失敗：{str(e)}")
+
+    def set_stage(self, stage: str, label: str, progress: float, span: float = 0.0):
+        """
+        更新目前的執行階段與整體進度（供任務狀態查詢與進度串流）
+
+        Args:
+            stage: 階段鍵（例如 "curriculum"、"video"）
+            label: 階段名稱
+            progress: 階段開始時的整體進度（0-1）
+            span: 本階段佔整體進度的比例（階段內進度由 report_progress 回報）
+        """
+        with self._lock:
+            self._stage_span = span
+            self.progress = {"stage": stage, "label": label, "stage_start": progress}
+            data = self._update_progress(progress)
+        self.emit("stage", data)
+
+    def report_progress(self, done: int, total: int, unit: str = None):
+        """
+        回報目前階段內的進度（例如已完成的投影片或 TTS 任務數）
+
+        Args:
+            done: 已完成數
+            total: 總數
+            unit: 單位（"slide"、"tts_task"、"chapter"）
+        """
+        if total <= 0:
+            return
+        with self._lock:
+            if not self.progress:
+                return
+            fraction = min(done / total, 1.0)
+            self.progress.update({"done": done, "total": total, "unit": unit})
+            data = self._update_progress(self.progress["stage_start"] + self._stage_span * fraction)
+        self.emit("progress", data)
+
+    def _update_progress(self, progress: float) -> Dict[str, Any]:
+        """更新整體進度與預估剩餘時間（調用時已持有 self._lock）"""
+        now = time.time()
+        elapsed = now - self.created_at
+        self.progress.update({
+            "progress": round(progress, 3),
+            "elapsed_seconds": round(elapsed, 1),
+            # 按目前的平均速度外推；進度太少時估計不可靠，不提供
+            "eta_seconds": round(elapsed * (1 - progress) / progress, 1) if 0.02 <= progress < 1 else None,
+            "updated_at": now
+        })
+        return {key: value for key, value in self.progress.items() if key != "stage_start"}
+
+    def get_progress(self) -> Dict[str, Any]:
+        """目前的執行階段與整體進度"""
+        with self._lock:
+            return {key: value for key, value in self.progress.items() if key != "stage_start"}
+
+    def emit_token(self, agent_name: str, text: str):
+        """
+        發佈 LLM 的流式輸出片段（合併後最多每 TOKEN_FLUSH_SECONDS 發佈一次；沒有接收者時忽略）
+        """
+        with self._lock:
+            if not self._listeners:
+                return
+            self._tokens.setdefault(agent_name, []).append(text)
+            due = time.time() - self._tokens_flushed_at >= TOKEN_FLUSH_SECONDS
+        if due:
+            self.flush_tokens()
+
+    def flush_tokens(self):
+        """發佈所有尚未送出的 LLM 輸出片段"""
+        with self._lock:
+            pending, self._tokens = self._tokens, {}
+            self._tokens_flushed_at = time.time()
+        for agent_name, parts in pending.items():
+            if parts:
+                self.emit("token", {"agent": agent_name, "text": "".join(parts)})
+
+    def log_step(self, step_name: str, result: Dict[str, Any]):
+        """記錄執行步驟"""
+        with self._lock:
+            self.execution_log.append({
+                "step": step_name,
+                "timestamp": time.time(),
+                "success": result.get("success", False),
+                "agent": result.get("agent", "unknown")
+            })
+
+    def record_conversation(self, agent_name: str, prompt: str, response: str):
+        """記錄 Agent 的一輪對話（決策日誌）"""
+        with self._lock:
+            history = self.decision_logs.setdefault(agent_name, [])
+            history.append({
+                "role": "user",
+                "content": prompt,
+                "timestamp": time.time()
+            })
+            history.append({
+                "role": "assistant",
+                "content": response,
+                "timestamp": time.time()
+            })
+
+    def get_decision_log(self, agent_name: str) -> List[Dict[str, Any]]:
+        """獲取指定 Agent 的決策日誌"""
+        with self._lock:
+            return list(self.decision_logs.get(agent_name, []))
@@ -4,6 +4,20 @@
 
 let currentResults = null;
 let videoBlob = null;
+let currentJobId = null;
+let hlsInstance = null;
+let hlsJsLoader = null;
+
+// 任務狀態輪詢間隔（毫秒，進度串流不可用時使用）
+const JOB_POLL_INTERVAL = 2000;
+// 任務結束的狀態
+const FINISHED_STATES = ['succeeded', 'failed', 'cancelled'];
+// 即時顯示的 LLM 輸出長度上限（字元）
+const LIVE_OUTPUT_CHARS = 600;
+// Agent 階段對應的狀態卡片
+const AGENT_STAGES = ['curriculum', 'scripts', 'visual_design', 'production'];
+// hls.js（瀏覽器不支援原生 HLS 播放時才載入）
+const HLS_JS_URL = 'https://cdn.jsdelivr.net/npm/hls.js@1';
 
 // 初始化
 document.addEventListener('DOMContentLoaded', function () {
@@ -15,8 +29,18 @@ document.addEventListener('DOMContentLoaded', function () {
 
     const downloadBtn = document.getElementById('downloadBtn');
     downloadBtn.addEventListener('click', handleDownload);
+
+    // 離開頁面時取消仍在執行的任務，避免後端繼續為無人使用的請求生成
+    window.addEventListener('pagehide', cancelCurrentJob);
 });
 
+// 取消目前的生成任務
+function cancelCurrentJob() {
+    if (currentJobId) {
+        navigator.sendBeacon(`/api/jobs/${currentJobId}/cancel`);
+    }
+}
+
 // 處理表單提交
 async function handleFormSubmit(e) {
     e.preventDefault();
@@ -24,8 +48,10 @@ async function handleFormSubmit(e) {
     const formData = {
         topic: document.getElementById('topic').value,
         target_audience: document.getElementById('audience').value,
-        duration_minutes: parseInt(document.getElementById('duration').value)
+        duration_minutes: parseInt(document.getElementById('duration').value),
+        job_id: Date.now().toString(36) + Math.random().toString(36).slice(2, 10)
     };
+    currentJobId = formData.job_id;
 
     // 顯示進度區域
     document.getElementById('progressSection').classList.add('active');
@@ -39,6 +65,8 @@ async function handleFormSubmit(e) {
     // 清空日誌
     const logContainer = document.getElementById('logContainer');
     logContainer.innerHTML = '';
+    stopHls();
+    ['jobStatusLine', 'liveOutput', 'hlsPlayer'].forEach(id => document.getElementById(id)?.remove());
 
     addLog('🚀 啟動 AI 磨課師系統...');
     addLog(`📚 主題：${formData.topic}`);
@@ -47,7 +75,7 @@ async function handleFormSubmit(e) {
     addLog('');
 
     try {
-        // 調用後端 API
+        // 排入生成任務（立即返回 job_id），之後輪詢任務狀態
         const response = await fetch('/api/generate', {
             method: 'POST',
             headers: {
@@ -56,9 +84,18 @@ async function handleFormSubmit(e) {
             body: JSON.stringify(formData)
         });
 
-        const result = await response.json();
+        const submitted = await response.json();
+        if (!submitted.success) {
+            throw new Error(submitted.error);
+        }
+        if (submitted.queue_position > 0) {
+            addLog(`⏳ 已排入佇列，前面還有 ${submitted.queue_position} 個任務`);
+        }
+
+        const job = await waitForJob(submitted);
 
-        if (result.success) {
+        if (job.status === 'succeeded') {
+            const result = job.result;
             currentResults = result;
             addLog('✅ 所有 Agent 執行完成！');
             addLog(`⏱️ 總耗時：${result.elapsed_time.toFixed(2)} 秒`);
@@ -66,18 +103,208 @@ async function handleFormSubmit(e) {
             // 顯示預覽
             showPreview(result);
         } else {
-            addLog(`❌ 執行失敗：${result.error}`);
-            alert('課程生成失敗：' + result.error);
+            addLog(`❌ 執行失敗：${job.error}`);
+            alert('課程生成失敗：' + job.error);
         }
     } catch (error) {
         addLog(`❌ 網絡錯誤：${error.message}`);
         alert('系統錯誤：' + error.message);
     } finally {
+        currentJobId = null;
         btn.disabled = false;
         btn.innerHTML = '🚀 開始生成課程';
     }
 }
 
+// 等待任務結束：優先使用進度串流（SSE），無法連線時改為輪詢任務狀態
+async function waitForJob(submitted) {
+    const tracker = createStageTracker();
+    if (window.EventSource && submitted.events_url) {
+        const job = await streamJob(submitted.events_url, tracker);
+        if (job) {
+            return job;
+        }
+        addLog('⚠️ 進度串流無法連線，改為定期查詢');
+    }
+    return pollJob(submitted.job_id, tracker);
+}
+
+// 接收進度串流直到任務結束（從未連線成功時返回 null；中途斷線由 EventSource 自動以 Last-Event-ID 續傳）
+function streamJob(url, tracker) {
+    return new Promise(resolve => {
+        const source = new EventSource(url);
+        let opened = false;
+
+        const onStatus = event => {
+            const job = JSON.parse(event.data);
+            tracker(job);
+            if (FINISHED_STATES.includes(job.status)) {
+                source.close();
+                resolve(job);
+            }
+        };
+
+        source.onopen = () => { opened = true; };
+        source.onerror = () => {
+            if (!opened) {
+                source.close();
+                resolve(null);
+            }
+        };
+        source.addEventListener('snapshot', onStatus);
+        source.addEventListener('status', onStatus);
+        source.addEventListener('stage', event => tracker(JSON.parse(event.data)));
+        source.addEventListener('progress', event => tracker(JSON.parse(event.data)));
+        source.addEventListener('token', event => appendLiveOutput(JSON.parse(event.data)));
+        source.addEventListener('hls', event => playHls(JSON.parse(event.data).hls_url));
+    });
+}
+
+// 輪詢任務狀態直到結束
+async function pollJob(jobId, tracker) {
+    while (true) {
+        const response = await fetch(`/api/jobs/${jobId}`);
+        const job = await response.json();
+        if (!job.success) {
+            throw new Error(job.error);
+        }
+
+        tracker(job);
+        if (FINISHED_STATES.includes(job.status)) {
+            return job;
+        }
+        await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL));
+    }
+}
+
+// 建立進度追蹤：階段改變時寫入日誌並更新 Agent 狀態卡片，進度與預估剩餘時間顯示在狀態列，
+// 任務狀態出現 hls_url 時開始播放
+function createStageTracker() {
+    let lastStage = null;
+    return function (state) {
+        if (state.stage && state.stage !== lastStage) {
+            const label = state.stage_label || state.label;
+            if (label) {
+                addLog(`▶️ ${label}（${Math.round((state.progress || 0) * 100)}%）`);
+            }
+            const agentIndex = AGENT_STAGES.indexOf(state.stage);
+            AGENT_STAGES.forEach((stage, index) => {
+                if (agentIndex === -1 || index < agentIndex) {
+                    updateAgentStatus(index + 1, 'completed');
+                } else if (index === agentIndex) {
+                    updateAgentStatus(index + 1, 'active');
+                }
+            });
+            lastStage = state.stage;
+        }
+        if (state.hls_url) {
+            playHls(state.hls_url);
+        }
+        updateStatusLine(state);
+    };
+}
+
+// 狀態列：目前階段、階段內進度、整體進度與預估剩餘時間
+function updateStatusLine(state) {
+    const statusLine = getPanel('jobStatusLine', 'div');
+    const parts = [state.stage_label || state.label || state.status || ''];
+    if (state.total) {
+        const units = { slide: '張投影片', tts_task: '段語音', chapter: '個章節' };
+        parts.push(`${state.done}/${state.total} ${units[state.unit] || ''}`);
+    }
+    if (state.progress !== undefined && state.progress !== null) {
+        parts.push(`${Math.round(state.progress * 100)}%`);
+    }
+    if (state.eta_seconds) {
+        parts.push(`預計剩餘 ${formatDuration(state.eta_seconds)}`);
+    }
+    statusLine.textContent = parts.filter(Boolean).join(' · ');
+}
+
+// 即時顯示 LLM 的流式輸出（只保留最後一段）
+function appendLiveOutput(token) {
+    const output = getPanel('liveOutput', 'pre');
+    if (output.dataset.agent !== token.agent) {
+        output.dataset.agent = token.agent;
+        output.textContent = `${token.agent}：`;
+    }
+    output.textContent = (output.textContent + token.text).slice(-LIVE_OUTPUT_CHARS);
+}
+
+// 播放 HLS 播放清單（第一章寫入後即可播放，後續章節由播放器重新載入清單取得）
+function playHls(url) {
+    const video = getPanel('hlsPlayer', 'video');
+    if (video.dataset.src === url) {
+        return;
+    }
+    video.dataset.src = url;
+    video.controls = true;
+    video.style.width = '100%';
+    addLog('📺 影片第一章已可播放（後續章節編碼中）');
+
+    if (video.canPlayType('application/vnd.apple.mpegurl')) {
+        video.src = url;
+        return;
+    }
+    loadHlsJs().then(Hls => {
+        if (!Hls.isSupported() || video.dataset.src !== url) {
+            return;
+        }
+        stopHls();
+        hlsInstance = new Hls();
+        hlsInstance.loadSource(url);
+        hlsInstance.attachMedia(video);
+    }).catch(error => addLog(`⚠️ 無法播放 HLS：${error.message}`));
+}
+
+// 停止目前的 hls.js 播放器
+function stopHls() {
+    if (hlsInstance) {
+        hlsInstance.destroy();
+        hlsInstance = null;
+    }
+}
+
+// 載入 hls.js（只載入一次）
+function loadHlsJs() {
+    if (window.Hls) {
+        return Promise.resolve(window.Hls);
+    }
+    if (!hlsJsLoader) {
+        hlsJsLoader = new Promise((resolve, reject) => {
+            const script = document.createElement('script');
+            script.src = HLS_JS_URL;
+            script.onload = () => resolve(window.Hls);
+            script.onerror = () => {
+                hlsJsLoader = null;
+                reject(new Error('hls.js 載入失敗'));
+            };
+            document.head.appendChild(script);
+        });
+    }
+    return hlsJsLoader;
+}
+
+// 取得（必要時建立）日誌區上方的面板
+function getPanel(id, tagName) {
+    let panel = document.getElementById(id);
+    if (!panel) {
+        const logContainer = document.getElementById('logContainer');
+        panel = document.createElement(tagName);
+        panel.id = id;
+        panel.className = 'log-entry';
+        panel.style.whiteSpace = 'pre-wrap';
+        logContainer.parentNode.insertBefore(panel, logContainer);
+    }
+    return panel;
+}
+
+// 秒數格式化為「X 分 Y 秒」
+function formatDuration(seconds) {
+    const total = Math.round(seconds);
+    return total >= 60 ? `${Math.floor(total / 60)} 分 ${total % 60} 秒` : `${total} 秒`;
+}
+
 // 添加日誌
 function addLog(message) {
     const logContainer = document.getElementById('logContainer');
@@ -121,11 +348,20 @@ function showPreview(result) {
     slidesPreview.innerHTML = '';
 
     const slides = results.visual_design.slides;
+    // 優先顯示向量投影片（檔案小、任意縮放清晰），否則使用 WebP 縮圖
+    const vectorSlides = result.vector_slide_urls || [];
+    const thumbnails = result.thumbnail_urls || [];
     slides.forEach((slide, index) => {
         const slideCard = document.createElement('div');
         slideCard.className = 'slide-card';
+        const slideName = `_slide_${slide.slide_id || index + 1}`;
+        const thumbnail = vectorSlides.find(url => url.endsWith(`${slideName}.svg`))
+            || thumbnails.find(url => url.endsWith(`${slideName}.webp`));
+        const preview = thumbnail
+            ? `<img src="${thumbnail}" alt="投影片 ${index + 1}" loading="lazy">`
+            : `${index + 1}`;
         slideCard.innerHTML = `
-            <div class="slide-preview">${index + 1}</div>
+            <div class="slide-preview">${preview}</div>
             <h4>${slide.title || '投影片 ' + (index + 1)}</h4>
             <p><small>${slide.slide_type}</small></p>
         `;
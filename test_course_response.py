@@ -0,0 +1,47 @@
+# 任務結果中的課程內容測試腳本
+# 用法: python test_course_response.py（或 pytest test_course_response.py）
+
+import tempfile
+
+import config
+from course_artifact import save_course_artifact, load_course_manifest
+from app import build_course_response
+
+LONG_TEXT = "機器學習是人工智慧的一個分支，讓電腦從資料中學習規律。" * 20
+
+
+def make_result():
+    """含長投影片文字與原始回應的執行結果"""
+    return {
+        "success": True,
+        "topic": "機器學習入門",
+        "results": {
+            "curriculum": {"course_title": "機器學習入門", "raw_response": "{}", "chapters": []},
+            "visual_design": {
+                "slides": [{"slide_id": "s1", "title": "簡介", "slide_type": "content",
+                            "content": {"text": LONG_TEXT, "bullet_points": ["重點"]}}]
+            }
+        }
+    }
+
+
+def test_response_resolves_long_text():
+    """manifest 中被移為 blob 的長文字在任務結果中已還原，raw_response 保留引用"""
+    artifact_dir = tempfile.mkdtemp(prefix="test_course_response_")
+    save_course_artifact(make_result(), artifact_dir)
+
+    manifest = load_course_manifest(artifact_dir)
+    slide = manifest["course"]["results"]["visual_design"]["slides"][0]
+    assert set(slide["content"]["text"]) == {"$blob"}
+
+    response = build_course_response(artifact_dir)
+    slide = response["results"]["visual_design"]["slides"][0]
+    assert slide["content"]["text"] == LONG_TEXT
+    raw_response = response["results"]["curriculum"]["raw_response"]
+    assert set(raw_response) == {"$blob"}, raw_response
+    assert "raw_response" in config.ARTIFACT_BLOB_KEYS
+    print("✅ 任務結果的長文字已還原")
+
+
+if __name__ == "__main__":
+    test_response_resolves_long_text()
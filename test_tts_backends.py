@@ -0,0 +1,56 @@
+# TTS 後端測試腳本
+# 用法: python test_tts_backends.py（或 pytest test_tts_backends.py）
+
+import os
+import stat
+import sys
+import tempfile
+
+from generators.media_utils import probe_duration
+from generators.tts_backends import EspeakBackend
+
+# 模擬 espeak-ng 的命令列解析（getopt，與 espeak-ng 相同）：
+# 以 "-" 開頭而未放在 "--" 之後的文字會被當成未知選項而失敗
+FAKE_ESPEAK = '''#!{python}
+import getopt, io, sys, wave
+try:
+    options, args = getopt.gnu_getopt(sys.argv[1:], "v:s:", ["stdout"])
+except getopt.GetoptError as e:
+    sys.exit("espeak-ng: " + str(e))
+with open({record!r}, "w", encoding="utf-8") as f:
+    f.write("\\n".join(args))
+buf = io.BytesIO()
+w = wave.open(buf, "wb"); w.setnchannels(1); w.setsampwidth(2); w.setframerate(22050)
+w.writeframes(b"\\x00\\x00" * 22050); w.close()
+sys.stdout.buffer.write(buf.getvalue())
+'''
+
+
+def make_backend():
+    """建立使用模擬 espeak-ng 的後端，返回（後端, 記錄收到文字的文件, 輸出目錄）"""
+    output_dir = tempfile.mkdtemp(prefix="test_tts_backends_")
+    record = os.path.join(output_dir, "text.txt")
+    executable = os.path.join(output_dir, "espeak-ng")
+    with open(executable, 'w', encoding='utf-8') as f:
+        f.write(FAKE_ESPEAK.format(python=sys.executable, record=record))
+    os.chmod(executable, os.stat(executable).st_mode | stat.S_IEXEC)
+
+    backend = EspeakBackend()
+    backend.executable = executable
+    return backend, record, output_dir
+
+
+def test_espeak_dash_leading_text():
+    """以 "-" 開頭的文字照常朗讀，不被當成 espeak 的選項"""
+    backend, record, output_dir = make_backend()
+    for index, text in enumerate(["-5 度的天氣", "--help 是說明選項", "-v"]):
+        filepath = os.path.join(output_dir, f"segment_{index}.mp3")
+        backend.synthesize(text, filepath)
+        with open(record, 'r', encoding='utf-8') as f:
+            assert f.read() == text
+        assert probe_duration(filepath) > 0
+        print(f"✅ espeak：{text}")
+
+
+if __name__ == "__main__":
+    test_espeak_dash_leading_text()
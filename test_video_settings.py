@@ -0,0 +1,54 @@
+# 視頻編碼設定測試腳本
+# 用法: python test_video_settings.py（或 pytest test_video_settings.py）
+
+import os
+import tempfile
+
+from PIL import Image
+
+import config
+from generators.video_generator import VideoGenerator
+
+VIDEO_CONFIG = {"resolution": "1920x1080", "fps": 30}
+
+
+def make_generator_and_slide(profile):
+    """建立視頻生成器與一張指定解析度設定的投影片"""
+    output_dir = tempfile.mkdtemp(prefix="test_video_settings_")
+    slide_path = os.path.join(output_dir, "slide.png")
+    Image.new('RGB', config.SLIDE_PROFILES[profile], 'white').save(slide_path)
+    return VideoGenerator(output_dir), slide_path
+
+
+def test_preview_slides_not_upscaled():
+    """preview 投影片 + standard 編碼：不放大到 video_config 的 1080p"""
+    generator, slide_path = make_generator_and_slide("preview")
+    settings = generator._encoder_settings("standard", VIDEO_CONFIG, generator._slide_size(slide_path))
+    assert settings["size"] == (640, 360), settings["size"]
+    assert settings["fps"] == VIDEO_CONFIG["fps"], settings["fps"]
+    print(f"✅ preview + standard：{settings['size']}，{settings['fps']} fps")
+
+
+def test_720p_slides_with_archival():
+    """720p 投影片 + archival 編碼：輸出 720p"""
+    generator, slide_path = make_generator_and_slide("720p")
+    settings = generator._encoder_settings("archival", VIDEO_CONFIG, generator._slide_size(slide_path))
+    assert settings["size"] == (1280, 720), settings["size"]
+    print(f"✅ 720p + archival：{settings['size']}")
+
+
+def test_1080p_slides_keep_profile_limits():
+    """1080p 投影片：standard 維持 1080p，draft 仍限制為 720p"""
+    generator, slide_path = make_generator_and_slide("1080p")
+    slide_size = generator._slide_size(slide_path)
+    assert generator._encoder_settings("standard", VIDEO_CONFIG, slide_size)["size"] == (1920, 1080)
+    draft = generator._encoder_settings("draft", VIDEO_CONFIG, slide_size)
+    assert draft["size"] == (1280, 720)
+    assert draft["fps"] == config.VIDEO_STILL_FPS
+    print("✅ 1080p + standard / draft")
+
+
+if __name__ == "__main__":
+    test_preview_slides_not_upscaled()
+    test_720p_slides_with_archival()
+    test_1080p_slides_keep_profile_limits()
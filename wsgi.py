@@ -3,7 +3,7 @@ WSGI Entry Point for Production Deployment
 使用 Gunicorn 或 Waitress 啟動應用
 
 Usage:
-  gunicorn -w 4 -b 0.0.0.0:5001 wsgi:app
+  gunicorn -w 1 --threads 8 -b 0.0.0.0:5001 wsgi:app   # 任務佇列在進程內，使用單一進程
   waitress-serve --host=0.0.0.0 --port=5001 wsgi:app
 """
 from app import app